@@ -1,5 +1,10 @@
+import time
+# Dicatat sebelum import lain agar waktu startup ikut menghitung import Flask/SQLAlchemy
+PROCESS_START = time.perf_counter()
+
 from flask import Flask, render_template, jsonify
-from models import db
+from flask.cli import with_appcontext
+from models import db, Kelas, Siswa, Semester, Pengguna
 from routes.kelas_routes import kelas_bp
 from routes.siswa_routes import siswa_bp
 from routes.materi_routes import materi_bp
@@ -10,10 +15,48 @@ from routes.jurnal_routes import jurnal_bp
 from routes.pengguna_routes import pengguna_bp
 from routes.dashboard_routes import dashboard_bp
 from routes.legger_routes import legger_bp
-from routes.database_routes import database_bp
+from routes.database_routes import database_bp, start_backup_scheduler, jalankan_backup_inkremental
+from migrations import upgrade_database
+from seed import seed_database
+from sqlalchemy import event
+from datetime import datetime
+import click
 import os
+import sqlite3
+
+# Profil SQLite yang diterapkan ke setiap koneksi baru. Tiap nilai bisa diganti
+# per deployment lewat environment SQLITE_<NAMA>, misalnya SQLITE_BUSY_TIMEOUT=10000.
+# foreign_keys dibiarkan OFF: route hapus siswa/materi/semester masih
+# meninggalkan baris terkait dan akan gagal jika constraint ditegakkan.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'OFF'
+}
+
+def get_sqlite_pragmas():
+    """Profil pragma SQLite dengan override dari environment"""
+    return {
+        nama: os.environ.get(f'SQLITE_{nama.upper()}', nilai)
+        for nama, nilai in SQLITE_PRAGMAS.items()
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Terapkan pragma ke koneksi sqlite3 yang baru dibuka"""
+    cursor = dbapi_connection.cursor()
+    for nama, nilai in pragmas.items():
+        cursor.execute(f'PRAGMA {nama}={nilai}')
+    cursor.close()
 
-def create_app():
+# Waktu startup (detik) per fase, dilaporkan di log dan /health
+startup = {'import': time.perf_counter() - PROCESS_START}
+
+def create_app(config=None):
+    mulai = time.perf_counter()
     app = Flask(__name__)
     # Ensure instance folder exists
     instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
@@ -23,12 +66,58 @@ def create_app():
     db_path = os.path.join(instance_path, 'database.db')
     # Convert Windows backslashes to forward slashes for SQLite URI
     db_path_uri = db_path.replace('\\', '/')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path_uri}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', f'sqlite:///{db_path_uri}')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'your-secret-key-here'
+    # Hitung ulang legger otomatis setiap absensi/nilai disimpan
+    app.config['LEGGER_AUTO_REFRESH'] = True
+    # Worker pool dan ukuran batch untuk generate legger seluruh sekolah
+    app.config['LEGGER_JOB_WORKERS'] = 4
+    app.config['LEGGER_JOB_BATCH_SIZE'] = 200
+    # Umur (detik) snapshot dashboard sebelum dihitung ulang
+    app.config['DASHBOARD_CACHE_TTL'] = 30
+    # Batas koneksi live dashboard (SSE) dan interval heartbeat (detik)
+    app.config['DASHBOARD_SSE_MAX_CLIENTS'] = 50
+    app.config['DASHBOARD_SSE_HEARTBEAT'] = 15
+    # Interval (detik) cek generasi cache (semester aktif, nama kelas/materi) di database
+    app.config['CACHE_GENERASI_INTERVAL'] = 2
+    # Pragma koneksi dan ukuran pool; WAL membuat pembaca tidak menahan penulis
+    app.config['SQLITE_PRAGMAS'] = get_sqlite_pragmas()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('SQLITE_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('SQLITE_MAX_OVERFLOW', 20)),
+        'pool_timeout': 30
+    }
+    # Terapkan migrasi skema yang tertunda saat startup (lihat migrations.py)
+    app.config['SCHEMA_AUTO_UPGRADE'] = True
+    # Backup inkremental terjadwal (detik, 0 = mati), titik yang disimpan per jam/hari/minggu,
+    # dan umur rantai (hari) sebelum dimulai backup penuh baru. Scheduler hanya
+    # dijalankan oleh server (python app.py); deployment lain memakai `flask backup` di cron
+    app.config['BACKUP_INCREMENTAL_INTERVAL'] = 3600
+    app.config['BACKUP_RETENSI'] = {'jam': 24, 'hari': 7, 'minggu': 4}
+    app.config['BACKUP_FULL_SETIAP_HARI'] = 7
+    if config:
+        app.config.update(config)
 
     # Initialize database
     db.init_app(app)
+    with app.app_context():
+        pragmas = app.config['SQLITE_PRAGMAS']
+        event.listen(
+            db.engine, 'connect',
+            lambda dbapi_connection, connection_record: apply_sqlite_pragmas(dbapi_connection, pragmas)
+        )
+        if app.config['SCHEMA_AUTO_UPGRADE']:
+            db_path = db.engine.url.database
+            error = periksa_file_database(db_path)
+            if error:
+                # Bukan file database SQLite: pindahkan dan buat skema baru.
+                # Error migrasi pada database yang sehat tetap dilempar.
+                print(f"Database file is corrupted: {error}")
+                db.engine.dispose()
+                pindahkan_database_rusak(db_path)
+            upgrade_database()
+    startup['create_app'] = time.perf_counter() - mulai
 
     # Register blueprints
     app.register_blueprint(kelas_bp, url_prefix='/api')
@@ -47,89 +136,97 @@ def create_app():
     def index():
         return render_template('index.html')
 
+    app.cli.add_command(seed_command)
+    app.cli.add_command(backup_command)
+
+    @app.before_request
+    def catat_request_pertama():
+        if 'request_pertama' not in startup:
+            startup['request_pertama'] = time.perf_counter() - PROCESS_START
+            print(
+                f"Startup: import {startup['import']:.2f} s, create_app {startup['create_app']:.2f} s, "
+                f"request pertama {startup['request_pertama']:.2f} s setelah proses mulai"
+            )
+
     @app.route('/health')
     def health():
-        return jsonify({'status': 'healthy', 'message': 'Sistem Administrasi Guru API'})
+        return jsonify({
+            'status': 'healthy',
+            'message': 'Sistem Administrasi Guru API',
+            'startup': {nama: round(detik, 3) for nama, detik in startup.items()}
+        })
 
     return app
 
-def init_database():
-    """Initialize database with tables and seed data"""
-    app = create_app()
+def periksa_file_database(db_path):
+    """Kembalikan pesan error jika file bukan database SQLite yang bisa dibuka, selain itu None.
     
+    Diperiksa lewat SQLite sendiri (header dan PRAGMA schema_version) sebelum
+    migrasi. File tidak dibuka langsung: menutup descriptor file database
+    melepas lock POSIX milik koneksi SQLite lain di proses ini. Database
+    terkunci (OperationalError) tidak dianggap rusak.
+    """
+    if not db_path or db_path == ':memory:' or not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('PRAGMA schema_version').fetchone()
+    except sqlite3.OperationalError:
+        raise
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        conn.close()
+    return None
+
+def pindahkan_database_rusak(db_path):
+    """Simpan file database yang rusak sebagai .corrupted agar dibuat baru; file .corrupted lama tidak ditimpa"""
+    corrupted_backup = db_path + '.corrupted'
+    if os.path.exists(corrupted_backup):
+        corrupted_backup = f"{db_path}.{datetime.now().strftime('%Y%m%d_%H%M%S')}.corrupted"
+    os.rename(db_path, corrupted_backup)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    print(f"Database rusak dipindahkan ke {corrupted_backup}")
+
+def database_kosong():
+    """True jika belum ada data master (kelas, siswa, semester, pengguna)"""
+    return not any(
+        db.session.query(model.id).first()
+        for model in (Kelas, Siswa, Semester, Pengguna)
+    )
+
+def init_database(app):
+    """Seed data default hanya jika database masih kosong; data yang ada tidak disentuh"""
+    mulai = time.perf_counter()
     with app.app_context():
-        try:
-            # Ensure instance directory exists
-            instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
-            os.makedirs(instance_path, exist_ok=True)
-            
-            db_path = os.path.join(instance_path, 'database.db')
-            
-            # Check if database file exists and is valid
-            if os.path.exists(db_path):
-                try:
-                    import sqlite3
-                    test_conn = sqlite3.connect(db_path)
-                    test_conn.execute('SELECT name FROM sqlite_master WHERE type="table" LIMIT 1')
-                    test_conn.close()
-                    print("Existing database file is valid")
-                except (sqlite3.DatabaseError, sqlite3.OperationalError) as db_error:
-                    print(f"Database file is corrupted: {db_error}")
-                    print("Removing corrupted database file...")
-                    try:
-                        # Close all connections first
-                        db.session.close()
-                        db.engine.dispose()
-                        import time
-                        time.sleep(0.5)
-                        # Remove corrupted file
-                        os.remove(db_path)
-                        print("Corrupted database file removed")
-                    except Exception as remove_error:
-                        print(f"Warning: Could not remove corrupted file: {remove_error}")
-                        # Try to rename it instead
-                        try:
-                            corrupted_backup = db_path + '.corrupted'
-                            if os.path.exists(corrupted_backup):
-                                os.remove(corrupted_backup)
-                            os.rename(db_path, corrupted_backup)
-                            print(f"Corrupted database renamed to {corrupted_backup}")
-                        except Exception as rename_error:
-                            print(f"Error: Could not rename corrupted file: {rename_error}")
-                            raise
-            
-            # Drop all tables and recreate
-            try:
-                db.drop_all()
-            except Exception as drop_error:
-                print(f"Warning: Could not drop tables (may not exist): {drop_error}")
-            
-            db.create_all()
-            print("Database tables created successfully!")
-            
-            # Insert default data
-            from seed import seed_database
+        if database_kosong():
             seed_database()
-            print("Database seeded successfully!")
-            
-        except Exception as e:
-            print(f"Error initializing database: {e}")
-            import traceback
-            traceback.print_exc()
-            # If there's an error, try creating tables without seed data
-            try:
-                db.create_all()
-                print("Database tables created (without seed data)")
-            except Exception as e2:
-                print(f"Critical error: {e2}")
-                import traceback
-                traceback.print_exc()
-                raise
+    startup['init_database'] = time.perf_counter() - mulai
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Isi data default (kelas, siswa, materi, semester, pengguna, bobot) yang belum ada."""
+    seed_database()
+
+@click.command('backup')
+@click.option('--penuh', is_flag=True, help='Mulai rantai baru dengan backup penuh.')
+@with_appcontext
+def backup_command(penuh):
+    """Backup inkremental database (untuk cron jika tidak dijalankan lewat python app.py)."""
+    entry = jalankan_backup_inkremental(penuh=penuh)
+    if entry is None:
+        click.echo('Tidak ada perubahan sejak backup terakhir')
+    else:
+        click.echo(f"Backup {entry['jenis']} {entry['id']}: {entry['halaman']} halaman, {entry['ukuran']} byte")
 
 if __name__ == '__main__':
-    # Initialize database first
-    init_database()
-    
-    # Then run the app
     app = create_app()
-    app.run(debug=True)
\ No newline at end of file
+    init_database(app)
+    # Reloader debug menjalankan file ini di proses pemantau dan proses server;
+    # scheduler hanya di proses server
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_backup_scheduler(app)
+    app.run(debug=True)
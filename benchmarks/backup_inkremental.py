@@ -0,0 +1,94 @@
+"""Benchmark ukuran dan waktu backup inkremental terhadap volume perubahan.
+
+Membuat database sementara berukuran sekolah besar, membuat backup penuh,
+lalu mengubah sejumlah baris absensi sebelum setiap backup inkremental.
+Ukuran file inkremental mengikuti jumlah halaman yang berubah, bukan
+ukuran database. Sebagai pembanding: satu salinan penuh .db.gz.
+
+    python benchmarks/backup_inkremental.py --kelas 40 --siswa 36 --hari 120
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+import incremental_backup
+from app import create_app
+from models import db, Absensi
+from schema_indexes import isi_data
+
+def ukur_backup_penuh_gz(db_path, folder):
+    mulai = time.perf_counter()
+    snapshot_path = os.path.join(folder, 'penuh.db')
+    sumber = sqlite3.connect(db_path)
+    tujuan = sqlite3.connect(snapshot_path)
+    sumber.backup(tujuan)
+    tujuan.close()
+    sumber.close()
+    with open(snapshot_path, 'rb') as f, gzip.open(snapshot_path + '.gz', 'wb', compresslevel=6) as out:
+        shutil.copyfileobj(f, out)
+    ukuran = os.path.getsize(snapshot_path + '.gz')
+    os.remove(snapshot_path)
+    os.remove(snapshot_path + '.gz')
+    return ukuran, time.perf_counter() - mulai
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kelas', type=int, default=40)
+    parser.add_argument('--siswa', type=int, default=36)
+    parser.add_argument('--hari', type=int, default=120)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_backup_')
+    try:
+        db_path = os.path.join(folder, 'database.db')
+        backup_folder = os.path.join(folder, 'inkremental')
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'BACKUP_INCREMENTAL_INTERVAL': 0
+        })
+        with app.app_context():
+            isi_data(args.kelas, args.siswa, args.hari)
+            total_absensi = Absensi.query.count()
+            print(f'Database uji: {total_absensi} absensi, {os.path.getsize(db_path) // 1024} KB')
+
+            ukuran, detik = ukur_backup_penuh_gz(db_path, folder)
+            print(f"{'salinan penuh .db.gz':<28} {ukuran / 1024:9.1f} KB {detik * 1000:8.1f} ms")
+
+            sekarang = datetime(2025, 1, 6, 7, 0)
+            entry = incremental_backup.jalankan_backup(db_path, backup_folder, penuh=True, sekarang=sekarang)
+            print(f"{'backup penuh halaman':<28} {entry['ukuran'] / 1024:9.1f} KB {entry['durasi_detik'] * 1000:8.1f} ms")
+
+            for jumlah in (0, 36, 360, 3600, 36000):
+                if jumlah:
+                    db.session.execute(text(
+                        "UPDATE absensi SET status = CASE status WHEN 'Hadir' THEN 'Sakit' ELSE 'Hadir' END "
+                        "WHERE id IN (SELECT id FROM absensi ORDER BY RANDOM() LIMIT :jumlah)"
+                    ), {'jumlah': min(jumlah, total_absensi)})
+                    db.session.commit()
+                sekarang += timedelta(hours=1)
+                entry = incremental_backup.jalankan_backup(db_path, backup_folder, sekarang=sekarang)
+                if entry is None:
+                    print(f"{f'{jumlah} baris berubah':<28} {'tidak ada perubahan':>22}")
+                    continue
+                print(
+                    f"{f'{jumlah} baris berubah':<28} {entry['ukuran'] / 1024:9.1f} KB "
+                    f"{entry['durasi_detik'] * 1000:8.1f} ms  ({entry['halaman']}/{entry['page_count']} halaman)"
+                )
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Benchmark endpoint sebelum dan sesudah migrasi index skema.
+
+Membuat database sementara berukuran sekolah besar dengan skema lama
+(tanpa index selain primary key dan nisn), mengukur endpoint baca yang
+paling sering dipakai, lalu menjalankan upgrade_database() dan mengukur
+ulang endpoint yang sama.
+
+    python benchmarks/schema_indexes.py --kelas 40 --siswa 36 --hari 120
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import create_app
+from migrations import upgrade_database
+from models import (
+    db, Absensi, Jurnal, Kelas, Legger, Materi, NilaiFormatif, NilaiSumatif,
+    SchemaVersion, Semester, Siswa, BobotNilai
+)
+
+STATUS = ['Hadir'] * 8 + ['Sakit', 'Ijin', 'Tidak Hadir']
+JUMLAH_MATERI = 8
+
+def isi_data(jumlah_kelas, siswa_per_kelas, jumlah_hari):
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    stempel = {'created_at': now, 'updated_at': now}
+    mulai = date(2024, 7, 15)
+    hari_sekolah = [
+        tanggal for tanggal in (mulai + timedelta(days=i) for i in range(jumlah_hari * 7 // 5 + 7))
+        if tanggal.weekday() < 5
+    ][:jumlah_hari]
+
+    db.session.add(Semester(
+        tahun_ajaran='2024/2025', semester='1', tanggal_mulai=mulai,
+        tanggal_selesai=date(2024, 12, 20), status='Aktif'
+    ))
+    db.session.add(BobotNilai(formatif=25, uts=25, uas=30, absensi=20))
+    db.session.flush()
+    semester_id = Semester.query.first().id
+
+    daftar_kelas = [f'K{k:02d}' for k in range(jumlah_kelas)]
+    db.session.execute(Kelas.__table__.insert(), [
+        {'nama': kelas, 'tingkat': 'X', 'jurusan': 'IPA', **stempel} for kelas in daftar_kelas
+    ])
+    db.session.execute(Materi.__table__.insert(), [
+        {'judul': f'{kelas} Materi {m}', 'kelas': kelas, 'kategori': 'Umum', **stempel}
+        for kelas in daftar_kelas for m in range(JUMLAH_MATERI)
+    ])
+    db.session.execute(Siswa.__table__.insert(), [
+        {'nisn': f'{k:04d}{i:06d}', 'nama': f'Siswa {k}-{i}', 'kelas': kelas, **stempel}
+        for k, kelas in enumerate(daftar_kelas) for i in range(siswa_per_kelas)
+    ])
+    siswa = db.session.query(Siswa.id, Siswa.kelas).all()
+
+    db.session.execute(Absensi.__table__.insert(), [
+        {'siswa_id': row.id, 'tanggal': tanggal, 'status': rng.choice(STATUS),
+         'semester_id': semester_id, **stempel}
+        for row in siswa for tanggal in hari_sekolah
+    ])
+    db.session.execute(NilaiFormatif.__table__.insert(), [
+        {'siswa_id': row.id, 'materi': f'{row.kelas} Materi {m}', 'tanggal': hari_sekolah[m * 10 % len(hari_sekolah)],
+         'nilai': rng.randint(50, 100), 'semester_id': semester_id, **stempel}
+        for row in siswa for m in range(JUMLAH_MATERI)
+    ])
+    db.session.execute(NilaiSumatif.__table__.insert(), [
+        {'siswa_id': row.id, 'jenis': jenis, 'tanggal': hari_sekolah[-1],
+         'nilai': rng.randint(50, 100), 'semester_id': semester_id, **stempel}
+        for row in siswa for jenis in ('UTS', 'UAS')
+    ])
+    db.session.execute(Jurnal.__table__.insert(), [
+        {'tanggal': tanggal, 'kelas': kelas, 'mata_pelajaran': 'Matematika', 'materi': f'{kelas} Materi 0',
+         'topik': 'Latihan', 'jam_ke': '1-2', 'semester_id': semester_id, **stempel}
+        for kelas in daftar_kelas for tanggal in hari_sekolah
+    ])
+    db.session.execute(Legger.__table__.insert(), [
+        {'siswa_id': row.id, 'semester_id': semester_id, 'nilai_akhir': rng.randint(50, 100), **stempel}
+        for row in siswa
+    ])
+    db.session.commit()
+    return semester_id, daftar_kelas, hari_sekolah
+
+def jadikan_skema_lama():
+    """Hapus semua index buatan dan catatan migrasi, seperti database sekolah lama"""
+    for (nama,) in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    )).all():
+        db.session.execute(text(f'DROP INDEX {nama}'))
+    SchemaVersion.query.delete()
+    db.session.execute(text('DROP TABLE IF EXISTS sqlite_stat1'))
+    db.session.commit()
+
+def daftar_endpoint(semester_id, daftar_kelas, hari_sekolah):
+    kelas = daftar_kelas[len(daftar_kelas) // 2]
+    tanggal = hari_sekolah[len(hari_sekolah) // 2]
+    dari = hari_sekolah[-30]
+    sampai = hari_sekolah[-1]
+    return [
+        ('siswa per kelas', f'/api/siswa?kelas={kelas}'),
+        ('lembar absensi', f'/api/absensi?kelas={kelas}&tanggal={tanggal}'),
+        ('kalender absensi', f'/api/absensi/kalender?kelas={kelas}&dari_tanggal={dari}&sampai_tanggal={sampai}'),
+        ('rekap absensi', f'/api/absensi/rekap?kelas={kelas}&dari_tanggal={dari}&sampai_tanggal={sampai}'),
+        ('nilai formatif', f'/api/nilai/formatif?kelas={kelas}&materi={kelas} Materi 3&tanggal={tanggal}'),
+        ('nilai sumatif', f'/api/nilai/sumatif?jenis=UTS&kelas={kelas}&tanggal={sampai}'),
+        ('gradebook', f'/api/nilai/gradebook?kelas={kelas}&semester={semester_id}'),
+        ('jurnal per kelas', f'/api/jurnal?kelas={kelas}'),
+        ('legger', f'/api/legger?kelas={kelas}&semester={semester_id}'),
+        ('dashboard', '/api/dashboard'),
+    ]
+
+def ukur(client, endpoints, ulang):
+    hasil = {}
+    for nama, url in endpoints:
+        waktu = []
+        for _ in range(ulang):
+            mulai = time.perf_counter()
+            response = client.get(url)
+            waktu.append(time.perf_counter() - mulai)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: {response.status_code} {response.get_data(as_text=True)[:200]}')
+        hasil[nama] = statistics.median(waktu) * 1000
+    return hasil
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kelas', type=int, default=40)
+    parser.add_argument('--siswa', type=int, default=36)
+    parser.add_argument('--hari', type=int, default=120)
+    parser.add_argument('--ulang', type=int, default=10)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_index_')
+    try:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(folder, 'bench.db')}",
+            'SCHEMA_AUTO_UPGRADE': False,
+            'DASHBOARD_CACHE_TTL': 0,
+            'LEGGER_AUTO_REFRESH': False
+        })
+        client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            mulai = time.perf_counter()
+            semester_id, daftar_kelas, hari_sekolah = isi_data(args.kelas, args.siswa, args.hari)
+            jadikan_skema_lama()
+            total_absensi = Absensi.query.count()
+            print(
+                f'{args.kelas} kelas x {args.siswa} siswa, {args.hari} hari: '
+                f'{total_absensi} absensi ({time.perf_counter() - mulai:.1f} detik)'
+            )
+
+            endpoints = daftar_endpoint(semester_id, daftar_kelas, hari_sekolah)
+            sebelum = ukur(client, endpoints, args.ulang)
+
+            mulai = time.perf_counter()
+            upgrade_database()
+            print(f'upgrade_database: {time.perf_counter() - mulai:.1f} detik')
+            sesudah = ukur(client, endpoints, args.ulang)
+
+        print(f"\n{'endpoint':<18} {'sebelum':>10} {'sesudah':>10} {'speedup':>8}")
+        for nama, _ in endpoints:
+            print(
+                f'{nama:<18} {sebelum[nama]:8.1f}ms {sesudah[nama]:8.1f}ms '
+                f'{sebelum[nama] / sesudah[nama]:7.1f}x'
+            )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark throughput SQLite dengan beberapa klien bersamaan.
+
+Membandingkan profil bawaan SQLite (sebelum) dengan profil SQLITE_PRAGMAS
+aplikasi (sesudah) pada database sementara. Setiap klien adalah proses
+terpisah (seperti worker gunicorn) yang menjalankan campuran tulis (upsert
+absensi satu kelas, seperti POST /api/absensi) dan baca (rekap status per
+kelas) selama durasi tertentu.
+
+    python benchmarks/sqlite_concurrency.py --clients 8 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+
+from app import SQLITE_PRAGMAS, apply_sqlite_pragmas
+from models import db, Absensi, Semester, Siswa
+
+STATUS = ['Hadir'] * 8 + ['Sakit', 'Ijin', 'Tidak Hadir']
+
+def buat_engine(path, pragmas):
+    engine = create_engine(f'sqlite:///{path}')
+    if pragmas:
+        event.listen(
+            engine, 'connect',
+            lambda dbapi_connection, connection_record: apply_sqlite_pragmas(dbapi_connection, pragmas)
+        )
+    return engine
+
+def isi_data(engine, jumlah_kelas, siswa_per_kelas):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(Semester.__table__.insert().values(
+            tahun_ajaran='2024/2025', semester='1', tanggal_mulai=date(2024, 7, 1),
+            tanggal_selesai=date(2024, 12, 20), status='Aktif', created_at=now, updated_at=now
+        ))
+        conn.execute(Siswa.__table__.insert(), [
+            {
+                'nisn': f'{k:03d}{i:05d}',
+                'nama': f'Siswa {k}-{i}',
+                'kelas': f'K{k}',
+                'created_at': now,
+                'updated_at': now
+            }
+            for k in range(jumlah_kelas) for i in range(siswa_per_kelas)
+        ])
+    with engine.connect() as conn:
+        kelas_siswa = {}
+        for row in conn.execute(select(Siswa.id, Siswa.kelas)):
+            kelas_siswa.setdefault(row.kelas, []).append(row.id)
+    return kelas_siswa
+
+def tulis_absensi(conn, siswa_ids, tanggal):
+    now = datetime.utcnow()
+    stmt = sqlite_insert(Absensi).values([
+        {
+            'siswa_id': siswa_id,
+            'tanggal': tanggal,
+            'status': random.choice(STATUS),
+            'semester_id': 1,
+            'created_at': now,
+            'updated_at': now
+        }
+        for siswa_id in siswa_ids
+    ])
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['siswa_id', 'tanggal', 'semester_id'],
+        set_={'status': stmt.excluded.status, 'updated_at': stmt.excluded.updated_at}
+    ))
+
+def baca_rekap(conn, siswa_ids):
+    return conn.execute(
+        select(Absensi.status, func.count(Absensi.id)).where(
+            Absensi.siswa_id.in_(siswa_ids)
+        ).group_by(Absensi.status)
+    ).all()
+
+def klien(path, pragmas, kelas_siswa, seed, selesai_pada, write_ratio, antrian):
+    """Satu proses klien: ulangi tulis/baca sampai waktu habis"""
+    engine = buat_engine(path, pragmas)
+    rng = random.Random(seed)
+    daftar_kelas = list(kelas_siswa)
+    hasil = {'baca': [], 'tulis': [], 'gagal': 0}
+
+    while time.time() < selesai_pada:
+        siswa_ids = kelas_siswa[rng.choice(daftar_kelas)]
+        jenis = 'tulis' if rng.random() < write_ratio else 'baca'
+        mulai = time.perf_counter()
+        try:
+            if jenis == 'tulis':
+                with engine.begin() as conn:
+                    tulis_absensi(conn, siswa_ids, date(2024, 8, 1) + timedelta(days=rng.randrange(120)))
+            else:
+                with engine.connect() as conn:
+                    baca_rekap(conn, siswa_ids)
+        except OperationalError:
+            # "database is locked" setelah batas tunggu habis
+            hasil['gagal'] += 1
+            continue
+        hasil[jenis].append(time.perf_counter() - mulai)
+
+    engine.dispose()
+    antrian.put(hasil)
+
+def persentil(values, q):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] * 1000
+
+def jalankan(nama, pragmas, args):
+    folder = tempfile.mkdtemp(prefix='bench_sqlite_')
+    try:
+        path = os.path.join(folder, 'bench.db')
+        engine = buat_engine(path, pragmas)
+        kelas_siswa = isi_data(engine, args.kelas, args.siswa)
+        engine.dispose()
+
+        antrian = multiprocessing.Queue()
+        selesai_pada = time.time() + args.seconds
+        proses = [
+            multiprocessing.Process(target=klien, args=(
+                path, pragmas, kelas_siswa, i, selesai_pada, args.write_ratio, antrian
+            ))
+            for i in range(args.clients)
+        ]
+        for p in proses:
+            p.start()
+        hasil = {'baca': [], 'tulis': [], 'gagal': 0}
+        for _ in proses:
+            bagian = antrian.get()
+            hasil['baca'] += bagian['baca']
+            hasil['tulis'] += bagian['tulis']
+            hasil['gagal'] += bagian['gagal']
+        for p in proses:
+            p.join()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    print(
+        f"{nama:<8} baca {len(hasil['baca']) / args.seconds:8.1f}/s "
+        f"(p95 {persentil(hasil['baca'], 0.95):7.1f} ms)  "
+        f"tulis {len(hasil['tulis']) / args.seconds:7.1f}/s "
+        f"(p95 {persentil(hasil['tulis'], 0.95):7.1f} ms)  "
+        f"locked {hasil['gagal']}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--kelas', type=int, default=12)
+    parser.add_argument('--siswa', type=int, default=36)
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    args = parser.parse_args()
+
+    print(f'{args.clients} klien, {args.seconds:g} detik, {args.write_ratio:.0%} tulis')
+    jalankan('sebelum', {}, args)
+    jalankan('sesudah', SQLITE_PRAGMAS, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark waktu dari proses mulai sampai request pertama dilayani.
+
+Menjalankan server pada salinan database berisi data, lalu mengukur waktu
+sampai GET /health pertama berhasil. Dibandingkan dua jalur startup:
+
+- sebelum: probe file, drop_all, create_all, dan seed setiap start (data hilang)
+- sesudah: create_app() memeriksa versi skema, seed hanya jika database kosong
+
+    python benchmarks/startup_time.py --kelas 20 --ulang 3
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from models import db, Absensi
+from schema_indexes import isi_data
+
+STARTUP_SEBELUM = '''
+import sqlite3
+from app import create_app
+from models import db
+from seed import seed_database
+with create_app().app_context():
+    conn = sqlite3.connect(db.engine.url.database)
+    conn.execute('SELECT name FROM sqlite_master WHERE type="table" LIMIT 1')
+    conn.close()
+    db.drop_all()
+    db.create_all()
+    seed_database()
+app = create_app()
+app.run(port={port}, use_reloader=False)
+'''
+
+STARTUP_SESUDAH = '''
+from app import create_app, init_database
+app = create_app()
+init_database(app)
+app.run(port={port}, use_reloader=False)
+'''
+
+def port_kosong():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def ukur_startup(kode, db_path, sumber_db):
+    shutil.copy2(sumber_db, db_path)
+    port = port_kosong()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+
+    mulai = time.perf_counter()
+    proses = subprocess.Popen(
+        [sys.executable, '-c', kode.format(port=port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if proses.poll() is not None:
+                raise RuntimeError('Server berhenti sebelum melayani request')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                    laporan = json.load(response).get('startup', {})
+                    return time.perf_counter() - mulai, laporan
+            except OSError:
+                time.sleep(0.01)
+    finally:
+        proses.terminate()
+        proses.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kelas', type=int, default=20)
+    parser.add_argument('--siswa', type=int, default=36)
+    parser.add_argument('--hari', type=int, default=120)
+    parser.add_argument('--ulang', type=int, default=3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        sumber_db = os.path.join(folder, 'sumber.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{sumber_db}'})
+        with app.app_context():
+            isi_data(args.kelas, args.siswa, args.hari)
+            print(f'Database uji: {Absensi.query.count()} absensi, {os.path.getsize(sumber_db) // 1024} KB')
+            db.session.remove()
+            db.engine.dispose()
+
+        db_path = os.path.join(folder, 'database.db')
+        for nama, kode in (('sebelum', STARTUP_SEBELUM), ('sesudah', STARTUP_SESUDAH)):
+            hasil = [ukur_startup(kode, db_path, sumber_db) for _ in range(args.ulang)]
+            median = statistics.median(detik for detik, _ in hasil)
+            laporan = hasil[-1][1]
+            rincian = ', '.join(f'{fase} {detik:.2f} s' for fase, detik in laporan.items())
+            print(f'{nama:<8} request pertama {median:.2f} s (median {args.ulang}x){"  [" + rincian + "]" if rincian else ""}')
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
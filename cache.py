@@ -0,0 +1,61 @@
+"""Cache per proses yang divalidasi dengan generasi di tabel cache_generasi.
+
+Setiap jenis data yang di-cache punya nama generasi. Route penulis menaikkan
+generasinya dalam transaksi yang sama dengan perubahan data, sehingga proses
+worker lain tahu cache-nya basi.
+"""
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, CacheGenerasi
+
+def get_generasi(nama):
+    """Generasi data bernama yang tercatat di database"""
+    return db.session.query(CacheGenerasi.generasi).filter_by(nama=nama).scalar() or 0
+
+def naikkan_generasi(nama):
+    """Tandai perubahan data bernama untuk semua proses, tanpa commit"""
+    now = datetime.utcnow()
+    stmt = sqlite_insert(CacheGenerasi).values(
+        nama=nama,
+        generasi=1,
+        created_at=now,
+        updated_at=now
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['nama'],
+        set_={
+            'generasi': CacheGenerasi.generasi + 1,
+            'updated_at': stmt.excluded.updated_at
+        }
+    ))
+
+def get_cached_generasi(cache, lock, nama, loader):
+    """Ambil nilai cache proses yang divalidasi dengan generasi di database.
+    
+    Perubahan di proses ini langsung terlihat karena route penulis
+    mengosongkan cache setelah commit; perubahan dari proses lain terdeteksi
+    lewat generasi yang dicek paling sering tiap CACHE_GENERASI_INTERVAL detik.
+    """
+    interval = current_app.config.get('CACHE_GENERASI_INTERVAL', 2)
+    now = time.monotonic()
+    
+    with lock:
+        if cache and now - cache['dicek'] < interval:
+            return cache['nilai']
+    
+    generasi = get_generasi(nama)
+    
+    with lock:
+        if cache and cache['generasi'] == generasi:
+            cache['dicek'] = now
+            return cache['nilai']
+    
+    nilai = loader()
+    
+    with lock:
+        cache.update(nilai=nilai, generasi=generasi, dicek=now)
+    return nilai
@@ -0,0 +1,421 @@
+"""Backup inkremental berbasis halaman untuk database SQLite.
+
+Setiap rantai dimulai dari backup penuh berisi semua halaman database,
+diikuti backup inkremental yang hanya berisi halaman yang berubah sejak
+backup sebelumnya (dibandingkan lewat hash per halaman). Semua backup
+dicatat di catalog.json. Restore ke suatu waktu membangun ulang file
+database dari backup penuh rantainya ditambah inkremental sampai titik itu.
+
+Format file (gzip): MAGIC, page_size dan page_count (uint32), lalu
+berulang nomor halaman (uint32) diikuti isi halaman.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+MAGIC = b'MAGPAGE1'
+HEADER = struct.Struct('<II')
+NOMOR_HALAMAN = struct.Struct('<I')
+HASH_SIZE = 8
+ID_FORMAT = '%Y%m%d_%H%M%S_%f'
+# Percobaan membuka snapshot yang bisa dibaca langsung dari file, dan jumlah
+# halaman per pembacaan
+PERCOBAAN_SNAPSHOT = 5
+HALAMAN_PER_BACA = 256
+
+# Jumlah titik yang dipertahankan per tingkat: terbaru per jam/hari/minggu
+RETENSI_DEFAULT = {'jam': 24, 'hari': 7, 'minggu': 4}
+# Rantai baru (backup penuh) dimulai setelah sekian hari
+FULL_SETIAP_HARI_DEFAULT = 7
+# Lock file yang lebih tua dari ini dianggap sisa proses yang mati
+LOCK_KEDALUWARSA = 3600
+
+class BackupSedangBerjalan(Exception):
+    pass
+
+def get_folder(instance_path):
+    return os.path.join(instance_path, 'backups', 'inkremental')
+
+# === CATALOG ===
+
+def baca_catalog(folder):
+    path = os.path.join(folder, 'catalog.json')
+    if not os.path.exists(path):
+        return {'entries': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def tulis_catalog(folder, catalog):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'catalog.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def catat_backup_terakhir(folder, waktu=None):
+    """Simpan waktu backup apa pun (termasuk download manual) untuk info database.
+
+    Disimpan terpisah dari catalog.json agar tidak perlu lock backup.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'last_backup')
+    with open(path + f'.{os.getpid()}.tmp', 'w', encoding='utf-8') as f:
+        f.write((waktu or datetime.now()).isoformat())
+    os.replace(path + f'.{os.getpid()}.tmp', path)
+
+def baca_backup_terakhir(folder):
+    path = os.path.join(folder, 'last_backup')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read().strip() or None
+
+@contextmanager
+def kunci_backup(folder):
+    """Lock antar proses agar hanya satu backup/prune yang berjalan"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'backup.lock')
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if time.time() - os.path.getmtime(path) < LOCK_KEDALUWARSA:
+            raise BackupSedangBerjalan('Backup lain sedang berjalan')
+        os.remove(path)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+# === FILE HALAMAN ===
+
+def tulis_file_halaman(path, page_size, page_count, halaman):
+    """Tulis (pgno, data) berurutan ke file halaman terkompresi; kembalikan jumlah halaman"""
+    jumlah = 0
+    with gzip.open(path + '.tmp', 'wb', compresslevel=6) as out:
+        out.write(MAGIC + HEADER.pack(page_size, page_count))
+        for pgno, data in halaman:
+            out.write(NOMOR_HALAMAN.pack(pgno))
+            out.write(data)
+            jumlah += 1
+    os.replace(path + '.tmp', path)
+    return jumlah
+
+def baca_file_halaman(path):
+    """Iterasi (pgno, data) dari file halaman"""
+    with gzip.open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{os.path.basename(path)} bukan file backup halaman')
+        page_size, _ = HEADER.unpack(f.read(HEADER.size))
+        while True:
+            nomor = f.read(NOMOR_HALAMAN.size)
+            if not nomor:
+                break
+            yield NOMOR_HALAMAN.unpack(nomor)[0], f.read(page_size)
+
+# === SNAPSHOT HALAMAN ===
+
+# Descriptor baca file database per path. Tidak pernah ditutup: close() pada
+# file database melepas lock POSIX (fcntl) milik semua koneksi SQLite di
+# proses ini, sehingga proses lain bisa menganggap database tidak dipakai.
+descriptor_database = {}
+descriptor_lock = threading.Lock()
+
+def buka_descriptor(db_path):
+    path = os.path.abspath(db_path)
+    with descriptor_lock:
+        fd = descriptor_database.get(path)
+        # File diganti (inode baru): buka lagi, descriptor lama dibiarkan
+        if fd is None or os.fstat(fd).st_ino != os.stat(path).st_ino:
+            fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            descriptor_database[path] = fd
+        return fd
+
+def baca_descriptor(fd, offset, ukuran):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, ukuran, offset)
+    with descriptor_lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, ukuran)
+
+def wal_tersalin(db_path):
+    """True jika semua frame WAL sudah ada di file database (checkpoint PASSIVE, tidak menunggu penulis).
+
+    Checkpoint lain yang sedang berjalan menghasilkan (1, -1, -1); itu tidak
+    dianggap tersalin. Bukan mode WAL menghasilkan (0, -1, -1).
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        busy, log, checkpointed = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    finally:
+        conn.close()
+    return busy == 0 and log == checkpointed
+
+@contextmanager
+def snapshot_halaman(db_path):
+    """Baca halaman database langsung dari file di dalam satu transaksi baca.
+
+    Setelah transaksi baca dimulai, checkpoint PASSIVE dari koneksi lain
+    memastikan semua frame WAL sampai snapshot ini sudah tersalin ke file.
+    Selama transaksi aktif, checkpoint tidak menyalin frame yang lebih baru
+    ke file, jadi isi file sama dengan snapshot dan penulis tidak tertahan.
+    Jika WAL tidak pernah tersalin penuh karena penulis terus aktif, snapshot
+    disalin lewat backup API ke file sementara (ruang disk sebesar database).
+    Menghasilkan (baca, page_size, page_count); baca(pgno, jumlah) mengembalikan
+    isi halaman berurutan mulai pgno.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA query_only=ON')
+    try:
+        for _ in range(PERCOBAAN_SNAPSHOT):
+            conn.execute('BEGIN')
+            conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            if wal_tersalin(db_path):
+                fd = buka_descriptor(db_path)
+
+                def baca(pgno, jumlah):
+                    data = baca_descriptor(fd, (pgno - 1) * page_size, jumlah * page_size)
+                    if len(data) != jumlah * page_size:
+                        raise ValueError('File database lebih pendek dari snapshot')
+                    return data
+
+                yield baca, page_size, page_count
+                conn.execute('COMMIT')
+                return
+            conn.execute('COMMIT')
+            time.sleep(0.05)
+        with snapshot_sementara(conn, db_path) as (baca, page_size, page_count):
+            yield baca, page_size, page_count
+    finally:
+        conn.close()
+
+@contextmanager
+def snapshot_sementara(conn, db_path):
+    """Salinan snapshot lewat backup API untuk penulis yang tidak pernah berhenti"""
+    fd, snapshot_path = tempfile.mkstemp(
+        prefix=os.path.basename(db_path) + '.snapshot-', dir=os.path.dirname(os.path.abspath(db_path))
+    )
+    os.close(fd)
+    try:
+        tujuan = sqlite3.connect(snapshot_path)
+        try:
+            conn.backup(tujuan)
+            page_size = tujuan.execute('PRAGMA page_size').fetchone()[0]
+            page_count = tujuan.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            tujuan.close()
+        # File sementara tidak dipakai koneksi lain, jadi aman dibuka biasa
+        with open(snapshot_path, 'rb') as f:
+            def baca(pgno, jumlah):
+                f.seek((pgno - 1) * page_size)
+                return f.read(jumlah * page_size)
+
+            yield baca, page_size, page_count
+    finally:
+        os.remove(snapshot_path)
+
+def iter_halaman(baca, page_size, page_count):
+    """Iterasi (pgno, data) dengan membaca HALAMAN_PER_BACA halaman sekaligus"""
+    for awal in range(1, page_count + 1, HALAMAN_PER_BACA):
+        jumlah = min(HALAMAN_PER_BACA, page_count - awal + 1)
+        data = baca(awal, jumlah)
+        for i in range(jumlah):
+            yield awal + i, data[i * page_size:(i + 1) * page_size]
+
+# === BACKUP ===
+
+def perlu_backup_penuh(catalog, hash_path, page_size, full_setiap_hari, sekarang):
+    entries = catalog['entries']
+    if not entries or not os.path.exists(hash_path):
+        return True
+    terakhir = entries[-1]
+    if terakhir['page_size'] != page_size:
+        return True
+    # Id rantai adalah waktu backup penuh pertamanya, walau file-nya sudah digabung
+    awal_rantai = datetime.strptime(terakhir['rantai'], ID_FORMAT)
+    return sekarang - awal_rantai >= timedelta(days=full_setiap_hari)
+
+def jalankan_backup(db_path, folder, penuh=False, full_setiap_hari=FULL_SETIAP_HARI_DEFAULT,
+                    retensi=RETENSI_DEFAULT, sekarang=None):
+    """Buat backup penuh atau inkremental lalu terapkan retensi.
+
+    Kembalikan entri catalog baru, atau None jika tidak ada halaman berubah.
+    """
+    sekarang = sekarang or datetime.now()
+    hash_path = os.path.join(folder, 'hashes.bin')
+
+    with kunci_backup(folder):
+        catalog = baca_catalog(folder)
+        mulai = time.perf_counter()
+
+        with snapshot_halaman(db_path) as (baca, page_size, page_count):
+            penuh = penuh or perlu_backup_penuh(catalog, hash_path, page_size, full_setiap_hari, sekarang)
+            hash_lama = b''
+            if not penuh:
+                with open(hash_path, 'rb') as f:
+                    hash_lama = f.read()
+
+            hash_baru = bytearray()
+
+            def halaman_berubah():
+                for pgno, data in iter_halaman(baca, page_size, page_count):
+                    digest = hashlib.blake2b(data, digest_size=HASH_SIZE).digest()
+                    hash_baru.extend(digest)
+                    offset = (pgno - 1) * HASH_SIZE
+                    if penuh or hash_lama[offset:offset + HASH_SIZE] != digest:
+                        yield pgno, data
+
+            entry_id = sekarang.strftime(ID_FORMAT)
+            nama_file = f"{'full' if penuh else 'inc'}_{entry_id}.pages.gz"
+            file_path = os.path.join(folder, nama_file)
+            jumlah = tulis_file_halaman(file_path, page_size, page_count, halaman_berubah())
+
+        jumlah_lama = len(hash_lama) // HASH_SIZE
+        if not penuh and jumlah == 0 and page_count == jumlah_lama:
+            os.remove(file_path)
+            return None
+
+        entry = {
+            'id': entry_id,
+            'jenis': 'full' if penuh else 'incremental',
+            'rantai': entry_id if penuh else catalog['entries'][-1]['rantai'],
+            'waktu': sekarang.isoformat(),
+            'file': nama_file,
+            'page_size': page_size,
+            'page_count': page_count,
+            'halaman': jumlah,
+            'ukuran': os.path.getsize(file_path),
+            'durasi_detik': round(time.perf_counter() - mulai, 3)
+        }
+        catalog['entries'].append(entry)
+        terapkan_retensi(folder, catalog, retensi, sekarang)
+        tulis_catalog(folder, catalog)
+
+        # Hash ditulis setelah catalog: jika proses terhenti di antaranya,
+        # inkremental berikutnya hanya berisi halaman lebih banyak
+        with open(hash_path + '.tmp', 'wb') as f:
+            f.write(hash_baru)
+        os.replace(hash_path + '.tmp', hash_path)
+        catat_backup_terakhir(folder, sekarang)
+        return entry
+
+# === RETENSI ===
+
+TINGKAT_RETENSI = {
+    'jam': lambda waktu: waktu.strftime('%Y%m%d%H'),
+    'hari': lambda waktu: waktu.strftime('%Y%m%d'),
+    'minggu': lambda waktu: waktu.isocalendar()[:2],
+}
+
+def pilih_titik(entries, retensi, sekarang):
+    """Id entri yang dipertahankan: semua entri satu jam terakhir, lalu terbaru per jam/hari/minggu"""
+    dipertahankan = {
+        entry['id'] for entry in entries
+        if sekarang - datetime.fromisoformat(entry['waktu']) < timedelta(hours=1)
+    }
+    if entries:
+        dipertahankan.add(entries[-1]['id'])
+    for tingkat, jumlah in retensi.items():
+        bucket = TINGKAT_RETENSI[tingkat]
+        terpilih = {}
+        for entry in reversed(entries):
+            kunci = bucket(datetime.fromisoformat(entry['waktu']))
+            if kunci not in terpilih:
+                if len(terpilih) >= jumlah:
+                    break
+                terpilih[kunci] = entry['id']
+        dipertahankan.update(terpilih.values())
+    return dipertahankan
+
+def gabung_entri(folder, lama, baru):
+    """Gabungkan halaman entri lama ke entri berikutnya agar entri lama bisa dihapus.
+
+    Halaman entri baru menang. Jika entri lama adalah backup penuh, entri baru
+    ikut menjadi backup penuh (ditulis ulang secara streaming).
+    """
+    path_baru = os.path.join(folder, baru['file'])
+    halaman_baru = dict(baca_file_halaman(path_baru))
+    page_count = baru['page_count']
+
+    def gabungan():
+        for pgno, data in baca_file_halaman(os.path.join(folder, lama['file'])):
+            if pgno <= page_count:
+                yield pgno, halaman_baru.pop(pgno, data)
+        yield from sorted(halaman_baru.items())
+
+    if lama['jenis'] == 'full':
+        baru['jenis'] = 'full'
+        nama_file = 'full_' + baru['id'] + '.pages.gz'
+    else:
+        nama_file = baru['file']
+    baru['halaman'] = tulis_file_halaman(
+        os.path.join(folder, nama_file), baru['page_size'], page_count, gabungan()
+    )
+    if nama_file != baru['file']:
+        os.remove(path_baru)
+        baru['file'] = nama_file
+    baru['ukuran'] = os.path.getsize(os.path.join(folder, nama_file))
+    os.remove(os.path.join(folder, lama['file']))
+
+def terapkan_retensi(folder, catalog, retensi, sekarang):
+    """Hapus titik di luar retensi; entri di tengah rantai digabung ke penerusnya"""
+    dipertahankan = pilih_titik(catalog['entries'], retensi, sekarang)
+    hasil = []
+
+    rantai_list = {}
+    for entry in catalog['entries']:
+        rantai_list.setdefault(entry['rantai'], []).append(entry)
+
+    for entries in rantai_list.values():
+        # Ekor rantai tidak dibutuhkan entri mana pun: langsung hapus
+        while entries and entries[-1]['id'] not in dipertahankan:
+            os.remove(os.path.join(folder, entries.pop()['file']))
+        i = 0
+        while i < len(entries) - 1:
+            if entries[i]['id'] in dipertahankan:
+                i += 1
+                continue
+            gabung_entri(folder, entries[i], entries[i + 1])
+            entries.pop(i)
+        hasil.extend(entries)
+
+    catalog['entries'] = sorted(hasil, key=lambda e: e['waktu'])
+
+# === RESTORE KE SUATU WAKTU ===
+
+def cari_titik(catalog, waktu):
+    """Entri terakhir pada atau sebelum waktu, beserta rantai yang dibutuhkan"""
+    if waktu.tzinfo is not None:
+        # Catalog mencatat waktu lokal tanpa zona waktu
+        waktu = waktu.astimezone().replace(tzinfo=None)
+    kandidat = [e for e in catalog['entries'] if datetime.fromisoformat(e['waktu']) <= waktu]
+    if not kandidat:
+        return None, []
+    target = kandidat[-1]
+    rantai = [e for e in catalog['entries'] if e['rantai'] == target['rantai'] and e['waktu'] <= target['waktu']]
+    return target, rantai
+
+def bangun_database(folder, rantai, out_path):
+    """Susun file database dari backup penuh dan inkremental rantai, berurutan"""
+    target = rantai[-1]
+    if rantai[0]['jenis'] != 'full':
+        raise ValueError(f"Rantai backup {target['rantai']} tidak punya backup penuh")
+    page_size = target['page_size']
+    with open(out_path, 'wb') as out:
+        for entry in rantai:
+            for pgno, data in baca_file_halaman(os.path.join(folder, entry['file'])):
+                out.seek((pgno - 1) * page_size)
+                out.write(data)
+        out.truncate(target['page_count'] * page_size)
@@ -0,0 +1,225 @@
+"""Migrasi skema untuk database yang sudah berisi data.
+
+db.create_all() hanya membuat tabel yang belum ada; kolom dan index baru
+pada tabel lama tidak ikut dibuat. Langkah di MIGRASI diterapkan berurutan
+dan dicatat di tabel schema_version, sehingga setiap langkah hanya berjalan
+sekali per database. Beberapa worker bisa menjalankan upgrade bersamaan saat
+startup; kunci_upgrade() membuat mereka bergiliran, sehingga worker berikutnya
+hanya melihat versi yang sudah terbaru.
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Legger, Semester, SchemaVersion
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+def tambah_kolom(tabel, kolom, definisi):
+    """ALTER TABLE ADD COLUMN jika kolom belum ada"""
+    kolom_ada = {c['name'] for c in inspect(db.session.connection()).get_columns(tabel)}
+    if kolom not in kolom_ada:
+        db.session.execute(text(f'ALTER TABLE {tabel} ADD COLUMN {kolom} {definisi}'))
+
+def buat_index(nama, tabel, kolom, unique=False):
+    db.session.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {nama} ON {tabel} ({', '.join(kolom)})"
+    ))
+
+def hapus_duplikat(tabel, kolom):
+    """Sisakan baris terbaru (id terbesar) untuk setiap kombinasi kolom"""
+    hasil = db.session.execute(text(
+        f"DELETE FROM {tabel} WHERE id NOT IN "
+        f"(SELECT MAX(id) FROM {tabel} GROUP BY {', '.join(kolom)})"
+    ))
+    if hasil.rowcount:
+        print(f"  {hasil.rowcount} baris duplikat dihapus dari {tabel}")
+
+def migrasi_tabel_baru():
+    # Tabel pertemuan, bitmap, rekap, versi bobot, dll. beserta index-nya
+    db.session.commit()
+    db.create_all()
+    tambah_kolom('legger', 'bobot_versi_id', 'INTEGER REFERENCES bobot_nilai_versi (id)')
+
+# Index unik yang menjadi target upsert; data lama bisa berisi duplikat
+INDEX_UNIK = [
+    ('ix_absensi_siswa_tanggal_semester', 'absensi', ['siswa_id', 'tanggal', 'semester_id']),
+    ('ix_nilai_formatif_siswa_materi_semester', 'nilai_formatif', ['siswa_id', 'materi', 'semester_id']),
+    ('ix_nilai_sumatif_siswa_jenis_semester', 'nilai_sumatif', ['siswa_id', 'jenis', 'semester_id']),
+    ('ix_legger_siswa_semester', 'legger', ['siswa_id', 'semester_id']),
+]
+
+def migrasi_index_unik():
+    for nama, tabel, kolom in INDEX_UNIK:
+        hapus_duplikat(tabel, kolom)
+        buat_index(nama, tabel, kolom, unique=True)
+
+# Index untuk filter yang dipakai route paling sering
+INDEX_QUERY = [
+    ('ix_siswa_kelas', 'siswa', ['kelas']),
+    ('ix_kelas_nama', 'kelas', ['nama']),
+    ('ix_materi_judul', 'materi', ['judul']),
+    ('ix_absensi_semester_tanggal', 'absensi', ['semester_id', 'tanggal']),
+    ('ix_nilai_formatif_semester_tanggal', 'nilai_formatif', ['semester_id', 'tanggal']),
+    ('ix_jurnal_tanggal', 'jurnal', ['tanggal']),
+    ('ix_jurnal_kelas_tanggal', 'jurnal', ['kelas', 'tanggal']),
+    ('ix_legger_semester_bobot', 'legger', ['semester_id', 'bobot_versi_id']),
+]
+
+def migrasi_index_query():
+    for nama, tabel, kolom in INDEX_QUERY:
+        buat_index(nama, tabel, kolom)
+    # Statistik untuk query planner setelah index baru dibuat
+    db.session.execute(text('ANALYZE'))
+
+def migrasi_data_turunan():
+    from routes.absensi_routes import rebuild_pertemuan, rebuild_absensi_bitmaps
+    from routes.dashboard_routes import update_rekap_absensi_harian, update_rekap_nilai_harian
+    from routes.legger_routes import calculate_legger_bulk, save_legger_rows
+
+    for semester in Semester.query.all():
+        rebuild_pertemuan(semester.id)
+        rebuild_absensi_bitmaps(semester.id)
+        update_rekap_absensi_harian(semester.id)
+        update_rekap_nilai_harian(semester.id)
+
+        # Penyebut kehadiran kini jumlah pertemuan: hitung ulang legger tersimpan
+        # (per LEGGER_CHUNK_SIZE siswa di dalam calculate/save)
+        siswa_ids = [
+            siswa_id for (siswa_id,) in db.session.query(Legger.siswa_id).filter(
+                Legger.semester_id == semester.id
+            )
+        ]
+        if siswa_ids:
+            save_legger_rows(semester.id, calculate_legger_bulk(semester, siswa_ids=siswa_ids))
+
+# (versi, deskripsi, langkah) - hanya boleh ditambah di akhir
+MIGRASI = [
+    (1, 'Tabel baru dan kolom legger.bobot_versi_id', migrasi_tabel_baru),
+    (2, 'Hapus duplikat dan buat index unik absensi/nilai/legger', migrasi_index_unik),
+    (3, 'Index untuk filter kelas, semester, dan tanggal', migrasi_index_query),
+    (4, 'Bangun pertemuan, bitmap absensi, rekap harian, dan legger dari data lama', migrasi_data_turunan),
+]
+
+LATEST_VERSION = MIGRASI[-1][0]
+
+def get_schema_version():
+    return db.session.query(func.max(SchemaVersion.versi)).scalar() or 0
+
+def catat_versi(versi, deskripsi):
+    now = datetime.utcnow()
+    db.session.execute(sqlite_insert(SchemaVersion).values(
+        versi=versi,
+        deskripsi=deskripsi,
+        created_at=now,
+        updated_at=now
+    ).on_conflict_do_nothing(index_elements=['versi']))
+
+# Batas tunggu (detik) worker lain selesai upgrade
+UPGRADE_LOCK_TIMEOUT = 600
+
+def kunci_file(fd, batas):
+    """Kunci eksklusif file lock (flock, atau msvcrt di Windows), menunggu sampai batas"""
+    while True:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if time.monotonic() > batas:
+                raise TimeoutError(f'Upgrade database lain belum selesai setelah {UPGRADE_LOCK_TIMEOUT} detik')
+            time.sleep(0.1)
+
+@contextmanager
+def kunci_upgrade():
+    """Lock antar proses selama upgrade pada file <database>.upgrade.lock.
+
+    Lock lepas sendiri jika proses mati. File dihapus setelah upgrade;
+    worker yang sempat membuka file lama mengunci ulang file yang baru.
+    """
+    db_path = db.engine.url.database
+    if not db_path or db_path == ':memory:':
+        yield
+        return
+    lock_path = os.path.abspath(db_path) + '.upgrade.lock'
+    batas = time.monotonic() + UPGRADE_LOCK_TIMEOUT
+    while True:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+        try:
+            kunci_file(fd, batas)
+            sama = os.path.samestat(os.fstat(fd), os.stat(lock_path))
+        except FileNotFoundError:
+            sama = False
+        except BaseException:
+            os.close(fd)
+            raise
+        if sama:
+            break
+        os.close(fd)
+    try:
+        yield
+    finally:
+        if fcntl:
+            # Dihapus selagi masih terkunci: worker yang menunggu melihat file lain
+            os.remove(lock_path)
+            os.close(fd)
+        else:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                # Windows: masih dibuka worker lain, yang akan menghapusnya
+                pass
+
+def upgrade_database():
+    """Buat skema untuk database baru, atau terapkan langkah migrasi yang belum tercatat"""
+    with kunci_upgrade():
+        return terapkan_migrasi()
+
+def terapkan_migrasi():
+    if not inspect(db.engine).get_table_names():
+        # Database baru: langsung skema terbaru dari models.py
+        db.create_all()
+        stamp_schema_version()
+        db.session.commit()
+        print(f"Skema database dibuat (versi {LATEST_VERSION})")
+        return [versi for versi, _, _ in MIGRASI]
+
+    SchemaVersion.__table__.create(db.engine, checkfirst=True)
+    versi_sekarang = get_schema_version()
+    if versi_sekarang > LATEST_VERSION:
+        raise RuntimeError(
+            f'Skema database versi {versi_sekarang} lebih baru dari aplikasi (versi {LATEST_VERSION})'
+        )
+    diterapkan = []
+
+    for versi, deskripsi, langkah in MIGRASI:
+        if versi <= versi_sekarang:
+            continue
+        mulai = time.perf_counter()
+        try:
+            langkah()
+            catat_versi(versi, deskripsi)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        print(f"Migrasi {versi}: {deskripsi} ({time.perf_counter() - mulai:.2f} detik)")
+        diterapkan.append(versi)
+
+    return diterapkan
+
+def stamp_schema_version():
+    """Tandai database yang baru dibuat dari models.py sebagai versi terbaru, tanpa commit"""
+    for versi, deskripsi, _ in MIGRASI:
+        catat_versi(versi, deskripsi)
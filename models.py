@@ -11,7 +11,7 @@ class BaseModel(db.Model):
 
 class Kelas(BaseModel):
     __tablename__ = 'kelas'
-    nama = db.Column(db.String(50), nullable=False)
+    nama = db.Column(db.String(50), nullable=False, index=True)
     tingkat = db.Column(db.String(10), nullable=False)
     jurusan = db.Column(db.String(50), nullable=False)
     wali_kelas = db.Column(db.String(100))
@@ -25,7 +25,7 @@ class Siswa(BaseModel):
     __tablename__ = 'siswa'
     nisn = db.Column(db.String(20), unique=True, nullable=False)
     nama = db.Column(db.String(100), nullable=False)
-    kelas = db.Column(db.String(50), nullable=False)
+    kelas = db.Column(db.String(50), nullable=False, index=True)
     kelas_id = db.Column(db.Integer, db.ForeignKey('kelas.id'))
     jenis_kelamin = db.Column(db.String(1), default='L')
     tempat_lahir = db.Column(db.String(50))
@@ -41,7 +41,7 @@ class Siswa(BaseModel):
 
 class Materi(BaseModel):
     __tablename__ = 'materi'
-    judul = db.Column(db.String(200), nullable=False)
+    judul = db.Column(db.String(200), nullable=False, index=True)
     kelas = db.Column(db.String(50), nullable=False)
     kelas_id = db.Column(db.Integer, db.ForeignKey('kelas.id'))
     kategori = db.Column(db.String(50), nullable=False)
@@ -62,13 +62,32 @@ class Semester(BaseModel):
 
 class Absensi(BaseModel):
     __tablename__ = 'absensi'
+    __table_args__ = (
+        db.Index('ix_absensi_siswa_tanggal_semester', 'siswa_id', 'tanggal', 'semester_id', unique=True),
+        db.Index('ix_absensi_semester_tanggal', 'semester_id', 'tanggal'),
+    )
     siswa_id = db.Column(db.Integer, db.ForeignKey('siswa.id'), nullable=False)
     tanggal = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), nullable=False)
     semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'))
 
+class AbsensiBitmap(BaseModel):
+    __tablename__ = 'absensi_bitmap'
+    __table_args__ = (
+        db.Index('ix_absensi_bitmap_siswa_semester', 'siswa_id', 'semester_id', unique=True),
+    )
+    siswa_id = db.Column(db.Integer, db.ForeignKey('siswa.id'), nullable=False)
+    semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
+    # Satu byte kode status per hari, dihitung dari tanggal_awal
+    tanggal_awal = db.Column(db.Date, nullable=False)
+    slots = db.Column(db.LargeBinary, nullable=False, default=b'')
+
 class NilaiFormatif(BaseModel):
     __tablename__ = 'nilai_formatif'
+    __table_args__ = (
+        db.Index('ix_nilai_formatif_siswa_materi_semester', 'siswa_id', 'materi', 'semester_id', unique=True),
+        db.Index('ix_nilai_formatif_semester_tanggal', 'semester_id', 'tanggal'),
+    )
     siswa_id = db.Column(db.Integer, db.ForeignKey('siswa.id'), nullable=False)
     materi = db.Column(db.String(100), nullable=False)
     materi_id = db.Column(db.Integer, db.ForeignKey('materi.id'))
@@ -78,6 +97,9 @@ class NilaiFormatif(BaseModel):
 
 class NilaiSumatif(BaseModel):
     __tablename__ = 'nilai_sumatif'
+    __table_args__ = (
+        db.Index('ix_nilai_sumatif_siswa_jenis_semester', 'siswa_id', 'jenis', 'semester_id', unique=True),
+    )
     siswa_id = db.Column(db.Integer, db.ForeignKey('siswa.id'), nullable=False)
     jenis = db.Column(db.String(10), nullable=False)
     tanggal = db.Column(db.Date, nullable=False)
@@ -86,7 +108,10 @@ class NilaiSumatif(BaseModel):
 
 class Jurnal(BaseModel):
     __tablename__ = 'jurnal'
-    tanggal = db.Column(db.Date, nullable=False)
+    __table_args__ = (
+        db.Index('ix_jurnal_kelas_tanggal', 'kelas', 'tanggal'),
+    )
+    tanggal = db.Column(db.Date, nullable=False, index=True)
     kelas = db.Column(db.String(50), nullable=False)
     kelas_id = db.Column(db.Integer, db.ForeignKey('kelas.id'))
     mata_pelajaran = db.Column(db.String(50), nullable=False)
@@ -106,6 +131,43 @@ class Jurnal(BaseModel):
     tanda_tangan = db.Column(db.Boolean, default=False)
     semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'))
 
+class Pertemuan(BaseModel):
+    __tablename__ = 'pertemuan'
+    __table_args__ = (
+        db.Index('ix_pertemuan_semester_kelas_tanggal', 'semester_id', 'kelas', 'tanggal', 'jam_ke', unique=True),
+    )
+    semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
+    kelas = db.Column(db.String(50), nullable=False)
+    tanggal = db.Column(db.Date, nullable=False)
+    # '' untuk pertemuan yang hanya tercatat dari absensi harian
+    jam_ke = db.Column(db.String(10), nullable=False, default='')
+
+class RekapAbsensiHarian(BaseModel):
+    __tablename__ = 'rekap_absensi_harian'
+    __table_args__ = (
+        db.Index('ix_rekap_absensi_harian_semester_kelas_tanggal', 'semester_id', 'kelas', 'tanggal', unique=True),
+    )
+    semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
+    kelas = db.Column(db.String(50), nullable=False)
+    tanggal = db.Column(db.Date, nullable=False)
+    hadir = db.Column(db.Integer, nullable=False, default=0)
+    sakit = db.Column(db.Integer, nullable=False, default=0)
+    ijin = db.Column(db.Integer, nullable=False, default=0)
+    tidak_hadir = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class RekapNilaiHarian(BaseModel):
+    __tablename__ = 'rekap_nilai_harian'
+    __table_args__ = (
+        db.Index('ix_rekap_nilai_harian_semester_kelas_tanggal', 'semester_id', 'kelas', 'tanggal', unique=True),
+    )
+    semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
+    kelas = db.Column(db.String(50), nullable=False)
+    tanggal = db.Column(db.Date, nullable=False)
+    # Nilai formatif: jumlah dan banyaknya, rata-rata = jumlah_nilai / jumlah_data
+    jumlah_nilai = db.Column(db.Integer, nullable=False, default=0)
+    jumlah_data = db.Column(db.Integer, nullable=False, default=0)
+
 class Pengguna(BaseModel):
     __tablename__ = 'pengguna'
     nama = db.Column(db.String(100), nullable=False)
@@ -120,8 +182,24 @@ class BobotNilai(BaseModel):
     uas = db.Column(db.Integer, default=30)
     absensi = db.Column(db.Integer, default=20)
 
+class BobotNilaiVersi(BaseModel):
+    __tablename__ = 'bobot_nilai_versi'
+    __table_args__ = (
+        db.Index('ix_bobot_nilai_versi_semester', 'semester_id', 'versi', unique=True),
+    )
+    semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
+    versi = db.Column(db.Integer, nullable=False)
+    formatif = db.Column(db.Integer, nullable=False)
+    uts = db.Column(db.Integer, nullable=False)
+    uas = db.Column(db.Integer, nullable=False)
+    absensi = db.Column(db.Integer, nullable=False)
+
 class Legger(BaseModel):
     __tablename__ = 'legger'
+    __table_args__ = (
+        db.Index('ix_legger_siswa_semester', 'siswa_id', 'semester_id', unique=True),
+        db.Index('ix_legger_semester_bobot', 'semester_id', 'bobot_versi_id'),
+    )
     siswa_id = db.Column(db.Integer, db.ForeignKey('siswa.id'), nullable=False)
     semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
     presentase_kehadiran = db.Column(db.Float, default=0)
@@ -129,4 +207,18 @@ class Legger(BaseModel):
     nilai_uts = db.Column(db.Float, default=0)
     nilai_uas = db.Column(db.Float, default=0)
     nilai_akhir = db.Column(db.Float, default=0)
-    predikat = db.Column(db.String(10))
\ No newline at end of file
+    predikat = db.Column(db.String(10))
+    bobot_versi_id = db.Column(db.Integer, db.ForeignKey('bobot_nilai_versi.id'))
+
+class CacheGenerasi(BaseModel):
+    __tablename__ = 'cache_generasi'
+    # Dinaikkan setiap data yang di-cache per proses berubah, agar proses
+    # worker lain tahu cache-nya basi
+    nama = db.Column(db.String(50), unique=True, nullable=False)
+    generasi = db.Column(db.Integer, nullable=False, default=0)
+
+class SchemaVersion(BaseModel):
+    __tablename__ = 'schema_version'
+    # Satu baris per langkah migrasi yang sudah diterapkan (lihat migrations.py)
+    versi = db.Column(db.Integer, unique=True, nullable=False)
+    deskripsi = db.Column(db.String(200))
@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
-from models import db, Absensi, Siswa, Semester
-from datetime import datetime
+from models import db, Absensi, AbsensiBitmap, Siswa, Semester, Pertemuan, Jurnal
+from datetime import datetime, timedelta, date
+from sqlalchemy import func, and_, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from routes.legger_routes import refresh_legger
+from routes.dashboard_routes import invalidate_dashboard_cache, update_rekap_absensi_harian, publish_dashboard_event
+from routes.semester_routes import get_active_semester
 
 absensi_bp = Blueprint('absensi', __name__)
 
@@ -16,37 +21,129 @@ def get_absensi():
         tanggal = datetime.strptime(tanggal_str, '%Y-%m-%d').date()
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
-        # Get siswa berdasarkan kelas
-        siswa_list = Siswa.query.filter_by(kelas=kelas).all()
+        # Siswa di kelas beserta absensi tanggal tersebut dalam satu LEFT JOIN.
+        # Status default adalah 'Hadir' (bukan 'Belum')
+        rows = db.session.query(
+            Siswa.id,
+            Siswa.nama,
+            Siswa.nisn,
+            Siswa.kelas,
+            func.coalesce(Absensi.status, 'Hadir').label('status')
+        ).outerjoin(
+            Absensi,
+            and_(
+                Absensi.siswa_id == Siswa.id,
+                Absensi.tanggal == tanggal,
+                Absensi.semester_id == active_semester.id
+            )
+        ).filter(Siswa.kelas == kelas).order_by(Siswa.id).all()
         
-        if not siswa_list:
+        if not rows:
             return jsonify({'error': f'Tidak ada siswa di kelas {kelas}'}), 404
         
-        absensi_data = []
+        absensi_data = [{
+            'siswa_id': row.id,
+            'nama': row.nama,
+            'nisn': row.nisn,
+            'kelas': row.kelas,
+            'status': row.status
+        } for row in rows]
         
-        for siswa in siswa_list:
-            absensi = Absensi.query.filter_by(
-                siswa_id=siswa.id, 
-                tanggal=tanggal,
-                semester_id=active_semester.id
-            ).first()
-            
-            # Status default adalah 'Hadir' (bukan 'Belum')
-            status = absensi.status if absensi else 'Hadir'
-            
-            absensi_data.append({
-                'siswa_id': siswa.id,
-                'nama': siswa.nama,
-                'nisn': siswa.nisn,
-                'kelas': siswa.kelas,
-                'status': status
+        return jsonify(absensi_data)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+MAX_HARI_KALENDER = 62
+
+@absensi_bp.route('/absensi/kalender', methods=['GET'])
+def get_kalender_absensi():
+    """Grid absensi siswa x tanggal (mingguan/bulanan) untuk satu kelas"""
+    try:
+        kelas = request.args.get('kelas')
+        dari_tanggal = request.args.get('dari_tanggal')
+        sampai_tanggal = request.args.get('sampai_tanggal')
+        
+        if not kelas or not dari_tanggal or not sampai_tanggal:
+            return jsonify({'error': 'Parameter kelas dan periode diperlukan'}), 400
+        
+        dari = datetime.strptime(dari_tanggal, '%Y-%m-%d').date()
+        sampai = datetime.strptime(sampai_tanggal, '%Y-%m-%d').date()
+        
+        if sampai < dari:
+            return jsonify({'error': 'Tanggal akhir harus setelah tanggal awal'}), 400
+        if (sampai - dari).days >= MAX_HARI_KALENDER:
+            return jsonify({'error': f'Periode kalender maksimal {MAX_HARI_KALENDER} hari'}), 400
+        
+        # Get active semester
+        active_semester = get_active_semester()
+        if not active_semester:
+            return jsonify({'error': 'Tidak ada semester aktif'}), 400
+        
+        # Roster kelas dan seluruh absensi periode dalam satu LEFT JOIN
+        rows = db.session.query(
+            Siswa.id,
+            Siswa.nama,
+            Siswa.nisn,
+            Siswa.kelas,
+            Absensi.tanggal,
+            Absensi.status
+        ).outerjoin(
+            Absensi,
+            and_(
+                Absensi.siswa_id == Siswa.id,
+                Absensi.tanggal.between(dari, sampai),
+                Absensi.semester_id == active_semester.id
+            )
+        ).filter(Siswa.kelas == kelas).order_by(Siswa.id, Absensi.tanggal).all()
+        
+        if not rows:
+            return jsonify({'error': f'Tidak ada siswa di kelas {kelas}'}), 404
+        
+        # Hari pertemuan kelas dari kalender pertemuan, sama dengan statistik
+        pertemuan = {
+            row.tanggal.isoformat()
+            for row in db.session.query(Pertemuan.tanggal).filter(
+                Pertemuan.semester_id == active_semester.id,
+                Pertemuan.kelas == kelas,
+                Pertemuan.tanggal.between(dari, sampai)
+            ).distinct()
+        }
+        
+        siswa_map = {}
+        for row in rows:
+            siswa = siswa_map.setdefault(row.id, {
+                'siswa_id': row.id,
+                'nama': row.nama,
+                'nisn': row.nisn,
+                'kelas': row.kelas,
+                'status': {}
             })
+            if row.tanggal:
+                siswa['status'][row.tanggal.isoformat()] = row.status
         
-        return jsonify(absensi_data)
+        # Pada hari pertemuan, siswa tanpa catatan dianggap 'Hadir';
+        # hari tanpa pertemuan bernilai None
+        tanggal_list = [
+            (dari + timedelta(days=offset)).isoformat()
+            for offset in range((sampai - dari).days + 1)
+        ]
+        for siswa in siswa_map.values():
+            siswa['status'] = {
+                tgl: siswa['status'].get(tgl, 'Hadir') if tgl in pertemuan else None
+                for tgl in tanggal_list
+            }
+        
+        return jsonify({
+            'kelas': kelas,
+            'tanggal': tanggal_list,
+            'pertemuan': sorted(pertemuan),
+            'siswa': list(siswa_map.values())
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -58,43 +155,416 @@ def save_absensi():
         tanggal = datetime.strptime(data['tanggal'], '%Y-%m-%d').date()
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
-        for item in data['absensi']:
-            absensi = Absensi.query.filter_by(
-                siswa_id=item['siswa_id'],
-                tanggal=tanggal,
-                semester_id=active_semester.id
-            ).first()
+        siswa_ids = [item['siswa_id'] for item in data['absensi']]
+        
+        # Catat pertemuan untuk kelas siswa yang diabsen
+        kelas_list = [
+            row.kelas for row in db.session.query(Siswa.kelas).filter(
+                Siswa.id.in_(siswa_ids)
+            ).distinct()
+        ]
+        kelas_pertemuan_baru = [
+            kelas for kelas in kelas_list
+            if catat_pertemuan(active_semester.id, kelas, tanggal, data.get('jam_ke'))
+        ]
+        
+        # Simpan seluruh kelas dalam satu statement upsert; unique key
+        # (siswa_id, tanggal, semester_id) mencegah data ganda
+        if data['absensi']:
+            now = datetime.utcnow()
+            stmt = sqlite_insert(Absensi).values([
+                {
+                    'siswa_id': item['siswa_id'],
+                    'tanggal': tanggal,
+                    'status': item['status'],
+                    'semester_id': active_semester.id,
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for item in data['absensi']
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['siswa_id', 'tanggal', 'semester_id'],
+                set_={
+                    'status': stmt.excluded.status,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            db.session.execute(stmt)
             
-            if absensi:
-                absensi.status = item['status']
-                absensi.updated_at = datetime.utcnow()
-            else:
-                absensi = Absensi(
-                    siswa_id=item['siswa_id'],
-                    tanggal=tanggal,
-                    status=item['status'],
-                    semester_id=active_semester.id
+            update_absensi_bitmaps(active_semester.id, tanggal, data['absensi'])
+            update_rekap_absensi_harian(active_semester.id, [tanggal], kelas_list)
+        
+        # Perbarui legger siswa yang terdampak; pertemuan baru mengubah
+        # penyebut kehadiran seluruh siswa di kelas tersebut
+        affected_ids = set(siswa_ids)
+        if kelas_pertemuan_baru:
+            affected_ids.update(
+                row.id for row in db.session.query(Siswa.id).filter(
+                    Siswa.kelas.in_(kelas_pertemuan_baru)
                 )
-                db.session.add(absensi)
+            )
+        refresh_legger(active_semester, list(affected_ids))
         
         db.session.commit()
+        invalidate_dashboard_cache()
+        publish_dashboard_event(
+            'absensi',
+            kelas=kelas_list,
+            tanggal=tanggal.isoformat(),
+            jumlah=len(data['absensi'])
+        )
         return jsonify({'message': 'Absensi berhasil disimpan'})
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def catat_pertemuan(semester_id, kelas, tanggal, jam_ke=None):
+    """Catat pertemuan kelas, tanpa commit.
+    
+    Mengembalikan True jika tanggal tersebut belum pernah menjadi
+    pertemuan kelas, artinya total pertemuan kelas bertambah.
+    """
+    tanggal_baru = Pertemuan.query.filter_by(
+        semester_id=semester_id,
+        kelas=kelas,
+        tanggal=tanggal
+    ).first() is None
+    
+    now = datetime.utcnow()
+    stmt = sqlite_insert(Pertemuan).values(
+        semester_id=semester_id,
+        kelas=kelas,
+        tanggal=tanggal,
+        jam_ke=jam_ke or '',
+        created_at=now,
+        updated_at=now
+    ).on_conflict_do_nothing(
+        index_elements=['semester_id', 'kelas', 'tanggal', 'jam_ke']
+    )
+    db.session.execute(stmt)
+    
+    return tanggal_baru
+
+def hapus_pertemuan_jika_kosong(semester_id, kelas, tanggal, jam_ke=None):
+    """Hapus pertemuan yang tidak lagi didukung absensi maupun jurnal, tanpa commit.
+    
+    Mengembalikan True jika tanggal tersebut tidak lagi menjadi pertemuan kelas.
+    """
+    jam_ke = jam_ke or ''
+    
+    jurnal_query = Jurnal.query.filter(
+        Jurnal.semester_id == semester_id,
+        Jurnal.kelas == kelas,
+        Jurnal.tanggal == tanggal
+    )
+    if jam_ke:
+        masih_ada = jurnal_query.filter(Jurnal.jam_ke == jam_ke).first() is not None
+    else:
+        masih_ada = jurnal_query.filter(
+            (Jurnal.jam_ke.is_(None)) | (Jurnal.jam_ke == '')
+        ).first() is not None
+        masih_ada = masih_ada or db.session.query(Absensi.id).join(
+            Siswa, Absensi.siswa_id == Siswa.id
+        ).filter(
+            Absensi.semester_id == semester_id,
+            Absensi.tanggal == tanggal,
+            Siswa.kelas == kelas
+        ).first() is not None
+    
+    if not masih_ada:
+        Pertemuan.query.filter_by(
+            semester_id=semester_id,
+            kelas=kelas,
+            tanggal=tanggal,
+            jam_ke=jam_ke
+        ).delete(synchronize_session=False)
+    
+    return Pertemuan.query.filter_by(
+        semester_id=semester_id,
+        kelas=kelas,
+        tanggal=tanggal
+    ).first() is None
+
+def rebuild_pertemuan(semester_id):
+    """Bangun ulang kalender pertemuan semester dari absensi dan jurnal, tanpa commit"""
+    Pertemuan.query.filter_by(semester_id=semester_id).delete(synchronize_session=False)
+    
+    pertemuan = {
+        (row.kelas, row.tanggal, '')
+        for row in db.session.query(Siswa.kelas, Absensi.tanggal).join(
+            Absensi, Absensi.siswa_id == Siswa.id
+        ).filter(Absensi.semester_id == semester_id).distinct()
+    }
+    pertemuan.update(
+        (row.kelas, row.tanggal, row.jam_ke or '')
+        for row in db.session.query(Jurnal.kelas, Jurnal.tanggal, Jurnal.jam_ke).filter(
+            Jurnal.semester_id == semester_id
+        ).distinct()
+    )
+    
+    if pertemuan:
+        now = datetime.utcnow()
+        db.session.execute(sqlite_insert(Pertemuan).values([
+            {
+                'semester_id': semester_id,
+                'kelas': kelas,
+                'tanggal': tanggal,
+                'jam_ke': jam_ke,
+                'created_at': now,
+                'updated_at': now
+            }
+            for kelas, tanggal, jam_ke in pertemuan
+        ]))
+    
+    return len(pertemuan)
+
+@absensi_bp.route('/absensi/pertemuan/rebuild', methods=['POST'])
+def rebuild_pertemuan_absensi():
+    """Bangun ulang kalender pertemuan semester dan legger yang bergantung padanya"""
+    try:
+        data = request.get_json() or {}
+        
+        if data.get('semester_id'):
+            semester = Semester.query.get(data['semester_id'])
+        else:
+            semester = get_active_semester()
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        total = rebuild_pertemuan(semester.id)
+        refresh_legger(semester)
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'Kalender pertemuan berhasil dibangun ({total} pertemuan)',
+            'total_pertemuan': total
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Kode status per slot bitmap absensi; 0 berarti tidak ada catatan, yang pada
+# hari pertemuan dianggap Hadir seperti di lembar absensi dan kalender
+STATUS_CODES = {'Hadir': 1, 'Sakit': 2, 'Ijin': 3, 'Tidak Hadir': 4}
+STATUS_LAINNYA = 5
+HADIR = STATUS_CODES['Hadir']
+TANPA_CATATAN = 0
+
+def set_bitmap_slot(bitmap, tanggal, status):
+    """Tulis kode status ke slot tanggal, memperluas bitmap bila perlu"""
+    slots = bytearray(bitmap.slots or b'')
+    
+    if tanggal < bitmap.tanggal_awal:
+        slots[0:0] = bytes((bitmap.tanggal_awal - tanggal).days)
+        bitmap.tanggal_awal = tanggal
+    
+    offset = (tanggal - bitmap.tanggal_awal).days
+    if offset >= len(slots):
+        slots.extend(bytes(offset - len(slots) + 1))
+    slots[offset] = STATUS_CODES.get(status, STATUS_LAINNYA)
+    
+    bitmap.slots = bytes(slots)
+
+def update_absensi_bitmaps(semester_id, tanggal, items):
+    """Perbarui bitmap absensi siswa yang disimpan, tanpa commit"""
+    siswa_ids = {item['siswa_id'] for item in items}
+    
+    bitmaps = {
+        bitmap.siswa_id: bitmap
+        for bitmap in AbsensiBitmap.query.filter(
+            AbsensiBitmap.semester_id == semester_id,
+            AbsensiBitmap.siswa_id.in_(siswa_ids)
+        ).all()
+    }
+    
+    for item in items:
+        bitmap = bitmaps.get(item['siswa_id'])
+        if not bitmap:
+            bitmap = AbsensiBitmap(
+                siswa_id=item['siswa_id'],
+                semester_id=semester_id,
+                tanggal_awal=tanggal,
+                slots=b''
+            )
+            db.session.add(bitmap)
+            bitmaps[item['siswa_id']] = bitmap
+        set_bitmap_slot(bitmap, tanggal, item['status'])
+
+def rebuild_absensi_bitmaps(semester_id):
+    """Bangun ulang seluruh bitmap semester dari tabel absensi, tanpa commit"""
+    AbsensiBitmap.query.filter_by(semester_id=semester_id).delete(synchronize_session=False)
+    
+    bitmaps = {}
+    for row in db.session.query(
+        Absensi.siswa_id, Absensi.tanggal, Absensi.status
+    ).filter(Absensi.semester_id == semester_id).order_by(Absensi.siswa_id, Absensi.tanggal):
+        bitmap = bitmaps.get(row.siswa_id)
+        if not bitmap:
+            bitmap = AbsensiBitmap(
+                siswa_id=row.siswa_id,
+                semester_id=semester_id,
+                tanggal_awal=row.tanggal,
+                slots=b''
+            )
+            bitmaps[row.siswa_id] = bitmap
+        set_bitmap_slot(bitmap, row.tanggal, row.status)
+    
+    db.session.add_all(bitmaps.values())
+    return len(bitmaps)
+
+def load_absensi_bitmaps(semester_id):
+    """Muat semua bitmap semester: {siswa_id: (ordinal tanggal_awal, slots)}"""
+    return {
+        row.siswa_id: (row.tanggal_awal.toordinal(), row.slots)
+        for row in db.session.query(
+            AbsensiBitmap.siswa_id, AbsensiBitmap.tanggal_awal, AbsensiBitmap.slots
+        ).filter(AbsensiBitmap.semester_id == semester_id)
+    }
+
+def load_pertemuan_kelas(semester_id):
+    """Tanggal pertemuan (ordinal, terurut) per kelas: {kelas: [ordinal, ...]}"""
+    pertemuan = {}
+    for row in db.session.query(Pertemuan.kelas, Pertemuan.tanggal).filter(
+        Pertemuan.semester_id == semester_id
+    ).distinct().order_by(Pertemuan.kelas, Pertemuan.tanggal):
+        pertemuan.setdefault(row.kelas, []).append(row.tanggal.toordinal())
+    return pertemuan
+
+def hitung_statistik_kehadiran(bitmap, pertemuan, n_terakhir):
+    """Presentase, streak hadir dan absen di N pertemuan terakhir dari bitmap"""
+    if bitmap:
+        awal, slots = bitmap
+    else:
+        awal, slots = 0, b''
+    
+    def hadir_pada(ordinal):
+        offset = ordinal - awal
+        status = slots[offset] if 0 <= offset < len(slots) else TANPA_CATATAN
+        return status in (HADIR, TANPA_CATATAN)
+    
+    # Hanya hari pertemuan kelas yang dihitung, sama dengan penyebutnya;
+    # Hadir di luar pertemuan (pindah kelas, absensi tanpa jurnal) diabaikan
+    hadir = sum(1 for ordinal in pertemuan if hadir_pada(ordinal))
+    total_pertemuan = len(pertemuan)
+    
+    streak_hadir = 0
+    for ordinal in reversed(pertemuan):
+        if not hadir_pada(ordinal):
+            break
+        streak_hadir += 1
+    
+    absen_terakhir = sum(
+        1 for ordinal in pertemuan[-n_terakhir:] if not hadir_pada(ordinal)
+    ) if n_terakhir > 0 else 0
+    
+    return {
+        'hadir': hadir,
+        'total_pertemuan': total_pertemuan,
+        'presentase_kehadiran': round(hadir / total_pertemuan * 100, 2) if total_pertemuan > 0 else 0,
+        'streak_hadir': streak_hadir,
+        'absen_n_terakhir': absen_terakhir
+    }
+
+@absensi_bp.route('/absensi/statistik', methods=['GET'])
+def get_statistik_absensi():
+    """Statistik kehadiran per siswa dari bitmap absensi (tanpa scan tabel absensi)"""
+    try:
+        kelas = request.args.get('kelas', 'all')
+        semester_id = request.args.get('semester', type=int)
+        n_terakhir = request.args.get('n', 5, type=int)
+        
+        if semester_id:
+            semester = Semester.query.get(semester_id)
+        else:
+            semester = get_active_semester()
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        bitmaps = load_absensi_bitmaps(semester.id)
+        pertemuan_kelas = load_pertemuan_kelas(semester.id)
+        
+        query = db.session.query(Siswa.id, Siswa.nama, Siswa.nisn, Siswa.kelas)
+        if kelas != 'all':
+            query = query.filter(Siswa.kelas == kelas)
+        
+        statistik = []
+        for siswa in query.order_by(Siswa.id):
+            item = {
+                'siswa_id': siswa.id,
+                'nama': siswa.nama,
+                'nisn': siswa.nisn,
+                'kelas': siswa.kelas
+            }
+            item.update(hitung_statistik_kehadiran(
+                bitmaps.get(siswa.id), pertemuan_kelas.get(siswa.kelas, []), n_terakhir
+            ))
+            item['memenuhi_minimal'] = item['presentase_kehadiran'] >= semester.minimal_kehadiran
+            statistik.append(item)
+        
+        return jsonify({
+            'semester_id': semester.id,
+            'minimal_kehadiran': semester.minimal_kehadiran,
+            'pertemuan': {
+                nama_kelas: [date.fromordinal(ordinal).isoformat() for ordinal in tanggal_list]
+                for nama_kelas, tanggal_list in pertemuan_kelas.items()
+                if kelas == 'all' or nama_kelas == kelas
+            },
+            'siswa': statistik
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@absensi_bp.route('/absensi/bitmap/rebuild', methods=['POST'])
+def rebuild_bitmap_absensi():
+    """Bangun ulang bitmap absensi semester dari data absensi yang ada"""
+    try:
+        data = request.get_json() or {}
+        
+        if data.get('semester_id'):
+            semester = Semester.query.get(data['semester_id'])
+        else:
+            semester = get_active_semester()
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        total = rebuild_absensi_bitmaps(semester.id)
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'Bitmap absensi berhasil dibangun untuk {total} siswa',
+            'total_siswa': total
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+REKAP_PAGE_SIZE = 500
+MAX_REKAP_PAGE_SIZE = 5000
+
 @absensi_bp.route('/absensi/rekap', methods=['GET'])
 def get_rekap_absensi():
+    """Rekap absensi periode tertentu.
+    
+    Ringkasan dihitung dengan GROUP BY (per status, per kelas, per siswa)
+    dan hanya dikirim di halaman pertama. Detail dikirim per halaman
+    dengan keyset cursor (tanggal, id) lewat parameter cursor/next_cursor.
+    """
     try:
         dari_tanggal = request.args.get('dari_tanggal')
         sampai_tanggal = request.args.get('sampai_tanggal')
         kelas = request.args.get('kelas', 'all')
         status = request.args.get('status', 'all')
+        cursor = request.args.get('cursor')
+        limit = max(1, min(request.args.get('limit', REKAP_PAGE_SIZE, type=int), MAX_REKAP_PAGE_SIZE))
         
         if not dari_tanggal or not sampai_tanggal:
             return jsonify({'error': 'Parameter periode diperlukan'}), 400
@@ -104,50 +574,97 @@ def get_rekap_absensi():
         sampai = datetime.strptime(sampai_tanggal, '%Y-%m-%d').date()
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
-        # Build query
-        query = Absensi.query.filter(
-            Absensi.tanggal.between(dari, sampai),
-            Absensi.semester_id == active_semester.id
-        ).join(Siswa)
+        def apply_filters(query):
+            query = query.filter(
+                Absensi.tanggal.between(dari, sampai),
+                Absensi.semester_id == active_semester.id
+            )
+            if kelas != 'all':
+                query = query.filter(Siswa.kelas == kelas)
+            if status != 'all':
+                query = query.filter(Absensi.status == status)
+            return query
         
-        # Apply filters
-        if kelas != 'all':
-            query = query.filter(Siswa.kelas == kelas)
+        # Detail dengan data siswa di-join langsung (tanpa lazy load)
+        detail_query = apply_filters(db.session.query(
+            Absensi.id,
+            Absensi.tanggal,
+            Absensi.status,
+            Siswa.nama,
+            Siswa.nisn,
+            Siswa.kelas
+        ).join(Siswa, Absensi.siswa_id == Siswa.id))
         
-        if status != 'all':
-            query = query.filter(Absensi.status == status)
-        
-        # Get data
-        absensi_records = query.all()
-        
-        # Generate summary
-        summary = {}
-        for record in absensi_records:
-            if record.status not in summary:
-                summary[record.status] = 0
-            summary[record.status] += 1
-        
-        # Prepare response data
-        rekap_data = []
-        for record in absensi_records:
-            rekap_data.append({
-                'tanggal': record.tanggal.isoformat(),
-                'siswa_nama': record.siswa.nama,
-                'siswa_nisn': record.siswa.nisn,
-                'kelas': record.siswa.kelas,
-                'status': record.status
-            })
+        if cursor:
+            try:
+                cursor_tanggal, cursor_id = cursor.split('_')
+                cursor_tanggal = datetime.strptime(cursor_tanggal, '%Y-%m-%d').date()
+                cursor_id = int(cursor_id)
+            except ValueError:
+                return jsonify({'error': 'Cursor tidak valid'}), 400
+            detail_query = detail_query.filter(
+                tuple_(Absensi.tanggal, Absensi.id) > tuple_(cursor_tanggal, cursor_id)
+            )
         
-        return jsonify({
-            'total_records': len(absensi_records),
-            'summary': summary,
+        records = detail_query.order_by(Absensi.tanggal, Absensi.id).limit(limit + 1).all()
+        has_more = len(records) > limit
+        records = records[:limit]
+        
+        rekap_data = [{
+            'tanggal': record.tanggal.isoformat(),
+            'siswa_nama': record.nama,
+            'siswa_nisn': record.nisn,
+            'kelas': record.kelas,
+            'status': record.status
+        } for record in records]
+        
+        result = {
             'data': rekap_data,
+            'next_cursor': f'{records[-1].tanggal.isoformat()}_{records[-1].id}' if has_more else None,
             'periode': f'{dari_tanggal} s/d {sampai_tanggal}'
-        })
+        }
+        
+        # Ringkasan hanya untuk halaman pertama
+        if not cursor:
+            summary = {}
+            for row in apply_filters(db.session.query(
+                Absensi.status, func.count(Absensi.id)
+            ).join(Siswa, Absensi.siswa_id == Siswa.id)).group_by(Absensi.status):
+                summary[row[0]] = row[1]
+            
+            summary_kelas = {}
+            for row in apply_filters(db.session.query(
+                Siswa.kelas, Absensi.status, func.count(Absensi.id)
+            ).join(Siswa, Absensi.siswa_id == Siswa.id)).group_by(Siswa.kelas, Absensi.status):
+                summary_kelas.setdefault(row[0], {})[row[1]] = row[2]
+            
+            summary_siswa = {}
+            for row in apply_filters(db.session.query(
+                Siswa.id, Siswa.nama, Siswa.nisn, Siswa.kelas, Absensi.status, func.count(Absensi.id)
+            ).join(Siswa, Absensi.siswa_id == Siswa.id)).group_by(
+                Siswa.id, Absensi.status
+            ).order_by(Siswa.kelas, Siswa.nama):
+                item = summary_siswa.setdefault(row[0], {
+                    'siswa_id': row[0],
+                    'nama': row[1],
+                    'nisn': row[2],
+                    'kelas': row[3],
+                    'status': {}
+                })
+                item['status'][row[4]] = row[5]
+            
+            result.update({
+                'total_records': sum(summary.values()),
+                'summary': summary,
+                'summary_kelas': summary_kelas,
+                'summary_siswa': list(summary_siswa.values())
+            })
+        
+        return jsonify(result)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,58 +1,111 @@
-from flask import Blueprint, jsonify
-from models import db, Siswa, Kelas, Materi, Absensi, NilaiFormatif, Semester
-from datetime import datetime, date
-from sqlalchemy import func, case
+from flask import Blueprint, request, jsonify, current_app, Response
+from models import db, Siswa, Kelas, Materi, Absensi, NilaiFormatif, Semester, RekapAbsensiHarian, RekapNilaiHarian
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, case, select, insert, literal
+from routes.semester_routes import get_active_semester
+import json
+import queue
+import threading
+import time
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Snapshot dashboard per semester aktif: semester_id -> {'data', 'bulan', 'expires'}
+dashboard_cache = {}
+dashboard_cache_lock = threading.Lock()
+
+# Pelanggan SSE dashboard: satu antrian terbatas per koneksi browser
+dashboard_subscribers = set()
+dashboard_subscribers_lock = threading.Lock()
+SUBSCRIBER_QUEUE_SIZE = 32
+
+def invalidate_dashboard_cache():
+    """Buang snapshot dashboard; dipanggil setelah data yang dirangkum berubah"""
+    with dashboard_cache_lock:
+        dashboard_cache.clear()
+
+def query_dashboard_snapshot(semester_id, current_month):
+    """Semua angka dashboard untuk satu semester dalam satu query"""
+    total_siswa = select(func.count(Siswa.id)).scalar_subquery()
+    total_kelas = select(func.count(Kelas.id)).scalar_subquery()
+    total_materi = select(func.count(Materi.id)).scalar_subquery()
+    
+    # Absensi bulan berjalan: total dan hadir lewat conditional aggregation
+    absensi_sq = select(
+        Absensi.semester_id,
+        func.count(Absensi.id).label('total_absensi'),
+        func.sum(case((Absensi.status == 'Hadir', 1), else_=0)).label('total_hadir')
+    ).where(
+        Absensi.semester_id == semester_id,
+        Absensi.tanggal >= current_month
+    ).group_by(Absensi.semester_id).subquery()
+    
+    nilai_sq = select(
+        NilaiFormatif.semester_id,
+        func.avg(NilaiFormatif.nilai).label('avg_nilai')
+    ).where(
+        NilaiFormatif.semester_id == semester_id
+    ).group_by(NilaiFormatif.semester_id).subquery()
+    
+    return db.session.query(
+        Semester.id.label('semester_id'),
+        total_siswa.label('total_siswa'),
+        total_kelas.label('total_kelas'),
+        total_materi.label('total_materi'),
+        absensi_sq.c.total_absensi,
+        absensi_sq.c.total_hadir,
+        nilai_sq.c.avg_nilai
+    ).outerjoin(
+        absensi_sq, absensi_sq.c.semester_id == Semester.id
+    ).outerjoin(
+        nilai_sq, nilai_sq.c.semester_id == Semester.id
+    ).filter(
+        Semester.id == semester_id
+    ).first()
+
 @dashboard_bp.route('/dashboard')
 def get_dashboard_data():
     try:
-        # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
-
-        # Basic counts
-        total_siswa = Siswa.query.count()
-        total_kelas = Kelas.query.count()
-        total_materi = Materi.query.count()
-
-        # Calculate average attendance for current month - FIXED VERSION
+        
         current_month = date.today().replace(day=1)
         
-        # Cara yang lebih sederhana untuk menghitung presentase kehadiran
-        total_absensi = Absensi.query.filter(
-            Absensi.tanggal >= current_month,
-            Absensi.semester_id == active_semester.id
-        ).count()
+        # Snapshot dipakai ulang selama TTL dan bulan belum berganti
+        with dashboard_cache_lock:
+            snapshot = dashboard_cache.get(active_semester.id)
+            if snapshot and snapshot['bulan'] == current_month and snapshot['expires'] > time.monotonic():
+                return jsonify(snapshot['data'])
         
-        total_hadir = Absensi.query.filter(
-            Absensi.tanggal >= current_month,
-            Absensi.semester_id == active_semester.id,
-            Absensi.status == 'Hadir'
-        ).count()
+        row = query_dashboard_snapshot(active_semester.id, current_month)
+        if not row:
+            return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
+        total_absensi = row.total_absensi or 0
+        total_hadir = row.total_hadir or 0
         avg_attendance = (total_hadir / total_absensi * 100) if total_absensi > 0 else 0
-
-        # Calculate average grades
-        avg_nilai_query = db.session.query(
-            func.avg(NilaiFormatif.nilai)
-        ).filter(
-            NilaiFormatif.semester_id == active_semester.id
-        )
         
-        avg_nilai = avg_nilai_query.scalar() or 0
-
-        return jsonify({
-            'total_siswa': total_siswa,
-            'total_kelas': total_kelas,
-            'total_materi': total_materi,
+        avg_nilai = row.avg_nilai or 0
+        
+        data = {
+            'total_siswa': row.total_siswa,
+            'total_kelas': row.total_kelas,
+            'total_materi': row.total_materi,
             'presentase_hadir': round(avg_attendance, 1),
             'avg_nilai': round(avg_nilai, 1),
             'nilai_harian': round(avg_nilai * 0.8 + 10, 1) if avg_nilai > 0 else 0,
             'predikat': get_predikat(avg_nilai)
-        })
+        }
+        
+        with dashboard_cache_lock:
+            dashboard_cache[active_semester.id] = {
+                'data': data,
+                'bulan': current_month,
+                'expires': time.monotonic() + current_app.config.get('DASHBOARD_CACHE_TTL', 30)
+            }
+        
+        return jsonify(data)
         
     except Exception as e:
         print(f"Dashboard error: {e}")  # Debug logging
@@ -66,4 +119,250 @@ def get_predikat(nilai):
     elif nilai >= 65:
         return 'C'
     else:
-        return 'D'
\ No newline at end of file
+        return 'D'
+
+# === REKAP HARIAN (TREN) ===
+
+def update_rekap_absensi_harian(semester_id, tanggal_list=None, kelas_list=None):
+    """Hitung ulang rekap absensi per kelas per tanggal dari data mentah, tanpa commit.
+    
+    Hanya kombinasi tanggal/kelas yang diberikan yang dihitung ulang; tanpa
+    filter seluruh rekap semester dibangun ulang.
+    """
+    hapus = RekapAbsensiHarian.query.filter(RekapAbsensiHarian.semester_id == semester_id)
+    sumber = select(
+        literal(semester_id),
+        Siswa.kelas,
+        Absensi.tanggal,
+        func.sum(case((Absensi.status == 'Hadir', 1), else_=0)),
+        func.sum(case((Absensi.status == 'Sakit', 1), else_=0)),
+        func.sum(case((Absensi.status == 'Ijin', 1), else_=0)),
+        func.sum(case((Absensi.status == 'Tidak Hadir', 1), else_=0)),
+        func.count(Absensi.id),
+        literal(datetime.utcnow(), db.DateTime),
+        literal(datetime.utcnow(), db.DateTime)
+    ).join(
+        Siswa, Siswa.id == Absensi.siswa_id
+    ).where(
+        Absensi.semester_id == semester_id
+    ).group_by(Siswa.kelas, Absensi.tanggal)
+    
+    if tanggal_list is not None:
+        hapus = hapus.filter(RekapAbsensiHarian.tanggal.in_(tanggal_list))
+        sumber = sumber.where(Absensi.tanggal.in_(tanggal_list))
+    if kelas_list is not None:
+        hapus = hapus.filter(RekapAbsensiHarian.kelas.in_(kelas_list))
+        sumber = sumber.where(Siswa.kelas.in_(kelas_list))
+    
+    hapus.delete(synchronize_session=False)
+    db.session.execute(insert(RekapAbsensiHarian).from_select([
+        'semester_id', 'kelas', 'tanggal', 'hadir', 'sakit', 'ijin', 'tidak_hadir',
+        'total', 'created_at', 'updated_at'
+    ], sumber))
+
+def update_rekap_nilai_harian(semester_id, tanggal_list=None, kelas_list=None):
+    """Hitung ulang rekap nilai formatif per kelas per tanggal, tanpa commit"""
+    hapus = RekapNilaiHarian.query.filter(RekapNilaiHarian.semester_id == semester_id)
+    sumber = select(
+        literal(semester_id),
+        Siswa.kelas,
+        NilaiFormatif.tanggal,
+        func.sum(NilaiFormatif.nilai),
+        func.count(NilaiFormatif.id),
+        literal(datetime.utcnow(), db.DateTime),
+        literal(datetime.utcnow(), db.DateTime)
+    ).join(
+        Siswa, Siswa.id == NilaiFormatif.siswa_id
+    ).where(
+        NilaiFormatif.semester_id == semester_id
+    ).group_by(Siswa.kelas, NilaiFormatif.tanggal)
+    
+    if tanggal_list is not None:
+        hapus = hapus.filter(RekapNilaiHarian.tanggal.in_(tanggal_list))
+        sumber = sumber.where(NilaiFormatif.tanggal.in_(tanggal_list))
+    if kelas_list is not None:
+        hapus = hapus.filter(RekapNilaiHarian.kelas.in_(kelas_list))
+        sumber = sumber.where(Siswa.kelas.in_(kelas_list))
+    
+    hapus.delete(synchronize_session=False)
+    db.session.execute(insert(RekapNilaiHarian).from_select([
+        'semester_id', 'kelas', 'tanggal', 'jumlah_nilai', 'jumlah_data',
+        'created_at', 'updated_at'
+    ], sumber))
+
+@dashboard_bp.route('/dashboard/rekap/rebuild', methods=['POST'])
+def rebuild_rekap_harian():
+    """Bangun ulang rekap harian absensi dan nilai satu semester dari data mentah"""
+    try:
+        data = request.get_json() or {}
+        
+        if data.get('semester_id'):
+            semester = Semester.query.get(data['semester_id'])
+        else:
+            semester = get_active_semester()
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        update_rekap_absensi_harian(semester.id)
+        update_rekap_nilai_harian(semester.id)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Rekap harian berhasil dibangun',
+            'rekap_absensi': RekapAbsensiHarian.query.filter_by(semester_id=semester.id).count(),
+            'rekap_nilai': RekapNilaiHarian.query.filter_by(semester_id=semester.id).count()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/dashboard/tren')
+def get_dashboard_tren():
+    """Tren harian presentase hadir dan rata-rata nilai formatif per kelas.
+    
+    Hanya membaca tabel rekap harian, tidak pernah tabel absensi/nilai mentah.
+    """
+    try:
+        hari = request.args.get('hari', 30, type=int)
+        kelas = request.args.get('kelas', 'all')
+        semester_id = request.args.get('semester', type=int)
+        sampai_tanggal = request.args.get('sampai_tanggal')
+        
+        if hari < 1 or hari > 366:
+            return jsonify({'error': 'Parameter hari harus antara 1 dan 366'}), 400
+        
+        try:
+            sampai = datetime.strptime(sampai_tanggal, '%Y-%m-%d').date() if sampai_tanggal else date.today()
+        except ValueError:
+            return jsonify({'error': 'Format tanggal harus YYYY-MM-DD'}), 400
+        dari = sampai - timedelta(days=hari - 1)
+        
+        def filter_rekap(query, model):
+            query = query.filter(model.tanggal >= dari, model.tanggal <= sampai)
+            if semester_id:
+                query = query.filter(model.semester_id == semester_id)
+            if kelas != 'all':
+                query = query.filter(model.kelas == kelas)
+            return query.group_by(model.kelas, model.tanggal)
+        
+        absensi_rows = filter_rekap(db.session.query(
+            RekapAbsensiHarian.kelas,
+            RekapAbsensiHarian.tanggal,
+            func.sum(RekapAbsensiHarian.hadir).label('hadir'),
+            func.sum(RekapAbsensiHarian.total).label('total')
+        ), RekapAbsensiHarian).all()
+        
+        nilai_rows = filter_rekap(db.session.query(
+            RekapNilaiHarian.kelas,
+            RekapNilaiHarian.tanggal,
+            func.sum(RekapNilaiHarian.jumlah_nilai).label('jumlah_nilai'),
+            func.sum(RekapNilaiHarian.jumlah_data).label('jumlah_data')
+        ), RekapNilaiHarian).all()
+        
+        # Gabungkan kedua rekap per kelas per tanggal
+        tren = {}
+        def titik(row):
+            return tren.setdefault(row.kelas, {}).setdefault(row.tanggal, {
+                'tanggal': row.tanggal.isoformat(),
+                'hadir': 0,
+                'total_absensi': 0,
+                'presentase_hadir': None,
+                'jumlah_nilai': 0,
+                'rata_rata_nilai': None
+            })
+        
+        for row in absensi_rows:
+            item = titik(row)
+            item['hadir'] = row.hadir
+            item['total_absensi'] = row.total
+            item['presentase_hadir'] = round(row.hadir / row.total * 100, 1) if row.total > 0 else None
+        
+        for row in nilai_rows:
+            item = titik(row)
+            item['jumlah_nilai'] = row.jumlah_data
+            item['rata_rata_nilai'] = round(row.jumlah_nilai / row.jumlah_data, 1) if row.jumlah_data > 0 else None
+        
+        hasil = []
+        for nama_kelas in sorted(tren):
+            hasil.append({
+                'kelas': nama_kelas,
+                'tren': [tren[nama_kelas][tanggal] for tanggal in sorted(tren[nama_kelas])]
+            })
+        
+        return jsonify({
+            'hari': hari,
+            'dari_tanggal': dari.isoformat(),
+            'sampai_tanggal': sampai.isoformat(),
+            'kelas': hasil
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# === LIVE UPDATE (SSE) ===
+
+def publish_dashboard_event(jenis, /, **data):
+    """Kirim event kecil ke semua dashboard yang terhubung.
+    
+    jenis hanya positional, sehingga payload tidak bisa bertabrakan dengan
+    nama event; kunci 'jenis' di payload tetap ditimpa nama event.
+    Dipanggil setelah commit. Klien lambat yang antriannya penuh tidak
+    menahan penulis: antriannya dikosongkan dan diganti satu event
+    'reload' agar klien memuat ulang dashboard secara penuh.
+    """
+    event = dict(data, jenis=jenis, waktu=datetime.utcnow().isoformat())
+    with dashboard_subscribers_lock:
+        subscribers = list(dashboard_subscribers)
+    
+    for antrian in subscribers:
+        try:
+            antrian.put_nowait(event)
+        except queue.Full:
+            with antrian.mutex:
+                antrian.queue.clear()
+            antrian.put_nowait({'jenis': 'reload', 'waktu': event['waktu']})
+
+def format_sse(event):
+    """Format satu event sebagai frame text/event-stream"""
+    return f"event: {event['jenis']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@dashboard_bp.route('/dashboard/stream')
+def stream_dashboard():
+    """Stream Server-Sent Events perubahan data untuk dashboard"""
+    max_clients = current_app.config.get('DASHBOARD_SSE_MAX_CLIENTS', 50)
+    heartbeat = current_app.config.get('DASHBOARD_SSE_HEARTBEAT', 15)
+    
+    antrian = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with dashboard_subscribers_lock:
+        if len(dashboard_subscribers) >= max_clients:
+            return jsonify({'error': 'Terlalu banyak koneksi live dashboard'}), 503
+        dashboard_subscribers.add(antrian)
+    
+    def generate():
+        try:
+            # Browser menyambung ulang otomatis setelah 5 detik jika putus
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = antrian.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Komentar SSE menjaga koneksi tetap hidup lewat proxy
+                    yield ': ping\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            lepas_antrian()
+    
+    def lepas_antrian():
+        with dashboard_subscribers_lock:
+            dashboard_subscribers.discard(antrian)
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Client yang putus sebelum generator mulai: finally di atas tidak
+    # pernah jalan, jadi slot dilepas saat response ditutup
+    response.call_on_close(lepas_antrian)
+    return response
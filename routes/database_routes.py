@@ -1,12 +1,317 @@
-from flask import Blueprint, request, jsonify, send_file
-from models import db, Kelas, Siswa, Materi, Semester, Absensi, NilaiFormatif, NilaiSumatif, Jurnal, Pengguna, BobotNilai, Legger
+from flask import Blueprint, request, jsonify, Response, current_app
+from models import db, Kelas, Siswa, Materi, Semester, Absensi, NilaiFormatif, NilaiSumatif, Jurnal, Pengguna, BobotNilai, Legger, CacheGenerasi
 from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from routes.legger_routes import invalidate_bobot_cache, GENERASI_BOBOT
+from routes.nilai_routes import invalidate_analitik_cache, GENERASI_NILAI
+from routes.dashboard_routes import invalidate_dashboard_cache
+from routes.semester_routes import invalidate_active_semester, GENERASI_SEMESTER
+from routes.kelas_routes import invalidate_kelas_cache, GENERASI_KELAS
+from routes.materi_routes import invalidate_materi_cache, GENERASI_MATERI
+from migrations import upgrade_database, stamp_schema_version, LATEST_VERSION
+from contextlib import contextmanager
+import incremental_backup
+import gzip
 import os
 import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
 from datetime import datetime
 
 database_bp = Blueprint('database', __name__)
 
+# Backup online: halaman per langkah backup API (juga per potongan download),
+# jeda antar langkah agar penulis lain tetap jalan, dan batas restart sebelum disalin sekaligus
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+BACKUP_MAX_RESTART = 3
+BACKUP_CHUNK_SIZE = 1024 * 1024
+# Salinan penuh (pre_restore, pre_reset) yang disimpan di folder backup
+BACKUP_FILE_SIMPAN = 10
+
+class BackupTerlaluSeringDiulang(Exception):
+    pass
+
+def buat_snapshot(db_path, snapshot_path):
+    """Salin database yang sedang dipakai ke snapshot_path lewat backup API SQLite.
+    
+    Backup API mengulang dari awal jika database ditulis koneksi lain di
+    antara langkah. Setelah BACKUP_MAX_RESTART kali, sisa salinan dibuat
+    dalam satu langkah (satu transaksi baca; dengan WAL penulis tidak tertahan).
+    """
+    sisa_sebelumnya = None
+    restart = 0
+    
+    def progress(status, remaining, total):
+        nonlocal sisa_sebelumnya, restart
+        if sisa_sebelumnya is not None and remaining > sisa_sebelumnya:
+            restart += 1
+            if restart > BACKUP_MAX_RESTART:
+                raise BackupTerlaluSeringDiulang()
+        sisa_sebelumnya = remaining
+    
+    sumber = sqlite3.connect(db_path, timeout=30)
+    tujuan = sqlite3.connect(snapshot_path)
+    try:
+        try:
+            sumber.backup(tujuan, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+        except BackupTerlaluSeringDiulang:
+            sumber.backup(tujuan, pages=-1)
+    finally:
+        tujuan.close()
+        sumber.close()
+
+def stream_backup(db_path, instance_path, kompres):
+    """Kirim halaman database per BACKUP_PAGES_PER_STEP halaman, dikompres gzip sambil jalan.
+    
+    Halaman dibaca dalam satu transaksi baca (incremental_backup.snapshot_halaman),
+    tanpa salinan snapshot atau arsip di disk. Backup baru dicatat setelah
+    byte terakhir terkirim; download yang putus tidak dihitung.
+    """
+    # wbits 31 = format gzip, bisa dibuka gunzip/7-Zip
+    kompresor = zlib.compressobj(6, zlib.DEFLATED, 31) if kompres else None
+    with incremental_backup.snapshot_halaman(db_path) as (baca, page_size, page_count):
+        for awal in range(1, page_count + 1, BACKUP_PAGES_PER_STEP):
+            data = baca(awal, min(BACKUP_PAGES_PER_STEP, page_count - awal + 1))
+            if kompresor:
+                data = kompresor.compress(data)
+            if data:
+                yield data
+    if kompresor:
+        yield kompresor.flush()
+    catat_backup(instance_path)
+
+# Restore dan reset tidak boleh berjalan bersamaan; selama isi database
+# ditukar, request lain di proses ini dijawab 503
+maintenance_lock = threading.Lock()
+maintenance_aktif = threading.Event()
+TABEL_WAJIB = {'kelas', 'siswa', 'semester'}
+
+@database_bp.before_app_request
+def tolak_saat_maintenance():
+    if maintenance_aktif.is_set():
+        response = jsonify({'error': 'Database sedang dipulihkan, coba lagi sebentar'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+@contextmanager
+def mode_maintenance():
+    maintenance_aktif.set()
+    try:
+        yield
+    finally:
+        maintenance_aktif.clear()
+
+def get_instance_path():
+    return os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance'))
+
+def get_database_path():
+    """File database yang benar-benar dipakai engine (bisa diganti lewat DATABASE_URL)"""
+    return os.path.abspath(db.engine.url.database)
+
+def simpan_upload(file, instance_path):
+    """Tulis upload per blok ke file sementara di folder instance; .gz diekstrak sambil ditulis"""
+    fd, temp_path = tempfile.mkstemp(prefix='restore_', suffix='.db', dir=instance_path)
+    try:
+        with os.fdopen(fd, 'wb') as tujuan:
+            if file.filename.lower().endswith('.gz'):
+                with gzip.open(file.stream, 'rb') as sumber:
+                    shutil.copyfileobj(sumber, tujuan, BACKUP_CHUNK_SIZE)
+            else:
+                shutil.copyfileobj(file.stream, tujuan, BACKUP_CHUNK_SIZE)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+def periksa_file_restore(path):
+    """Validasi file restore; kembalikan pesan error atau None jika layak dipakai"""
+    try:
+        conn = sqlite3.connect(path)
+    except sqlite3.DatabaseError:
+        return 'File is not a valid SQLite database'
+    try:
+        # File terpisah tanpa -wal agar bisa disalin utuh
+        conn.execute('PRAGMA journal_mode=DELETE')
+        hasil = conn.execute('PRAGMA quick_check').fetchone()[0]
+        if hasil != 'ok':
+            return f'Database backup rusak: {hasil.splitlines()[0]}'
+        
+        tabel = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not TABEL_WAJIB <= tabel:
+            return 'File bukan backup database aplikasi ini'
+        
+        versi = 0
+        if 'schema_version' in tabel:
+            versi = conn.execute('SELECT MAX(versi) FROM schema_version').fetchone()[0] or 0
+        if versi > LATEST_VERSION:
+            return f'Backup dari versi skema {versi}, lebih baru dari aplikasi (versi {LATEST_VERSION})'
+        
+        # Backup API ke database WAL mensyaratkan ukuran halaman yang sama
+        with db.engine.connect() as live:
+            page_size = live.exec_driver_sql('PRAGMA page_size').scalar()
+        if conn.execute('PRAGMA page_size').fetchone()[0] != page_size:
+            conn.execute(f'PRAGMA page_size={page_size}')
+            conn.execute('VACUUM')
+    except sqlite3.DatabaseError as e:
+        return f'File is not a valid SQLite database: {e}'
+    finally:
+        conn.close()
+    return None
+
+def salin_ke_database_aktif(path):
+    """Timpa isi database aktif dengan file path lewat backup API dalam satu langkah.
+    
+    Seluruh halaman ditulis dalam satu transaksi tulis, sehingga koneksi lain
+    (termasuk proses worker lain) melihat isi lama atau isi baru, tidak
+    pernah file setengah jadi, dan tidak perlu menutup koneksi atau mengganti file.
+    """
+    sumber = sqlite3.connect(path)
+    try:
+        with db.engine.connect() as conn:
+            sumber.backup(conn.connection.dbapi_connection, pages=-1)
+    finally:
+        sumber.close()
+
+def pulihkan_dari_file(temp_path, instance_path):
+    """Validasi file lalu timpa database aktif dengan isinya; kembalikan (body, status).
+    
+    Dipanggil dengan maintenance_lock dipegang.
+    """
+    error = periksa_file_restore(temp_path)
+    if error:
+        return {'error': error}, 400
+    
+    # Salinan database saat ini sebelum ditimpa
+    db_path = get_database_path()
+    backup_folder = os.path.join(instance_path, 'backups')
+    os.makedirs(backup_folder, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    pre_restore_backup = os.path.join(backup_folder, f'pre_restore_{timestamp}.db')
+    buat_snapshot(db_path, pre_restore_backup)
+    catat_backup(instance_path)
+    hapus_backup_lama(backup_folder)
+    
+    mulai = time.perf_counter()
+    with mode_maintenance():
+        generasi_lama = baca_semua_generasi()
+        db.session.remove()
+        salin_ke_database_aktif(temp_path)
+        # Backup lama mungkin dibuat sebelum migrasi terbaru
+        upgrade_database()
+        lompati_generasi(generasi_lama)
+        db.session.commit()
+        invalidate_semua_cache()
+    
+    return {
+        'message': 'Database berhasil di-restore',
+        'pre_restore_backup': os.path.basename(pre_restore_backup),
+        'durasi_detik': round(time.perf_counter() - mulai, 2)
+    }, 200
+
+def hapus_backup_lama(backup_folder):
+    """Pertahankan BACKUP_FILE_SIMPAN salinan penuh (.db/.db.gz) terbaru di folder backup"""
+    files = sorted(
+        (f for f in os.listdir(backup_folder) if f.endswith(('.db', '.db.gz'))),
+        key=lambda f: os.path.getmtime(os.path.join(backup_folder, f)),
+        reverse=True
+    )
+    for f in files[BACKUP_FILE_SIMPAN:]:
+        os.remove(os.path.join(backup_folder, f))
+
+def catat_backup(instance_path):
+    incremental_backup.catat_backup_terakhir(incremental_backup.get_folder(instance_path))
+
+def get_backup_terakhir(instance_path):
+    """Waktu backup terakhir dari penanda yang ditulis setiap backup, tanpa listing folder"""
+    folder = incremental_backup.get_folder(instance_path)
+    last_backup = incremental_backup.baca_backup_terakhir(folder)
+    if last_backup is None:
+        # Folder backup dari versi lama: scan sekali lalu simpan hasilnya
+        backup_folder = os.path.join(instance_path, 'backups')
+        if os.path.exists(backup_folder):
+            mtimes = [
+                os.path.getmtime(os.path.join(backup_folder, f))
+                for f in os.listdir(backup_folder) if f.endswith(('.db', '.db.gz'))
+            ]
+            if mtimes:
+                waktu = datetime.fromtimestamp(max(mtimes))
+                incremental_backup.catat_backup_terakhir(folder, waktu)
+                last_backup = waktu.isoformat()
+    return last_backup
+
+def jalankan_backup_inkremental(penuh=False):
+    """Backup inkremental database aktif dengan pengaturan retensi dari config"""
+    return incremental_backup.jalankan_backup(
+        get_database_path(),
+        incremental_backup.get_folder(get_instance_path()),
+        penuh=penuh,
+        full_setiap_hari=current_app.config['BACKUP_FULL_SETIAP_HARI'],
+        retensi=current_app.config['BACKUP_RETENSI']
+    )
+
+def start_backup_scheduler(app):
+    """Thread latar yang menjalankan backup inkremental tiap BACKUP_INCREMENTAL_INTERVAL detik.
+    
+    Lock file di folder backup mencegah dua worker membuat backup bersamaan.
+    """
+    interval = app.config['BACKUP_INCREMENTAL_INTERVAL']
+    if not interval:
+        return None
+    
+    def loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    entry = jalankan_backup_inkremental()
+                    if entry:
+                        print(f"Backup {entry['jenis']} {entry['id']}: {entry['halaman']} halaman, {entry['ukuran']} byte")
+                except incremental_backup.BackupSedangBerjalan:
+                    pass
+                except Exception as e:
+                    print(f"Backup inkremental gagal: {e}")
+    
+    thread = threading.Thread(target=loop, name='backup-inkremental', daemon=True)
+    thread.start()
+    return thread
+
+def baca_semua_generasi():
+    return {row.nama: row.generasi for row in CacheGenerasi.query.all()}
+
+def lompati_generasi(generasi_lama):
+    """Naikkan generasi cache melewati nilai sebelum dan sesudah isi database diganti, tanpa commit.
+    
+    Tabel cache_generasi ikut tertimpa, sehingga nilainya bisa sama dengan
+    yang sudah di-cache proses lain.
+    """
+    now = datetime.utcnow()
+    generasi_baru = baca_semua_generasi()
+    for nama in (GENERASI_SEMESTER, GENERASI_KELAS, GENERASI_MATERI, GENERASI_BOBOT, GENERASI_NILAI):
+        generasi = max(generasi_lama.get(nama, 0), generasi_baru.get(nama, 0)) + 1
+        stmt = sqlite_insert(CacheGenerasi).values(
+            nama=nama,
+            generasi=generasi,
+            created_at=now,
+            updated_at=now
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['nama'],
+            set_={'generasi': generasi, 'updated_at': now}
+        ))
+
+def invalidate_semua_cache():
+    """Kosongkan semua cache in-process setelah isi database diganti"""
+    invalidate_bobot_cache()
+    invalidate_analitik_cache()
+    invalidate_dashboard_cache()
+    invalidate_active_semester()
+    invalidate_kelas_cache()
+    invalidate_materi_cache()
+
 @database_bp.route('/database/info', methods=['GET'])
 def get_database_info():
     try:
@@ -26,25 +331,15 @@ def get_database_info():
         )
         
         # Get database file size (use absolute path)
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        instance_path = os.path.join(base_dir, '..', 'instance')
-        instance_path = os.path.abspath(instance_path)
-        db_path = os.path.join(instance_path, 'database.db')
+        instance_path = get_instance_path()
+        db_path = get_database_path()
         if os.path.exists(db_path):
             db_size = os.path.getsize(db_path)
             db_size_mb = round(db_size / (1024 * 1024), 2)
         else:
             db_size_mb = 0
         
-        # Get last backup time (if backup folder exists)
-        backup_folder = os.path.join(instance_path, 'backups')
-        last_backup = None
-        if os.path.exists(backup_folder):
-            backups = [f for f in os.listdir(backup_folder) if f.endswith('.db')]
-            if backups:
-                latest_backup = max(backups, key=lambda f: os.path.getmtime(os.path.join(backup_folder, f)))
-                last_backup_time = os.path.getmtime(os.path.join(backup_folder, latest_backup))
-                last_backup = datetime.fromtimestamp(last_backup_time).isoformat()
+        last_backup = get_backup_terakhir(instance_path)
         
         return jsonify({
             'total_records': total_records,
@@ -66,41 +361,38 @@ def get_database_info():
 
 @database_bp.route('/database/backup', methods=['POST'])
 def backup_database():
+    """Backup online database; default arsip .db.gz yang dikompres sambil di-stream (?format=db tanpa kompresi)"""
     try:
-        # Use absolute paths
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        instance_path = os.path.join(base_dir, '..', 'instance')
-        instance_path = os.path.abspath(instance_path)
+        file_format = request.args.get('format', 'gz').lower()
+        if file_format not in ('gz', 'db'):
+            return jsonify({'error': 'Format backup harus gz atau db'}), 400
         
-        # Create backups directory if it doesn't exist
-        backup_folder = os.path.join(instance_path, 'backups')
-        os.makedirs(backup_folder, exist_ok=True)
+        instance_path = get_instance_path()
         
         # Source database path
-        db_path = os.path.join(instance_path, 'database.db')
+        db_path = get_database_path()
         if not os.path.exists(db_path):
             return jsonify({'error': 'Database file not found'}), 404
         
         # Create backup filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_filename = f'database_backup_{timestamp}.db'
-        backup_path = os.path.join(backup_folder, backup_filename)
-        
-        # Copy database file
-        shutil.copy2(db_path, backup_path)
+        if file_format == 'gz':
+            backup_filename += '.gz'
         
-        # Return the backup file for download
-        return send_file(
-            backup_path,
-            as_attachment=True,
-            download_name=backup_filename,
-            mimetype='application/x-sqlite3'
+        # Snapshot baru dibuka saat byte pertama diminta; client yang putus
+        # sebelumnya tidak membuka transaksi baca sama sekali
+        return Response(
+            stream_backup(db_path, instance_path, kompres=file_format == 'gz'),
+            mimetype='application/gzip' if file_format == 'gz' else 'application/x-sqlite3',
+            headers={'Content-Disposition': f'attachment; filename={backup_filename}'}
         )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @database_bp.route('/database/restore', methods=['POST'])
 def restore_database():
+    """Pulihkan database dari file .db/.db.gz: divalidasi dulu, lalu ditukar dalam satu transaksi"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -110,106 +402,104 @@ def restore_database():
             return jsonify({'error': 'No file selected'}), 400
         
         # Check file extension
-        if not file.filename.lower().endswith('.db'):
-            return jsonify({'error': 'File must be a .db (SQLite database) file'}), 400
-        
-        # Use absolute paths
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        instance_path = os.path.join(base_dir, '..', 'instance')
-        instance_path = os.path.abspath(instance_path)
-        os.makedirs(instance_path, exist_ok=True)
-        
-        # Save uploaded file temporarily
-        temp_path = os.path.join(instance_path, 'temp_restore.db')
-        file.save(temp_path)
-        
-        # Verify it's a valid SQLite database
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return jsonify({'error': 'Invalid database file'}), 400
-        
-        # Try to verify it's a valid SQLite database by attempting to open it
-        import sqlite3
-        try:
-            test_conn = sqlite3.connect(temp_path)
-            test_conn.execute('SELECT name FROM sqlite_master WHERE type="table" LIMIT 1')
-            test_conn.close()
-        except sqlite3.DatabaseError:
-            os.remove(temp_path)
-            return jsonify({'error': 'File is not a valid SQLite database'}), 400
-        
-        # Close all database connections before replacing the file
-        db.session.close()
-        db.engine.dispose()
-        
-        # Backup current database first
-        db_path = os.path.join(instance_path, 'database.db')
-        pre_restore_backup = None
-        if os.path.exists(db_path):
-            backup_folder = os.path.join(instance_path, 'backups')
-            os.makedirs(backup_folder, exist_ok=True)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            pre_restore_backup = os.path.join(backup_folder, f'pre_restore_{timestamp}.db')
-            shutil.copy2(db_path, pre_restore_backup)
-        
-        # Replace database file
-        # First, ensure all connections are closed
-        db.session.remove()
-        db.engine.dispose()
+        if not file.filename.lower().endswith(('.db', '.db.gz')):
+            return jsonify({'error': 'File must be a .db or .db.gz (SQLite database) file'}), 400
         
-        # Wait a moment to ensure all file handles are released
-        import time
-        time.sleep(0.5)
+        if not maintenance_lock.acquire(blocking=False):
+            return jsonify({'error': 'Restore atau reset lain sedang berjalan'}), 409
         
-        # Replace database file
-        if os.path.exists(db_path):
+        temp_path = None
+        try:
+            instance_path = get_instance_path()
+            
             try:
-                os.remove(db_path)
-            except PermissionError:
-                # If file is locked, try to rename it first
-                old_db_path = db_path + '.old'
-                if os.path.exists(old_db_path):
-                    os.remove(old_db_path)
-                os.rename(db_path, old_db_path)
-                os.remove(old_db_path)
-        
-        shutil.copy2(temp_path, db_path)
-        
-        # Remove temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        
-        # Force SQLAlchemy to reconnect by clearing the connection pool
-        db.engine.dispose()
-        
-        # Verify the restored database is accessible
+                temp_path = simpan_upload(file, instance_path)
+            except (OSError, EOFError, zlib.error):
+                return jsonify({'error': 'Arsip backup rusak atau bukan gzip'}), 400
+            
+            body, status = pulihkan_dari_file(temp_path, instance_path)
+            return jsonify(body), status
+        finally:
+            maintenance_lock.release()
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    except Exception as e:
+        db.session.rollback()
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@database_bp.route('/database/backup/inkremental', methods=['POST'])
+def backup_inkremental():
+    """Backup halaman yang berubah sejak backup terakhir (penuh jika diminta atau rantai sudah tua)"""
+    try:
+        data = request.get_json(silent=True) or {}
         try:
-            # Test connection to new database
-            with db.engine.connect() as test_conn:
-                test_conn.execute(text('SELECT 1'))
-        except Exception as verify_error:
-            return jsonify({
-                'error': f'Database restored but verification failed: {str(verify_error)}'
-            }), 500
+            entry = jalankan_backup_inkremental(penuh=bool(data.get('penuh')))
+        except incremental_backup.BackupSedangBerjalan as e:
+            return jsonify({'error': str(e)}), 409
         
+        if entry is None:
+            return jsonify({'message': 'Tidak ada perubahan sejak backup terakhir'})
+        return jsonify({'message': 'Backup berhasil dibuat', 'backup': entry})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@database_bp.route('/database/backups', methods=['GET'])
+def get_backups():
+    """Daftar titik restore dari catalog backup inkremental"""
+    try:
+        catalog = incremental_backup.baca_catalog(incremental_backup.get_folder(get_instance_path()))
+        entries = catalog['entries']
         return jsonify({
-            'message': 'Database berhasil di-restore',
-            'pre_restore_backup': os.path.basename(pre_restore_backup) if pre_restore_backup else None
+            'backups': entries,
+            'total_ukuran': sum(entry['ukuran'] for entry in entries)
         })
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@database_bp.route('/database/restore/waktu', methods=['POST'])
+def restore_ke_waktu():
+    """Pulihkan database ke titik backup terakhir pada atau sebelum waktu yang diminta"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            waktu = datetime.fromisoformat(data['waktu'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'waktu harus berformat ISO (YYYY-MM-DDTHH:MM:SS)'}), 400
+        
+        if not maintenance_lock.acquire(blocking=False):
+            return jsonify({'error': 'Restore atau reset lain sedang berjalan'}), 409
+        
+        temp_path = None
+        try:
+            instance_path = get_instance_path()
+            folder = incremental_backup.get_folder(instance_path)
+            target, rantai = incremental_backup.cari_titik(incremental_backup.baca_catalog(folder), waktu)
+            if target is None:
+                return jsonify({'error': 'Tidak ada backup pada atau sebelum waktu tersebut'}), 404
+            
+            fd, temp_path = tempfile.mkstemp(suffix='.db', prefix='pitr_', dir=instance_path)
+            os.close(fd)
+            incremental_backup.bangun_database(folder, rantai, temp_path)
+            
+            body, status = pulihkan_dari_file(temp_path, instance_path)
+            if status == 200:
+                body['backup'] = target
+            return jsonify(body), status
+        finally:
+            maintenance_lock.release()
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @database_bp.route('/database/optimize', methods=['POST'])
 def optimize_database():
     try:
         # SQLite VACUUM command to optimize database
-        # Use absolute path
-        instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance')
-        instance_path = os.path.abspath(instance_path)
-        db_path = os.path.join(instance_path, 'database.db')
+        db_path = get_database_path()
         
         if not os.path.exists(db_path):
             return jsonify({'error': 'Database file not found'}), 404
@@ -226,26 +516,43 @@ def optimize_database():
 @database_bp.route('/database/reset', methods=['POST'])
 def reset_database():
     try:
-        # Backup current database first
-        db_path = os.path.join('instance', 'database.db')
-        if os.path.exists(db_path):
-            backup_folder = os.path.join('instance', 'backups')
-            os.makedirs(backup_folder, exist_ok=True)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            pre_reset_backup = os.path.join(backup_folder, f'pre_reset_{timestamp}.db')
-            shutil.copy2(db_path, pre_reset_backup)
+        if not maintenance_lock.acquire(blocking=False):
+            return jsonify({'error': 'Restore atau reset lain sedang berjalan'}), 409
         
-        # Drop all tables and recreate
-        db.drop_all()
-        db.create_all()
-        
-        # Seed with default data
-        from seed import seed_database
-        seed_database()
+        try:
+            # Backup current database first
+            instance_path = get_instance_path()
+            db_path = get_database_path()
+            pre_reset_backup = None
+            if os.path.exists(db_path):
+                backup_folder = os.path.join(instance_path, 'backups')
+                os.makedirs(backup_folder, exist_ok=True)
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                pre_reset_backup = os.path.join(backup_folder, f'pre_reset_{timestamp}.db')
+                buat_snapshot(db_path, pre_reset_backup)
+                catat_backup(instance_path)
+                hapus_backup_lama(backup_folder)
+            
+            with mode_maintenance():
+                generasi_lama = baca_semua_generasi()
+                
+                # Drop all tables and recreate
+                db.drop_all()
+                db.create_all()
+                stamp_schema_version()
+                lompati_generasi(generasi_lama)
+                db.session.commit()
+                
+                # Seed with default data
+                from seed import seed_database
+                seed_database()
+                invalidate_semua_cache()
+        finally:
+            maintenance_lock.release()
         
         return jsonify({
             'message': 'Database berhasil di-reset dan di-seed dengan data default',
-            'pre_reset_backup': pre_reset_backup if os.path.exists(db_path) else None
+            'pre_reset_backup': os.path.basename(pre_reset_backup) if pre_reset_backup else None
         })
     except Exception as e:
         db.session.rollback()
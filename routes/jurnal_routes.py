@@ -1,9 +1,27 @@
 from flask import Blueprint, request, jsonify
-from models import db, Jurnal, Kelas, Materi, Semester
+from models import db, Jurnal, Semester, Siswa
 from datetime import datetime
+from routes.absensi_routes import catat_pertemuan, hapus_pertemuan_jika_kosong
+from routes.legger_routes import refresh_legger
+from routes.semester_routes import get_active_semester
+from routes.kelas_routes import get_kelas_id
+from routes.materi_routes import get_materi_id
 
 jurnal_bp = Blueprint('jurnal', __name__)
 
+def refresh_legger_kelas(semester_id, kelas_list):
+    """Hitung ulang legger kelas yang total pertemuannya berubah"""
+    if not kelas_list:
+        return
+    semester = Semester.query.get(semester_id)
+    if not semester:
+        return
+    siswa_ids = [
+        row.id for row in db.session.query(Siswa.id).filter(Siswa.kelas.in_(kelas_list))
+    ]
+    if siswa_ids:
+        refresh_legger(semester, siswa_ids)
+
 @jurnal_bp.route('/jurnal', methods=['GET'])
 def get_jurnal():
     try:
@@ -62,21 +80,18 @@ def create_jurnal():
         data = request.get_json()
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
-        # Cari kelas dan materi berdasarkan nama
-        kelas_obj = Kelas.query.filter_by(nama=data['kelas']).first()
-        materi_obj = Materi.query.filter_by(judul=data['materi']).first()
         
         jurnal = Jurnal(
             tanggal=datetime.strptime(data['tanggal'], '%Y-%m-%d').date(),
             kelas=data['kelas'],
-            kelas_id=kelas_obj.id if kelas_obj else None,
+            kelas_id=get_kelas_id(data['kelas']),
             mata_pelajaran=data['mata_pelajaran'],
             materi=data['materi'],
-            materi_id=materi_obj.id if materi_obj else None,
+            materi_id=get_materi_id(data['materi']),
             topik=data['topik'],
             jam_ke=data.get('jam_ke'),
             durasi=data.get('durasi', 2),
@@ -93,6 +108,11 @@ def create_jurnal():
         )
         
         db.session.add(jurnal)
+        
+        # Jurnal menandai pertemuan kelas
+        if catat_pertemuan(active_semester.id, jurnal.kelas, jurnal.tanggal, jurnal.jam_ke):
+            refresh_legger_kelas(active_semester.id, [jurnal.kelas])
+        
         db.session.commit()
         
         return jsonify({
@@ -109,20 +129,19 @@ def update_jurnal(id):
     try:
         data = request.get_json()
         jurnal = Jurnal.query.get_or_404(id)
+        pertemuan_lama = (jurnal.kelas, jurnal.tanggal, jurnal.jam_ke)
         
         # Update fields
         if 'tanggal' in data:
             jurnal.tanggal = datetime.strptime(data['tanggal'], '%Y-%m-%d').date()
         if 'kelas' in data:
             jurnal.kelas = data['kelas']
-            kelas_obj = Kelas.query.filter_by(nama=data['kelas']).first()
-            jurnal.kelas_id = kelas_obj.id if kelas_obj else None
+            jurnal.kelas_id = get_kelas_id(data['kelas'])
         if 'mata_pelajaran' in data:
             jurnal.mata_pelajaran = data['mata_pelajaran']
         if 'materi' in data:
             jurnal.materi = data['materi']
-            materi_obj = Materi.query.filter_by(judul=data['materi']).first()
-            jurnal.materi_id = materi_obj.id if materi_obj else None
+            jurnal.materi_id = get_materi_id(data['materi'])
         if 'topik' in data:
             jurnal.topik = data['topik']
         if 'jam_ke' in data:
@@ -149,6 +168,17 @@ def update_jurnal(id):
             jurnal.tanda_tangan = data['tanda_tangan']
         
         jurnal.updated_at = datetime.utcnow()
+        
+        # Pindahkan pertemuan jika kelas, tanggal atau jam berubah
+        pertemuan_baru = (jurnal.kelas, jurnal.tanggal, jurnal.jam_ke)
+        if jurnal.semester_id and pertemuan_baru != pertemuan_lama:
+            kelas_berubah = set()
+            if catat_pertemuan(jurnal.semester_id, *pertemuan_baru):
+                kelas_berubah.add(jurnal.kelas)
+            if hapus_pertemuan_jika_kosong(jurnal.semester_id, *pertemuan_lama):
+                kelas_berubah.add(pertemuan_lama[0])
+            refresh_legger_kelas(jurnal.semester_id, list(kelas_berubah))
+        
         db.session.commit()
         
         return jsonify({'message': 'Jurnal berhasil diperbarui'})
@@ -162,6 +192,13 @@ def delete_jurnal(id):
     try:
         jurnal = Jurnal.query.get_or_404(id)
         db.session.delete(jurnal)
+        db.session.flush()
+        
+        if jurnal.semester_id and hapus_pertemuan_jika_kosong(
+            jurnal.semester_id, jurnal.kelas, jurnal.tanggal, jurnal.jam_ke
+        ):
+            refresh_legger_kelas(jurnal.semester_id, [jurnal.kelas])
+        
         db.session.commit()
         
         return jsonify({'message': 'Jurnal berhasil dihapus'})
@@ -1,8 +1,36 @@
 from flask import Blueprint, request, jsonify
 from models import db, Kelas
+from routes.dashboard_routes import invalidate_dashboard_cache
+from cache import get_cached_generasi, naikkan_generasi
+import threading
 
 kelas_bp = Blueprint('kelas', __name__)
 
+# Cache nama kelas -> id per proses: {'nilai', 'generasi', 'dicek'}
+kelas_id_cache = {}
+kelas_id_cache_lock = threading.Lock()
+GENERASI_KELAS = 'kelas'
+
+def load_kelas_ids():
+    """Peta nama kelas -> id dalam satu query (nama ganda: id terkecil)"""
+    kelas_ids = {}
+    for row in db.session.query(Kelas.id, Kelas.nama).order_by(Kelas.id):
+        kelas_ids.setdefault(row.nama, row.id)
+    return kelas_ids
+
+def get_kelas_id(nama):
+    """Id kelas untuk nama kelas dari cache proses, None jika tidak ada"""
+    if not nama:
+        return None
+    return get_cached_generasi(
+        kelas_id_cache, kelas_id_cache_lock, GENERASI_KELAS, load_kelas_ids
+    ).get(nama)
+
+def invalidate_kelas_cache():
+    """Buang cache nama kelas proses ini"""
+    with kelas_id_cache_lock:
+        kelas_id_cache.clear()
+
 @kelas_bp.route('/kelas', methods=['GET'])
 def get_kelas():
     try:
@@ -33,7 +61,10 @@ def create_kelas():
         )
         
         db.session.add(kelas)
+        naikkan_generasi(GENERASI_KELAS)
         db.session.commit()
+        invalidate_kelas_cache()
+        invalidate_dashboard_cache()
         
         return jsonify({
             'message': 'Kelas berhasil ditambahkan',
@@ -71,7 +102,10 @@ def update_kelas(id):
         kelas.wali_kelas = data.get('wali_kelas', '')
         kelas.kapasitas = data.get('kapasitas', 36)
         
+        naikkan_generasi(GENERASI_KELAS)
         db.session.commit()
+        invalidate_kelas_cache()
+        invalidate_dashboard_cache()
         
         return jsonify({'message': 'Kelas berhasil diupdate'})
         
@@ -91,7 +125,10 @@ def delete_kelas(id):
             }), 400
         
         db.session.delete(kelas)
+        naikkan_generasi(GENERASI_KELAS)
         db.session.commit()
+        invalidate_kelas_cache()
+        invalidate_dashboard_cache()
         
         return jsonify({'message': 'Kelas berhasil dihapus'})
         
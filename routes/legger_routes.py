@@ -1,10 +1,40 @@
-from flask import Blueprint, request, jsonify
-from models import db, Legger, Siswa, Semester, Absensi, NilaiFormatif, NilaiSumatif
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from models import db, Legger, Siswa, Semester, Absensi, NilaiFormatif, NilaiSumatif, BobotNilai, BobotNilaiVersi, Pertemuan
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, case, distinct, exists
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from routes.dashboard_routes import publish_dashboard_event
+from cache import get_cached_generasi
+from array import array
+from bisect import bisect_right
+from itertools import islice, repeat
+from operator import ne
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape as xml_escape
+import csv
+import io
+import threading
+import time
+import uuid
+import zipfile
 
 legger_bp = Blueprint('legger', __name__)
 
+# Job generate legger seluruh sekolah yang berjalan di background
+legger_jobs = {}
+legger_jobs_lock = threading.Lock()
+legger_write_lock = threading.Lock()
+legger_executor = None
+MAX_LEGGER_JOBS = 20
+# Baris per upsert/IN legger; 11 parameter per baris tetap di bawah
+# SQLITE_MAX_VARIABLE_NUMBER bawaan (32766) untuk sekolah sebesar apa pun
+LEGGER_CHUNK_SIZE = 500
+
+# Cache bobot nilai yang berlaku semua semester: {'nilai', 'generasi', 'dicek'}
+bobot_cache = {}
+bobot_cache_lock = threading.Lock()
+GENERASI_BOBOT = 'bobot'
+
 @legger_bp.route('/legger', methods=['GET'])
 def get_legger():
     try:
@@ -19,25 +49,34 @@ def get_legger():
         if not semester:
             return jsonify({'error': 'Semester tidak ditemukan'}), 404
         
-        # Get siswa berdasarkan kelas
-        siswa_list = Siswa.query.filter_by(kelas=kelas).all()
+        # Get siswa berdasarkan kelas beserta legger yang sudah ada (satu query)
+        rows = db.session.query(Siswa, Legger).outerjoin(
+            Legger,
+            (Legger.siswa_id == Siswa.id) & (Legger.semester_id == semester.id)
+        ).filter(Siswa.kelas == kelas).order_by(Siswa.id).all()
         
-        if not siswa_list:
+        if not rows:
             return jsonify({'error': f'Tidak ada siswa di kelas {kelas}'}), 404
         
+        # Siswa yang belum punya legger atau legger-nya dihitung dengan
+        # versi bobot lama dihitung sekaligus dari data mentah
+        bobot_versi_id = get_bobot_nilai(semester.id)['versi_id']
+        missing_ids = [
+            siswa.id for siswa, legger in rows
+            if legger is None or legger.bobot_versi_id != bobot_versi_id
+        ]
+        calculated = {}
+        if missing_ids:
+            calculated = {
+                item['siswa_id']: item
+                for item in calculate_legger_bulk(semester, siswa_ids=missing_ids)
+            }
+        
         legger_data = []
         
-        for siswa in siswa_list:
-            # Cari data legger yang sudah ada
-            legger = Legger.query.filter_by(
-                siswa_id=siswa.id,
-                semester_id=semester_id
-            ).first()
-            
-            # Jika belum ada legger, hitung dari data mentah
-            if not legger:
-                legger_data_item = calculate_legger_data(siswa.id, semester_id)
-                legger_data.append(legger_data_item)
+        for siswa, legger in rows:
+            if siswa.id in calculated:
+                legger_data.append(calculated[siswa.id])
             else:
                 legger_data.append({
                     'siswa_id': siswa.id,
@@ -58,49 +97,131 @@ def get_legger():
         return jsonify({'error': str(e)}), 500
 
 def calculate_legger_data(siswa_id, semester_id):
-    """Hitung data legger dari data mentah"""
-    siswa = Siswa.query.get(siswa_id)
+    """Hitung data legger dari data mentah untuk satu siswa"""
     semester = Semester.query.get(semester_id)
+    result = calculate_legger_bulk(semester, siswa_ids=[siswa_id])
+    return result[0] if result else None
+
+def calculate_legger_bulk(semester, kelas=None, siswa_ids=None, bobot=None):
+    """Hitung data legger untuk banyak siswa sekaligus dengan jumlah query tetap.
     
-    # Hitung presentase kehadiran
-    total_pertemuan = Absensi.query.filter_by(
-        semester_id=semester_id
-    ).distinct(Absensi.tanggal).count()
+    Tanpa filter kelas/siswa_ids, seluruh siswa di sekolah dihitung.
+    Kehadiran, rata-rata formatif, UTS dan UAS diambil dengan subquery
+    ber-GROUP BY yang di-join ke tabel siswa, sehingga jumlah query
+    tidak bertambah seiring jumlah siswa. Tanpa bobot, dipakai bobot
+    yang berlaku dari cache. Daftar siswa_ids yang panjang dipecah per
+    LEGGER_CHUNK_SIZE.
+    """
+    if siswa_ids is None:
+        rows = query_legger_components(semester, kelas)
+    else:
+        siswa_ids = sorted(set(siswa_ids))
+        rows = []
+        for start in range(0, len(siswa_ids), LEGGER_CHUNK_SIZE):
+            rows.extend(query_legger_components(
+                semester, kelas, siswa_ids[start:start + LEGGER_CHUNK_SIZE]
+            ))
+    bobot = bobot or get_bobot_nilai(semester.id)
     
-    hadir_count = Absensi.query.filter_by(
-        siswa_id=siswa_id,
-        semester_id=semester_id,
-        status='Hadir'
-    ).count()
+    return [
+        build_legger_item(row, bobot, semester.nilai_kkm)
+        for row in rows
+    ]
+
+def query_legger_components(semester, kelas=None, siswa_ids=None):
+    """Ambil total pertemuan kelas dan komponen nilai mentah per siswa"""
+    semester_id = semester.id
     
-    presentase_kehadiran = (hadir_count / total_pertemuan * 100) if total_pertemuan > 0 else 0
+    # Total pertemuan = jumlah tanggal pertemuan kelas siswa dalam semester
+    pertemuan_sq = db.session.query(
+        Pertemuan.kelas.label('kelas'),
+        func.count(distinct(Pertemuan.tanggal)).label('total_pertemuan')
+    ).filter(
+        Pertemuan.semester_id == semester_id
+    ).group_by(Pertemuan.kelas).subquery()
     
-    # Hitung nilai formatif (rata-rata semua nilai formatif)
-    nilai_formatif_avg = db.session.query(
-        func.avg(NilaiFormatif.nilai)
-    ).filter_by(
-        siswa_id=siswa_id,
-        semester_id=semester_id
-    ).scalar() or 0
+    # Jumlah tidak hadir per siswa, hanya pada hari pertemuan kelas siswa agar
+    # pembilang dan penyebut menghitung hari yang sama (tidak lewat 100%
+    # setelah pindah kelas atau absensi di hari tanpa pertemuan). Hari
+    # pertemuan tanpa catatan dianggap Hadir, seperti di lembar absensi.
+    absen_sq = db.session.query(
+        Absensi.siswa_id.label('siswa_id'),
+        func.count(Absensi.id).label('absen_count')
+    ).join(
+        Siswa, Siswa.id == Absensi.siswa_id
+    ).filter(
+        Absensi.semester_id == semester_id,
+        Absensi.status != 'Hadir',
+        exists().where(
+            Pertemuan.semester_id == semester_id,
+            Pertemuan.kelas == Siswa.kelas,
+            Pertemuan.tanggal == Absensi.tanggal
+        )
+    ).group_by(Absensi.siswa_id).subquery()
     
-    # Ambil nilai UTS
-    nilai_uts = NilaiSumatif.query.filter_by(
-        siswa_id=siswa_id,
-        semester_id=semester_id,
-        jenis='UTS'
-    ).first()
-    nilai_uts_value = nilai_uts.nilai if nilai_uts else 0
+    # Rata-rata nilai formatif per siswa
+    formatif_sq = db.session.query(
+        NilaiFormatif.siswa_id.label('siswa_id'),
+        func.avg(NilaiFormatif.nilai).label('formatif_avg')
+    ).filter(
+        NilaiFormatif.semester_id == semester_id
+    ).group_by(NilaiFormatif.siswa_id).subquery()
     
-    # Ambil nilai UAS
-    nilai_uas = NilaiSumatif.query.filter_by(
-        siswa_id=siswa_id,
-        semester_id=semester_id,
-        jenis='UAS'
-    ).first()
-    nilai_uas_value = nilai_uas.nilai if nilai_uas else 0
+    # Nilai UTS/UAS per siswa (baris pertama per jenis, seperti .first())
+    first_sumatif_ids = db.session.query(
+        func.min(NilaiSumatif.id)
+    ).filter(
+        NilaiSumatif.semester_id == semester_id
+    ).group_by(NilaiSumatif.siswa_id, NilaiSumatif.jenis)
+    
+    sumatif_sq = db.session.query(
+        NilaiSumatif.siswa_id.label('siswa_id'),
+        func.max(case((NilaiSumatif.jenis == 'UTS', NilaiSumatif.nilai))).label('nilai_uts'),
+        func.max(case((NilaiSumatif.jenis == 'UAS', NilaiSumatif.nilai))).label('nilai_uas')
+    ).filter(
+        NilaiSumatif.id.in_(first_sumatif_ids)
+    ).group_by(NilaiSumatif.siswa_id).subquery()
+    
+    query = db.session.query(
+        Siswa.id,
+        Siswa.nama,
+        Siswa.nisn,
+        Siswa.kelas,
+        pertemuan_sq.c.total_pertemuan,
+        (
+            func.coalesce(pertemuan_sq.c.total_pertemuan, 0) - func.coalesce(absen_sq.c.absen_count, 0)
+        ).label('hadir_count'),
+        formatif_sq.c.formatif_avg,
+        sumatif_sq.c.nilai_uts,
+        sumatif_sq.c.nilai_uas
+    ).outerjoin(
+        pertemuan_sq, pertemuan_sq.c.kelas == Siswa.kelas
+    ).outerjoin(
+        absen_sq, absen_sq.c.siswa_id == Siswa.id
+    ).outerjoin(
+        formatif_sq, formatif_sq.c.siswa_id == Siswa.id
+    ).outerjoin(
+        sumatif_sq, sumatif_sq.c.siswa_id == Siswa.id
+    )
+    
+    if kelas:
+        query = query.filter(Siswa.kelas == kelas)
+    if siswa_ids is not None:
+        query = query.filter(Siswa.id.in_(siswa_ids))
+    
+    return query.order_by(Siswa.id).all()
+
+def build_legger_item(row, bobot, kkm):
+    """Susun satu baris legger dari hasil agregasi"""
+    hadir_count = row.hadir_count or 0
+    total_pertemuan = row.total_pertemuan or 0
+    presentase_kehadiran = (hadir_count / total_pertemuan * 100) if total_pertemuan > 0 else 0
+    
+    nilai_formatif_avg = row.formatif_avg or 0
+    nilai_uts_value = row.nilai_uts if row.nilai_uts is not None else 0
+    nilai_uas_value = row.nilai_uas if row.nilai_uas is not None else 0
     
     # Hitung nilai akhir berdasarkan bobot
-    bobot = get_bobot_nilai()
     nilai_akhir = (
         (nilai_formatif_avg * bobot['formatif'] / 100) +
         (nilai_uts_value * bobot['uts'] / 100) +
@@ -109,13 +230,13 @@ def calculate_legger_data(siswa_id, semester_id):
     )
     
     # Tentukan predikat
-    predikat = calculate_predikat(nilai_akhir, semester.nilai_kkm)
+    predikat = calculate_predikat(nilai_akhir, kkm)
     
     return {
-        'siswa_id': siswa.id,
-        'nama': siswa.nama,
-        'nisn': siswa.nisn,
-        'kelas': siswa.kelas,
+        'siswa_id': row.id,
+        'nama': row.nama,
+        'nisn': row.nisn,
+        'kelas': row.kelas,
         'presentase_kehadiran': round(presentase_kehadiran, 2),
         'nilai_formatif': round(nilai_formatif_avg, 2),
         'nilai_uts': nilai_uts_value,
@@ -124,12 +245,15 @@ def calculate_legger_data(siswa_id, semester_id):
         'predikat': predikat
     }
 
-def get_bobot_nilai():
-    """Ambil bobot nilai dari database"""
-    from models import BobotNilai
+def load_bobot_nilai():
+    """Bobot yang berlaku per semester dari database: {semester_id: bobot, None: bobot default}.
+    
+    Versi terbaru milik semester dipakai jika ada, selain itu bobot default
+    (versi_id None).
+    """
     bobot = BobotNilai.query.first()
     if bobot:
-        return {
+        default = {
             'formatif': bobot.formatif,
             'uts': bobot.uts,
             'uas': bobot.uas,
@@ -137,12 +261,120 @@ def get_bobot_nilai():
         }
     else:
         # Default bobot
-        return {
+        default = {
             'formatif': 25,
             'uts': 25,
             'uas': 30,
             'absensi': 20
         }
+    result = {None: dict(default, versi_id=None, versi=0)}
+    
+    versi_terbaru = db.session.query(
+        BobotNilaiVersi.semester_id,
+        func.max(BobotNilaiVersi.versi).label('versi')
+    ).group_by(BobotNilaiVersi.semester_id).subquery()
+    daftar_versi = BobotNilaiVersi.query.join(
+        versi_terbaru,
+        (BobotNilaiVersi.semester_id == versi_terbaru.c.semester_id) &
+        (BobotNilaiVersi.versi == versi_terbaru.c.versi)
+    ).all()
+    for versi in daftar_versi:
+        result[versi.semester_id] = {
+            'formatif': versi.formatif,
+            'uts': versi.uts,
+            'uas': versi.uas,
+            'absensi': versi.absensi,
+            'versi_id': versi.id,
+            'versi': versi.versi
+        }
+    return result
+
+def get_bobot_nilai(semester_id=None):
+    """Bobot nilai yang berlaku untuk semester, dari cache proses.
+    
+    Cache divalidasi dengan generasi 'bobot' yang dinaikkan route penulis
+    dalam transaksi yang sama dengan perubahan bobot.
+    """
+    semua = get_cached_generasi(bobot_cache, bobot_cache_lock, GENERASI_BOBOT, load_bobot_nilai)
+    return semua.get(semester_id, semua[None])
+
+def baca_bobot_nilai(semester_id):
+    """Bobot nilai semester langsung dari session, termasuk perubahan yang belum di-commit"""
+    semua = load_bobot_nilai()
+    return semua.get(semester_id, semua[None])
+
+def invalidate_bobot_cache():
+    """Kosongkan cache bobot nilai"""
+    with bobot_cache_lock:
+        bobot_cache.clear()
+
+def create_bobot_versi(semester_id, bobot):
+    """Simpan snapshot bobot sebagai versi baru untuk semester, tanpa commit"""
+    versi_terakhir = db.session.query(
+        func.max(BobotNilaiVersi.versi)
+    ).filter(
+        BobotNilaiVersi.semester_id == semester_id
+    ).scalar() or 0
+    
+    versi = BobotNilaiVersi(
+        semester_id=semester_id,
+        versi=versi_terakhir + 1,
+        formatif=bobot['formatif'],
+        uts=bobot['uts'],
+        uas=bobot['uas'],
+        absensi=bobot['absensi']
+    )
+    db.session.add(versi)
+    db.session.flush()
+    return versi
+
+def freeze_bobot_default(bobot, exclude_semester_id=None):
+    """Bekukan bobot default lama untuk semester yang belum punya versi.
+    
+    Dipanggil sebelum bobot default diubah agar legger semester lain yang
+    dihitung dengan bobot default tetap valid dan tidak ikut berubah.
+    """
+    semester_ids = {
+        row.semester_id for row in db.session.query(Legger.semester_id).filter(
+            Legger.bobot_versi_id.is_(None)
+        ).distinct()
+    }
+    semester_ids -= {
+        row.semester_id for row in db.session.query(BobotNilaiVersi.semester_id).distinct()
+    }
+    semester_ids.discard(exclude_semester_id)
+    
+    for semester_id in semester_ids:
+        versi = create_bobot_versi(semester_id, bobot)
+        Legger.query.filter(
+            Legger.semester_id == semester_id,
+            Legger.bobot_versi_id.is_(None)
+        ).update({'bobot_versi_id': versi.id}, synchronize_session=False)
+    
+    return len(semester_ids)
+
+def refresh_stale_legger(semester):
+    """Hitung ulang hanya legger yang dihitung dengan versi bobot lama.
+    
+    Dipanggil sebelum commit perubahan bobot, sehingga bobot dibaca langsung
+    dari session dan tidak masuk ke cache yang dipakai thread lain.
+    """
+    bobot = baca_bobot_nilai(semester.id)
+    bobot_versi_id = bobot['versi_id']
+    
+    # Satu query lewat index (semester_id, bobot_versi_id)
+    stale_ids = [
+        row.siswa_id for row in db.session.query(Legger.siswa_id).filter(
+            Legger.semester_id == semester.id,
+            Legger.bobot_versi_id.is_distinct_from(bobot_versi_id)
+        )
+    ]
+    
+    if not stale_ids:
+        return 0
+    
+    legger_list = calculate_legger_bulk(semester, siswa_ids=stale_ids, bobot=bobot)
+    return save_legger_rows(semester.id, legger_list, bobot=bobot)
 
 def calculate_predikat(nilai_akhir, kkm):
     """Hitung predikat berdasarkan nilai akhir dan KKM"""
@@ -157,9 +389,161 @@ def calculate_predikat(nilai_akhir, kkm):
     else:
         return 'E'
 
+# Predikat per tingkat (jumlah batas PREDIKAT_BATAS yang dicapai nilai akhir)
+PREDIKAT_TINGKAT = ['E', 'D', 'C', 'B', 'A']
+# Selisih nilai akhir dari KKM untuk predikat D, C, B, A (lihat calculate_predikat)
+PREDIKAT_BATAS = (0, 5, 10, 15)
+# Siswa yang predikatnya berubah yang dikirim per skenario (jumlah lengkap tetap dihitung)
+SIMULASI_PERUBAHAN_LIMIT = 100
+MAX_SIMULASI_PERUBAHAN_LIMIT = 5000
+
+def angka_valid(value, minimum=0, maximum=100):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and minimum <= value <= maximum
+
+@legger_bp.route('/legger/simulasi-bobot', methods=['POST'])
+def simulasi_bobot():
+    """Simulasikan distribusi predikat untuk beberapa kandidat bobot nilai"""
+    try:
+        data = request.get_json()
+        semester_id = data.get('semester_id')
+        skenario_list = data.get('skenario') or []
+        
+        if not semester_id or not skenario_list:
+            return jsonify({'error': 'Parameter semester_id dan skenario diperlukan'}), 400
+        
+        limit = data.get('limit', SIMULASI_PERUBAHAN_LIMIT)
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+            return jsonify({'error': 'limit harus bilangan bulat >= 0'}), 400
+        limit = min(limit, MAX_SIMULASI_PERUBAHAN_LIMIT)
+        
+        semester = Semester.query.get(semester_id)
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        bobot_list = [dict(get_bobot_nilai(semester.id), kkm=semester.nilai_kkm)]
+        for skenario in skenario_list:
+            try:
+                bobot = {key: skenario[key] for key in ('formatif', 'uts', 'uas', 'absensi')}
+            except (KeyError, TypeError):
+                return jsonify({'error': 'Setiap skenario harus berisi formatif, uts, uas dan absensi'}), 400
+            if not all(angka_valid(value) for value in bobot.values()):
+                return jsonify({'error': 'Bobot skenario harus angka 0-100'}), 400
+            if sum(bobot.values()) != 100:
+                return jsonify({'error': 'Total bobot setiap skenario harus 100%'}), 400
+            bobot['kkm'] = skenario.get('kkm', semester.nilai_kkm)
+            if not angka_valid(bobot['kkm']):
+                return jsonify({'error': 'KKM skenario harus angka 0-100'}), 400
+            bobot_list.append(bobot)
+        
+        komponen = load_komponen_nilai(semester, data.get('kelas'))
+        
+        # Bobot saat ini dihitung bersama skenario sebagai pembanding
+        simulasi = simulate_predikat_batch(komponen, bobot_list)
+        predikat_saat_ini, distribusi_saat_ini = simulasi[0]
+        
+        hasil = []
+        for index, (bobot, (predikat, distribusi)) in enumerate(zip(bobot_list[1:], simulasi[1:])):
+            berubah = (
+                i for i, (lama, baru) in enumerate(zip(predikat_saat_ini, predikat))
+                if lama != baru
+            )
+            perubahan = [
+                {
+                    'siswa_id': komponen['siswa_id'][i],
+                    'nama': komponen['nama'][i],
+                    'kelas': komponen['kelas'][i],
+                    'predikat_lama': PREDIKAT_TINGKAT[predikat_saat_ini[i]],
+                    'predikat_baru': PREDIKAT_TINGKAT[predikat[i]]
+                }
+                for i in islice(berubah, limit)
+            ]
+            hasil.append({
+                'nama': skenario_list[index].get('nama', f'Skenario {index + 1}'),
+                'bobot': bobot,
+                'distribusi': distribusi,
+                'jumlah_berubah': sum(map(ne, predikat_saat_ini, predikat)),
+                'perubahan': perubahan
+            })
+        
+        return jsonify({
+            'total_siswa': len(komponen['siswa_id']),
+            'bobot_saat_ini': bobot_list[0],
+            'distribusi_saat_ini': distribusi_saat_ini,
+            'limit': limit,
+            'skenario': hasil
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def load_komponen_nilai(semester, kelas=None):
+    """Muat komponen nilai semester sekali ke kolom-kolom array"""
+    rows = query_legger_components(semester, kelas)
+    
+    komponen = {
+        'siswa_id': array('l'),
+        'nama': [],
+        'kelas': [],
+        'kehadiran': array('d'),
+        'formatif': array('d'),
+        'uts': array('d'),
+        'uas': array('d')
+    }
+    
+    for row in rows:
+        hadir_count = row.hadir_count or 0
+        total_pertemuan = row.total_pertemuan or 0
+        komponen['siswa_id'].append(row.id)
+        komponen['nama'].append(row.nama)
+        komponen['kelas'].append(row.kelas)
+        komponen['kehadiran'].append((hadir_count / total_pertemuan * 100) if total_pertemuan > 0 else 0)
+        komponen['formatif'].append(row.formatif_avg or 0)
+        komponen['uts'].append(row.nilai_uts if row.nilai_uts is not None else 0)
+        komponen['uas'].append(row.nilai_uas if row.nilai_uas is not None else 0)
+    
+    return komponen
+
+def simulate_predikat_batch(komponen, bobot_list):
+    """Hitung predikat semua siswa untuk setiap bobot, per kolom.
+    
+    Kolom nilai akhir dihitung sekali per kombinasi bobot (skenario yang
+    hanya berbeda KKM memakai kolom yang sama), dengan urutan operasi
+    build_legger_item agar nilai di batas KKM identik dengan legger.
+    Tingkat predikat seluruh kolom dicari dengan bisect terhadap batas KKM.
+    Hasilnya (tingkat, distribusi) per bobot; tingkat berisi indeks
+    PREDIKAT_TINGKAT per siswa.
+    """
+    kolom = list(zip(komponen['formatif'], komponen['uts'], komponen['uas'], komponen['kehadiran']))
+    nilai_cache = {}
+    hasil = []
+    for bobot in bobot_list:
+        kunci = (bobot['formatif'], bobot['uts'], bobot['uas'], bobot['absensi'])
+        nilai_akhir = nilai_cache.get(kunci)
+        if nilai_akhir is None:
+            w_formatif, w_uts, w_uas, w_absensi = kunci
+            nilai_akhir = nilai_cache[kunci] = array('d', [
+                (formatif * w_formatif / 100) +
+                (uts * w_uts / 100) +
+                (uas * w_uas / 100) +
+                (kehadiran * w_absensi / 100)
+                for formatif, uts, uas, kehadiran in kolom
+            ])
+        
+        # Jumlah batas yang dicapai = indeks PREDIKAT_TINGKAT, sama dengan calculate_predikat
+        batas = [bobot['kkm'] + selisih for selisih in PREDIKAT_BATAS]
+        tingkat = bytes(map(bisect_right, repeat(batas), nilai_akhir))
+        distribusi = {nama: tingkat.count(index) for index, nama in enumerate(PREDIKAT_TINGKAT)}
+        hasil.append((tingkat, distribusi))
+    
+    return hasil
+
 @legger_bp.route('/legger/generate', methods=['POST'])
 def generate_legger():
-    """Generate legger untuk semua siswa di kelas tertentu"""
+    """Generate legger untuk semua siswa di kelas tertentu.
+    
+    Dengan kelas 'all', generate dijalankan untuk seluruh sekolah sebagai
+    job background dan response berisi job_id untuk dipantau.
+    """
     try:
         data = request.get_json()
         kelas = data.get('kelas')
@@ -168,50 +552,35 @@ def generate_legger():
         if not kelas or not semester_id:
             return jsonify({'error': 'Parameter kelas dan semester_id diperlukan'}), 400
         
-        # Get semua siswa di kelas
-        siswa_list = Siswa.query.filter_by(kelas=kelas).all()
+        semester = Semester.query.get(semester_id)
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
         
-        if not siswa_list:
-            return jsonify({'error': f'Tidak ada siswa di kelas {kelas}'}), 404
+        if kelas == 'all':
+            job = start_legger_job(semester)
+            with legger_jobs_lock:
+                progress = get_job_progress(job)
+            return jsonify({
+                'message': f'Generate legger untuk {progress["total_kelas"]} kelas sedang berjalan',
+                'job_id': progress['job_id'],
+                'progress': progress
+            }), 202
         
-        generated_count = 0
+        # Hitung data legger semua siswa di kelas sekaligus
+        legger_list = calculate_legger_bulk(semester, kelas=kelas)
         
-        for siswa in siswa_list:
-            # Hitung data legger
-            legger_data = calculate_legger_data(siswa.id, semester_id)
-            
-            # Cek apakah sudah ada legger
-            existing_legger = Legger.query.filter_by(
-                siswa_id=siswa.id,
-                semester_id=semester_id
-            ).first()
-            
-            if existing_legger:
-                # Update legger yang sudah ada
-                existing_legger.presentase_kehadiran = legger_data['presentase_kehadiran']
-                existing_legger.nilai_formatif = legger_data['nilai_formatif']
-                existing_legger.nilai_uts = legger_data['nilai_uts']
-                existing_legger.nilai_uas = legger_data['nilai_uas']
-                existing_legger.nilai_akhir = legger_data['nilai_akhir']
-                existing_legger.predikat = legger_data['predikat']
-                existing_legger.updated_at = datetime.utcnow()
-            else:
-                # Buat legger baru
-                legger = Legger(
-                    siswa_id=siswa.id,
-                    semester_id=semester_id,
-                    presentase_kehadiran=legger_data['presentase_kehadiran'],
-                    nilai_formatif=legger_data['nilai_formatif'],
-                    nilai_uts=legger_data['nilai_uts'],
-                    nilai_uas=legger_data['nilai_uas'],
-                    nilai_akhir=legger_data['nilai_akhir'],
-                    predikat=legger_data['predikat']
-                )
-                db.session.add(legger)
-            
-            generated_count += 1
+        if not legger_list:
+            return jsonify({'error': f'Tidak ada siswa di kelas {kelas}'}), 404
+        
+        generated_count = save_legger_rows(semester.id, legger_list)
         
         db.session.commit()
+        publish_dashboard_event(
+            'legger',
+            kelas=[kelas],
+            semester_id=semester.id,
+            jumlah=generated_count
+        )
         
         return jsonify({
             'message': f'Legger berhasil digenerate untuk {generated_count} siswa',
@@ -222,50 +591,382 @@ def generate_legger():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@legger_bp.route('/legger/jobs/<job_id>', methods=['GET'])
+def get_legger_job(job_id):
+    """Progress job generate legger seluruh sekolah"""
+    with legger_jobs_lock:
+        job = legger_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job tidak ditemukan'}), 404
+        return jsonify(get_job_progress(job))
+
+def get_job_progress(job):
+    """Ringkasan progress job (kelas, siswa, waktu berjalan)"""
+    finished_at = job['finished_at'] or time.monotonic()
+    return {
+        'job_id': job['job_id'],
+        'semester_id': job['semester_id'],
+        'status': job['status'],
+        'total_kelas': job['total_kelas'],
+        'kelas_selesai': job['kelas_selesai'],
+        'total_siswa': job['total_siswa'],
+        'siswa_selesai': job['siswa_selesai'],
+        'elapsed_seconds': round(finished_at - job['started_at'], 2),
+        'errors': list(job['errors'])
+    }
+
+def get_legger_executor(app):
+    """Worker pool bersama untuk job legger"""
+    global legger_executor
+    with legger_jobs_lock:
+        if legger_executor is None:
+            legger_executor = ThreadPoolExecutor(
+                max_workers=app.config.get('LEGGER_JOB_WORKERS', 4),
+                thread_name_prefix='legger-job'
+            )
+        return legger_executor
+
+def start_legger_job(semester):
+    """Bagi generate legger seluruh sekolah per kelas ke worker pool"""
+    app = current_app._get_current_object()
+    
+    # Jumlah siswa per kelas untuk progress
+    kelas_counts = db.session.query(
+        Siswa.kelas, func.count(Siswa.id)
+    ).group_by(Siswa.kelas).order_by(Siswa.kelas).all()
+    
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'semester_id': semester.id,
+        'status': 'Berjalan',
+        'total_kelas': len(kelas_counts),
+        'kelas_selesai': 0,
+        'total_siswa': sum(jumlah for _, jumlah in kelas_counts),
+        'siswa_selesai': 0,
+        'started_at': time.monotonic(),
+        'finished_at': None,
+        'errors': []
+    }
+    
+    with legger_jobs_lock:
+        # Buang job lama yang sudah selesai
+        finished = [key for key, item in legger_jobs.items() if item['finished_at']]
+        for key in finished[:max(0, len(legger_jobs) - MAX_LEGGER_JOBS + 1)]:
+            del legger_jobs[key]
+        legger_jobs[job['job_id']] = job
+    
+    if not kelas_counts:
+        update_legger_job(job['job_id'])
+        return job
+    
+    executor = get_legger_executor(app)
+    for kelas, _ in kelas_counts:
+        executor.submit(run_legger_job_kelas, app, job['job_id'], semester.id, kelas)
+    
+    return job
+
+def run_legger_job_kelas(app, job_id, semester_id, kelas):
+    """Hitung dan simpan legger satu kelas dalam transaksi per batch"""
+    with app.app_context():
+        try:
+            semester = Semester.query.get(semester_id)
+            legger_list = calculate_legger_bulk(semester, kelas=kelas)
+            batch_size = app.config.get('LEGGER_JOB_BATCH_SIZE', 200)
+            
+            for start in range(0, len(legger_list), batch_size):
+                batch = legger_list[start:start + batch_size]
+                # SQLite hanya mengizinkan satu penulis, perhitungan tetap paralel
+                with legger_write_lock:
+                    save_legger_rows(semester_id, batch)
+                    db.session.commit()
+                update_legger_job(job_id, siswa_selesai=len(batch))
+            
+            update_legger_job(job_id, kelas_selesai=1)
+        except Exception as e:
+            db.session.rollback()
+            update_legger_job(job_id, kelas_selesai=1, error=f'{kelas}: {e}')
+
+def update_legger_job(job_id, kelas_selesai=0, siswa_selesai=0, error=None):
+    """Catat progress job dan tandai selesai jika semua kelas sudah diproses"""
+    selesai = None
+    with legger_jobs_lock:
+        job = legger_jobs.get(job_id)
+        if not job:
+            return
+        job['kelas_selesai'] += kelas_selesai
+        job['siswa_selesai'] += siswa_selesai
+        if error:
+            job['errors'].append(error)
+        if job['kelas_selesai'] >= job['total_kelas']:
+            job['status'] = 'Gagal' if job['errors'] else 'Selesai'
+            job['finished_at'] = time.monotonic()
+            selesai = get_job_progress(job)
+    
+    if selesai:
+        publish_dashboard_event(
+            'legger',
+            kelas='all',
+            semester_id=selesai['semester_id'],
+            jumlah=selesai['siswa_selesai'],
+            status=selesai['status']
+        )
+
+def save_legger_rows(semester_id, legger_list, bobot=None):
+    """Simpan (insert/update) hasil perhitungan legger, satu upsert per LEGGER_CHUNK_SIZE baris, tanpa commit"""
+    if not legger_list:
+        return 0
+    
+    bobot_versi_id = (bobot or get_bobot_nilai(semester_id))['versi_id']
+    now = datetime.utcnow()
+    
+    for start in range(0, len(legger_list), LEGGER_CHUNK_SIZE):
+        upsert_legger_rows(
+            semester_id, legger_list[start:start + LEGGER_CHUNK_SIZE], bobot_versi_id, now
+        )
+    
+    return len(legger_list)
+
+def upsert_legger_rows(semester_id, legger_list, bobot_versi_id, now):
+    stmt = sqlite_insert(Legger).values([
+        {
+            'siswa_id': legger_data['siswa_id'],
+            'semester_id': semester_id,
+            'presentase_kehadiran': legger_data['presentase_kehadiran'],
+            'nilai_formatif': legger_data['nilai_formatif'],
+            'nilai_uts': legger_data['nilai_uts'],
+            'nilai_uas': legger_data['nilai_uas'],
+            'nilai_akhir': legger_data['nilai_akhir'],
+            'predikat': legger_data['predikat'],
+            'bobot_versi_id': bobot_versi_id,
+            'created_at': now,
+            'updated_at': now
+        }
+        for legger_data in legger_list
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['siswa_id', 'semester_id'],
+        set_={
+            'presentase_kehadiran': stmt.excluded.presentase_kehadiran,
+            'nilai_formatif': stmt.excluded.nilai_formatif,
+            'nilai_uts': stmt.excluded.nilai_uts,
+            'nilai_uas': stmt.excluded.nilai_uas,
+            'nilai_akhir': stmt.excluded.nilai_akhir,
+            'predikat': stmt.excluded.predikat,
+            'bobot_versi_id': stmt.excluded.bobot_versi_id,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    db.session.execute(stmt)
+
+def refresh_legger(semester, siswa_ids=None):
+    """Hitung ulang baris legger yang terdampak perubahan nilai/absensi.
+    
+    Dipanggil dari route penyimpanan sebelum commit sehingga legger ikut
+    tersimpan dalam transaksi yang sama. Tanpa siswa_ids, seluruh legger
+    semester dihitung ulang.
+    """
+    if not current_app.config.get('LEGGER_AUTO_REFRESH', True):
+        return 0
+    
+    legger_list = calculate_legger_bulk(semester, siswa_ids=siswa_ids)
+    return save_legger_rows(semester.id, legger_list)
+
 @legger_bp.route('/legger/export', methods=['GET'])
 def export_legger():
-    """Export legger ke format CSV/Excel"""
+    """Export legger ke file CSV/Excel yang di-stream per kelas.
+    
+    Parameter kelas dan semester dapat berisi beberapa nilai (dipisah koma
+    atau diulang) atau 'all' untuk semua kelas/semester.
+    """
     try:
-        kelas = request.args.get('kelas')
-        semester_id = request.args.get('semester')
+        kelas_list = get_list_param('kelas')
+        semester_ids = get_list_param('semester')
+        file_format = request.args.get('format', 'csv').lower()
         
-        if not kelas or not semester_id:
+        if not kelas_list or not semester_ids:
             return jsonify({'error': 'Parameter kelas dan semester diperlukan'}), 400
         
-        # Get data legger
-        legger_data = get_legger_data_for_export(kelas, semester_id)
+        if file_format not in ('csv', 'xlsx'):
+            return jsonify({'error': 'Format export harus csv atau xlsx'}), 400
         
-        # Untuk sekarang, return data JSON
-        # Di production, bisa generate CSV/Excel file
-        return jsonify({
-            'message': 'Data siap untuk export',
-            'data': legger_data,
-            'total_records': len(legger_data)
-        })
+        if 'all' in semester_ids:
+            semester_list = Semester.query.order_by(Semester.tanggal_mulai).all()
+        else:
+            semester_list = Semester.query.filter(Semester.id.in_(semester_ids)).order_by(Semester.tanggal_mulai).all()
+            if len(semester_list) != len(set(semester_ids)):
+                return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        if 'all' in kelas_list:
+            kelas_list = [row.kelas for row in db.session.query(Siswa.kelas).distinct().order_by(Siswa.kelas)]
+        
+        rows = get_legger_data_for_export(kelas_list, semester_list)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        if file_format == 'xlsx':
+            body = stream_legger_xlsx(rows)
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            body = stream_legger_csv(rows)
+            mimetype = 'text/csv'
+        
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=legger_{timestamp}.{file_format}'}
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def get_legger_data_for_export(kelas, semester_id):
-    """Ambil data legger untuk export"""
-    siswa_list = Siswa.query.filter_by(kelas=kelas).all()
-    semester = Semester.query.get(semester_id)
+def get_list_param(name):
+    """Ambil parameter query yang bisa diulang atau dipisah koma"""
+    values = []
+    for value in request.args.getlist(name):
+        values.extend(item.strip() for item in value.split(',') if item.strip())
+    return values
+
+EXPORT_COLUMNS = [
+    'NISN', 'Nama Siswa', 'Kelas', 'Semester', 'Presentase Kehadiran (%)',
+    'Nilai Formatif', 'Nilai UTS', 'Nilai UAS', 'Nilai Akhir', 'Predikat', 'KKM'
+]
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def get_legger_data_for_export(kelas_list, semester_list):
+    """Hasilkan baris legger untuk export, dihitung per kelas per semester"""
+    for semester in semester_list:
+        nama_semester = f'{semester.tahun_ajaran} - Semester {semester.semester}'
+        
+        for kelas in kelas_list:
+            for legger_data in calculate_legger_bulk(semester, kelas=kelas):
+                yield {
+                    'NISN': legger_data['nisn'],
+                    'Nama Siswa': legger_data['nama'],
+                    'Kelas': legger_data['kelas'],
+                    'Semester': nama_semester,
+                    'Presentase Kehadiran (%)': legger_data['presentase_kehadiran'],
+                    'Nilai Formatif': legger_data['nilai_formatif'],
+                    'Nilai UTS': legger_data['nilai_uts'],
+                    'Nilai UAS': legger_data['nilai_uas'],
+                    'Nilai Akhir': legger_data['nilai_akhir'],
+                    'Predikat': legger_data['predikat'],
+                    'KKM': semester.nilai_kkm
+                }
+
+def stream_legger_csv(rows):
+    """Tulis baris legger sebagai CSV dan kirim per potongan"""
+    buffer = io.StringIO()
+    # BOM agar Excel membaca UTF-8 dengan benar
+    buffer.write('\ufeff')
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
     
-    export_data = []
-    
-    for siswa in siswa_list:
-        legger_data = calculate_legger_data(siswa.id, semester_id)
-        export_data.append({
-            'NISN': siswa.nisn,
-            'Nama Siswa': siswa.nama,
-            'Kelas': siswa.kelas,
-            'Presentase Kehadiran (%)': legger_data['presentase_kehadiran'],
-            'Nilai Formatif': legger_data['nilai_formatif'],
-            'Nilai UTS': legger_data['nilai_uts'],
-            'Nilai UAS': legger_data['nilai_uas'],
-            'Nilai Akhir': legger_data['nilai_akhir'],
-            'Predikat': legger_data['predikat'],
-            'KKM': semester.nilai_kkm if semester else 75
-        })
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+
+class StreamBuffer:
+    """File-like tanpa seek untuk zipfile; data diambil bertahap lewat drain()"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Legger" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="1"><xf xfId="0"/></cellXfs>'
+        '</styleSheet>'
+    )
+}
+
+def xlsx_row(index, values):
+    """Satu baris <row> worksheet dengan string inline dan angka"""
+    cells = []
+    for col, value in enumerate(values):
+        ref = f'{chr(ord("A") + col)}{index}'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = xml_escape('' if value is None else str(value))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{text}</t></is></c>')
+    return f'<row r="{index}">{"".join(cells)}</row>'
+
+def stream_legger_xlsx(rows):
+    """Tulis baris legger sebagai XLSX; arsip zip dikirim sambil ditulis"""
+    output = StreamBuffer()
+    
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield output.drain()
+        
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + xlsx_row(1, EXPORT_COLUMNS)
+            ).encode('utf-8'))
+            
+            for index, row in enumerate(rows, start=2):
+                sheet.write(xlsx_row(index, [row[col] for col in EXPORT_COLUMNS]).encode('utf-8'))
+                if output.size >= EXPORT_CHUNK_SIZE:
+                    yield output.drain()
+            
+            sheet.write(b'</sheetData></worksheet>')
     
-    return export_data
\ No newline at end of file
+    yield output.drain()
@@ -1,8 +1,38 @@
 from flask import Blueprint, request, jsonify
 from models import db, Materi
+from routes.dashboard_routes import invalidate_dashboard_cache
+from cache import get_cached_generasi, naikkan_generasi
+import threading
 
 materi_bp = Blueprint('materi', __name__)
 
+# Cache judul materi -> id per proses: {'nilai', 'generasi', 'dicek'}
+materi_id_cache = {}
+materi_id_cache_lock = threading.Lock()
+GENERASI_MATERI = 'materi'
+
+def load_materi_ids():
+    """Peta judul materi -> id dalam satu query (judul ganda: id terkecil)"""
+    materi_ids = {}
+    for row in db.session.query(Materi.id, Materi.judul).order_by(Materi.id):
+        materi_ids.setdefault(row.judul, row.id)
+    return materi_ids
+
+def get_materi_ids():
+    """Peta judul materi -> id dari cache proses"""
+    return get_cached_generasi(
+        materi_id_cache, materi_id_cache_lock, GENERASI_MATERI, load_materi_ids
+    )
+
+def get_materi_id(judul):
+    """Id materi untuk judul dari cache proses, None jika tidak ada"""
+    return get_materi_ids().get(judul) if judul else None
+
+def invalidate_materi_cache():
+    """Buang cache judul materi proses ini"""
+    with materi_id_cache_lock:
+        materi_id_cache.clear()
+
 @materi_bp.route('/materi', methods=['GET'])
 def get_materi():
     try:
@@ -36,7 +66,10 @@ def create_materi():
         )
         
         db.session.add(materi)
+        naikkan_generasi(GENERASI_MATERI)
         db.session.commit()
+        invalidate_materi_cache()
+        invalidate_dashboard_cache()
         
         return jsonify({
             'message': 'Materi berhasil ditambahkan',
@@ -78,7 +111,10 @@ def update_materi(id):
         materi.tingkat_kesulitan = data.get('tingkat_kesulitan', 'Sedang')
         materi.estimasi_waktu = data.get('estimasi_waktu', 2)
         
+        naikkan_generasi(GENERASI_MATERI)
         db.session.commit()
+        invalidate_materi_cache()
+        invalidate_dashboard_cache()
         
         return jsonify({'message': 'Materi berhasil diupdate'})
         
@@ -92,7 +128,10 @@ def delete_materi(id):
         materi = Materi.query.get_or_404(id)
         
         db.session.delete(materi)
+        naikkan_generasi(GENERASI_MATERI)
         db.session.commit()
+        invalidate_materi_cache()
+        invalidate_dashboard_cache()
         
         return jsonify({'message': 'Materi berhasil dihapus'})
         
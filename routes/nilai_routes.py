@@ -1,9 +1,26 @@
 from flask import Blueprint, request, jsonify
 from models import db, NilaiFormatif, NilaiSumatif, Siswa, Materi, Semester
 from datetime import datetime
+from sqlalchemy import func, case, select, literal, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from routes.legger_routes import refresh_legger
+from routes.semester_routes import get_active_semester
+from routes.materi_routes import get_materi_ids
+from routes.dashboard_routes import invalidate_dashboard_cache, update_rekap_nilai_harian, publish_dashboard_event
+from cache import get_generasi, naikkan_generasi
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+import threading
 
 nilai_bp = Blueprint('nilai', __name__)
 
+# Cache analitik nilai (LRU): (semester_id, kelas, materi, kkm, bins) -> (generasi, hasil)
+analitik_cache = OrderedDict()
+analitik_cache_lock = threading.Lock()
+MAX_ANALITIK_CACHE = 256
+GENERASI_NILAI = 'nilai'
+
 # === NILAI FORMATIF ===
 
 @nilai_bp.route('/nilai/formatif', methods=['GET'])
@@ -17,7 +34,7 @@ def get_nilai_formatif():
             return jsonify({'error': 'Parameter kelas dan materi diperlukan'}), 400
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
@@ -64,39 +81,68 @@ def save_nilai_formatif():
         data = request.get_json()
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
-        for item in data['nilai']:
-            # Cari materi berdasarkan nama
-            materi_obj = Materi.query.filter_by(judul=item['materi']).first()
+        tanggal = datetime.strptime(data['tanggal'], '%Y-%m-%d').date()
+        
+        if data['nilai']:
+            # Judul -> id dari cache materi, tanpa query per baris
+            materi_judul = {item['materi'] for item in data['nilai']}
+            materi_ids = get_materi_ids()
             
-            nilai = NilaiFormatif.query.filter_by(
-                siswa_id=item['siswa_id'],
-                materi=item['materi'],
-                semester_id=active_semester.id
-            ).first()
+            # Tanggal lama nilai yang ditimpa ikut berubah rekapnya
+            tanggal_rekap = {tanggal}
+            tanggal_rekap.update(
+                row.tanggal for row in db.session.query(NilaiFormatif.tanggal).filter(
+                    NilaiFormatif.semester_id == active_semester.id,
+                    NilaiFormatif.siswa_id.in_([item['siswa_id'] for item in data['nilai']]),
+                    NilaiFormatif.materi.in_(materi_judul)
+                ).distinct()
+            )
+            
+            now = datetime.utcnow()
+            stmt = sqlite_insert(NilaiFormatif).values([
+                {
+                    'siswa_id': item['siswa_id'],
+                    'materi': item['materi'],
+                    'materi_id': materi_ids.get(item['materi']),
+                    'tanggal': tanggal,
+                    'nilai': item['nilai'],
+                    'semester_id': active_semester.id,
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for item in data['nilai']
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['siswa_id', 'materi', 'semester_id'],
+                set_={
+                    'nilai': stmt.excluded.nilai,
+                    'tanggal': stmt.excluded.tanggal,
+                    'materi_id': stmt.excluded.materi_id,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            db.session.execute(stmt)
             
-            if nilai:
-                # Update nilai yang sudah ada
-                nilai.nilai = item['nilai']
-                nilai.tanggal = datetime.strptime(data['tanggal'], '%Y-%m-%d').date()
-                nilai.materi_id = materi_obj.id if materi_obj else None
-                nilai.updated_at = datetime.utcnow()
-            else:
-                # Buat nilai baru
-                nilai = NilaiFormatif(
-                    siswa_id=item['siswa_id'],
-                    materi=item['materi'],
-                    materi_id=materi_obj.id if materi_obj else None,
-                    tanggal=datetime.strptime(data['tanggal'], '%Y-%m-%d').date(),
-                    nilai=item['nilai'],
-                    semester_id=active_semester.id
-                )
-                db.session.add(nilai)
+            update_rekap_nilai_harian(active_semester.id, list(tanggal_rekap))
+        
+        # Perbarui legger siswa yang terdampak
+        refresh_legger(active_semester, [item['siswa_id'] for item in data['nilai']])
         
+        naikkan_generasi(GENERASI_NILAI)
         db.session.commit()
+        invalidate_analitik_cache(active_semester.id)
+        invalidate_dashboard_cache()
+        publish_dashboard_event(
+            'nilai',
+            tipe='formatif',
+            materi=sorted({item['materi'] for item in data['nilai']}),
+            tanggal=tanggal.isoformat(),
+            jumlah=len(data['nilai'])
+        )
         return jsonify({'message': 'Nilai formatif berhasil disimpan'})
         
     except Exception as e:
@@ -116,7 +162,7 @@ def get_nilai_sumatif():
             return jsonify({'error': 'Parameter jenis dan kelas diperlukan'}), 400
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
@@ -163,36 +209,337 @@ def save_nilai_sumatif():
         data = request.get_json()
         
         # Get active semester
-        active_semester = Semester.query.filter_by(status='Aktif').first()
+        active_semester = get_active_semester()
         if not active_semester:
             return jsonify({'error': 'Tidak ada semester aktif'}), 400
         
-        for item in data['nilai']:
-            nilai = NilaiSumatif.query.filter_by(
-                siswa_id=item['siswa_id'],
-                jenis=item['jenis'],
-                semester_id=active_semester.id
-            ).first()
-            
-            if nilai:
-                # Update nilai yang sudah ada
-                nilai.nilai = item['nilai']
-                nilai.tanggal = datetime.strptime(data['tanggal'], '%Y-%m-%d').date()
-                nilai.updated_at = datetime.utcnow()
-            else:
-                # Buat nilai baru
-                nilai = NilaiSumatif(
-                    siswa_id=item['siswa_id'],
-                    jenis=item['jenis'],
-                    tanggal=datetime.strptime(data['tanggal'], '%Y-%m-%d').date(),
-                    nilai=item['nilai'],
-                    semester_id=active_semester.id
-                )
-                db.session.add(nilai)
+        tanggal = datetime.strptime(data['tanggal'], '%Y-%m-%d').date()
+        
+        if data['nilai']:
+            now = datetime.utcnow()
+            stmt = sqlite_insert(NilaiSumatif).values([
+                {
+                    'siswa_id': item['siswa_id'],
+                    'jenis': item['jenis'],
+                    'tanggal': tanggal,
+                    'nilai': item['nilai'],
+                    'semester_id': active_semester.id,
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for item in data['nilai']
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['siswa_id', 'jenis', 'semester_id'],
+                set_={
+                    'nilai': stmt.excluded.nilai,
+                    'tanggal': stmt.excluded.tanggal,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            db.session.execute(stmt)
+        
+        # Perbarui legger siswa yang terdampak
+        refresh_legger(active_semester, [item['siswa_id'] for item in data['nilai']])
         
+        naikkan_generasi(GENERASI_NILAI)
         db.session.commit()
+        invalidate_analitik_cache(active_semester.id)
+        invalidate_dashboard_cache()
+        publish_dashboard_event(
+            'nilai',
+            tipe='sumatif',
+            jenis_sumatif=sorted({item['jenis'] for item in data['nilai']}),
+            tanggal=tanggal.isoformat(),
+            jumlah=len(data['nilai'])
+        )
         return jsonify({'message': 'Nilai sumatif berhasil disimpan'})
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+# === GRADEBOOK ===
+
+JENIS_SUMATIF = ['UTS', 'UAS']
+
+def query_gradebook_rows(kelas, semester_id, dari=None, sampai=None):
+    """Siswa kelas LEFT JOIN semua nilai formatif + sumatif dalam satu query"""
+    formatif = select(
+        NilaiFormatif.id,
+        NilaiFormatif.siswa_id,
+        literal('formatif').label('tipe'),
+        NilaiFormatif.materi.label('kolom'),
+        NilaiFormatif.nilai,
+        NilaiFormatif.tanggal
+    ).where(NilaiFormatif.semester_id == semester_id)
+    sumatif = select(
+        NilaiSumatif.id,
+        NilaiSumatif.siswa_id,
+        literal('sumatif').label('tipe'),
+        NilaiSumatif.jenis.label('kolom'),
+        NilaiSumatif.nilai,
+        NilaiSumatif.tanggal
+    ).where(NilaiSumatif.semester_id == semester_id)
+    
+    # Filter tanggal di SQL, bukan di Python
+    if dari:
+        formatif = formatif.where(NilaiFormatif.tanggal >= dari)
+        sumatif = sumatif.where(NilaiSumatif.tanggal >= dari)
+    if sampai:
+        formatif = formatif.where(NilaiFormatif.tanggal <= sampai)
+        sumatif = sumatif.where(NilaiSumatif.tanggal <= sampai)
+    
+    nilai_sq = union_all(formatif, sumatif).subquery()
+    
+    return db.session.query(
+        Siswa.id.label('siswa_id'),
+        Siswa.nama,
+        Siswa.nisn,
+        nilai_sq.c.tipe,
+        nilai_sq.c.kolom,
+        nilai_sq.c.nilai,
+        nilai_sq.c.tanggal
+    ).outerjoin(
+        nilai_sq, nilai_sq.c.siswa_id == Siswa.id
+    ).filter(
+        Siswa.kelas == kelas
+    ).order_by(Siswa.nama, Siswa.id, nilai_sq.c.tipe, nilai_sq.c.id)
+
+@nilai_bp.route('/nilai/gradebook', methods=['GET'])
+def get_gradebook():
+    """Matriks nilai siswa × materi (plus UTS/UAS) untuk satu kelas"""
+    try:
+        kelas = request.args.get('kelas')
+        semester_id = request.args.get('semester', type=int)
+        tanggal_str = request.args.get('tanggal')
+        dari_tanggal = request.args.get('dari_tanggal')
+        sampai_tanggal = request.args.get('sampai_tanggal')
+        
+        if not kelas:
+            return jsonify({'error': 'Parameter kelas diperlukan'}), 400
+        
+        if semester_id:
+            semester = Semester.query.get(semester_id)
+        else:
+            semester = get_active_semester()
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        # tanggal = filter satu hari, dari/sampai = rentang
+        if tanggal_str:
+            dari_tanggal = sampai_tanggal = tanggal_str
+        try:
+            dari = datetime.strptime(dari_tanggal, '%Y-%m-%d').date() if dari_tanggal else None
+            sampai = datetime.strptime(sampai_tanggal, '%Y-%m-%d').date() if sampai_tanggal else None
+        except ValueError:
+            return jsonify({'error': 'Format tanggal harus YYYY-MM-DD'}), 400
+        
+        # Kolom materi mengikuti urutan daftar materi kelas
+        materi_list = [
+            row.judul for row in db.session.query(Materi.judul).filter(
+                Materi.kelas == kelas
+            ).order_by(Materi.id)
+        ]
+        materi_set = set(materi_list)
+        
+        siswa_data = []
+        siswa_index = {}
+        for row in query_gradebook_rows(kelas, semester.id, dari, sampai):
+            item = siswa_index.get(row.siswa_id)
+            if item is None:
+                item = {
+                    'siswa_id': row.siswa_id,
+                    'nama': row.nama,
+                    'nisn': row.nisn,
+                    'formatif': {},
+                    'sumatif': {}
+                }
+                siswa_index[row.siswa_id] = item
+                siswa_data.append(item)
+            
+            if row.tipe is None:
+                continue
+            
+            nilai_map = item['formatif'] if row.tipe == 'formatif' else item['sumatif']
+            # Nilai ganda: pakai entri pertama, sama seperti endpoint per materi
+            if row.kolom in nilai_map:
+                continue
+            nilai_map[row.kolom] = {
+                'nilai': row.nilai,
+                'tanggal': row.tanggal.isoformat()
+            }
+            
+            # Materi yang dinilai tapi tidak terdaftar di kelas tetap ditampilkan
+            if row.tipe == 'formatif' and row.kolom not in materi_set:
+                materi_set.add(row.kolom)
+                materi_list.append(row.kolom)
+        
+        return jsonify({
+            'kelas': kelas,
+            'semester_id': semester.id,
+            'materi': materi_list,
+            'sumatif': JENIS_SUMATIF,
+            'siswa': siswa_data
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# === ANALITIK NILAI ===
+
+def invalidate_analitik_cache(semester_id=None):
+    """Buang cache analitik satu semester (atau semuanya jika semester_id None)"""
+    with analitik_cache_lock:
+        if semester_id is None:
+            analitik_cache.clear()
+            return
+        for key in [key for key in analitik_cache if key[0] == semester_id]:
+            del analitik_cache[key]
+
+def query_nilai_analitik(semester_id, kelas, materi):
+    """Nilai formatif + sumatif semester beserta kelas siswa sebagai satu subquery"""
+    formatif = select(
+        NilaiFormatif.siswa_id,
+        literal('formatif').label('tipe'),
+        NilaiFormatif.materi.label('kolom'),
+        NilaiFormatif.nilai
+    ).where(NilaiFormatif.semester_id == semester_id)
+    sumatif = select(
+        NilaiSumatif.siswa_id,
+        literal('sumatif').label('tipe'),
+        NilaiSumatif.jenis.label('kolom'),
+        NilaiSumatif.nilai
+    ).where(NilaiSumatif.semester_id == semester_id)
+    
+    if materi != 'all':
+        formatif = formatif.where(NilaiFormatif.materi == materi)
+        sumatif = sumatif.where(NilaiSumatif.jenis == materi)
+    
+    nilai_sq = union_all(formatif, sumatif).subquery()
+    
+    def filter_kelas(query):
+        query = query.join(Siswa, Siswa.id == nilai_sq.c.siswa_id)
+        if kelas != 'all':
+            query = query.filter(Siswa.kelas == kelas)
+        return query
+    
+    return nilai_sq, filter_kelas
+
+def kuantil(values, q):
+    """Kuantil dengan interpolasi linear dari array yang sudah terurut"""
+    if not values:
+        return 0
+    posisi = (len(values) - 1) * q
+    bawah = int(posisi)
+    atas = min(bawah + 1, len(values) - 1)
+    return values[bawah] + (values[atas] - values[bawah]) * (posisi - bawah)
+
+def hitung_analitik_nilai(semester_id, kelas, materi, kkm, bins):
+    """Statistik per (kelas, materi/jenis): agregat SQL + satu lintasan nilai terurut"""
+    nilai_sq, filter_kelas = query_nilai_analitik(semester_id, kelas, materi)
+    grup = (Siswa.kelas, nilai_sq.c.tipe, nilai_sq.c.kolom)
+    
+    # Jumlah, rata-rata, min/max, rata-rata kuadrat dan di bawah KKM dihitung SQLite
+    agregat = filter_kelas(db.session.query(
+        *grup,
+        func.count(nilai_sq.c.nilai).label('jumlah'),
+        func.avg(nilai_sq.c.nilai).label('rata_rata'),
+        func.avg(nilai_sq.c.nilai * nilai_sq.c.nilai).label('rata_kuadrat'),
+        func.min(nilai_sq.c.nilai).label('minimum'),
+        func.max(nilai_sq.c.nilai).label('maksimum'),
+        func.sum(case((nilai_sq.c.nilai < kkm, 1), else_=0)).label('di_bawah_kkm')
+    )).group_by(*grup).order_by(*grup).all()
+    
+    # Median, kuartil dan histogram butuh nilai terurut per grup
+    nilai_grup = {}
+    for row in filter_kelas(db.session.query(*grup, nilai_sq.c.nilai)).order_by(*grup, nilai_sq.c.nilai):
+        nilai_grup.setdefault((row.kelas, row.tipe, row.kolom), array('d')).append(row.nilai)
+    
+    lebar = 100 / bins
+    batas = [lebar * i for i in range(1, bins)]
+    
+    statistik = []
+    for row in agregat:
+        values = nilai_grup.get((row.kelas, row.tipe, row.kolom), array('d'))
+        
+        # Jumlah per bin dari posisi batas pada data terurut; nilai 100 masuk bin terakhir
+        posisi = [0] + [bisect_left(values, edge) for edge in batas] + [len(values)]
+        histogram = [
+            {
+                'dari': round(lebar * i, 2),
+                'sampai': round(lebar * (i + 1), 2),
+                'jumlah': posisi[i + 1] - posisi[i]
+            }
+            for i in range(bins)
+        ]
+        
+        varians = max(row.rata_kuadrat - row.rata_rata ** 2, 0)
+        statistik.append({
+            'kelas': row.kelas,
+            'tipe': row.tipe,
+            'materi': row.kolom,
+            'jumlah': row.jumlah,
+            'rata_rata': round(row.rata_rata, 2),
+            'median': round(kuantil(values, 0.5), 2),
+            'simpangan_baku': round(varians ** 0.5, 2),
+            'q1': round(kuantil(values, 0.25), 2),
+            'q3': round(kuantil(values, 0.75), 2),
+            'minimum': row.minimum,
+            'maksimum': row.maksimum,
+            'persen_di_bawah_kkm': round(row.di_bawah_kkm / row.jumlah * 100, 2),
+            'histogram': histogram
+        })
+    
+    return statistik
+
+@nilai_bp.route('/nilai/analitik', methods=['GET'])
+def get_analitik_nilai():
+    """Statistik distribusi nilai per materi dan kelas dalam satu semester (di-cache)"""
+    try:
+        kelas = request.args.get('kelas', 'all')
+        materi = request.args.get('materi', 'all')
+        semester_id = request.args.get('semester', type=int)
+        bins = request.args.get('bins', 10, type=int)
+        
+        if bins < 1 or bins > 100:
+            return jsonify({'error': 'Parameter bins harus antara 1 dan 100'}), 400
+        
+        if semester_id:
+            semester = Semester.query.get(semester_id)
+        else:
+            semester = get_active_semester()
+        if not semester:
+            return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        
+        kkm = semester.nilai_kkm
+        key = (semester.id, kelas, materi, kkm, bins)
+        # Generasi dibaca sebelum menghitung: hasil yang dihitung saat ada
+        # penyimpanan nilai tersimpan dengan generasi lama dan tidak dipakai lagi
+        generasi = get_generasi(GENERASI_NILAI)
+        
+        statistik = None
+        with analitik_cache_lock:
+            entry = analitik_cache.get(key)
+            if entry and entry[0] == generasi:
+                analitik_cache.move_to_end(key)
+                statistik = entry[1]
+        
+        if statistik is None:
+            statistik = hitung_analitik_nilai(semester.id, kelas, materi, kkm, bins)
+            with analitik_cache_lock:
+                analitik_cache[key] = (generasi, statistik)
+                analitik_cache.move_to_end(key)
+                while len(analitik_cache) > MAX_ANALITIK_CACHE:
+                    analitik_cache.popitem(last=False)
+        
+        return jsonify({
+            'semester_id': semester.id,
+            'kelas': kelas,
+            'materi': materi,
+            'kkm': kkm,
+            'statistik': statistik
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,11 @@
 from flask import Blueprint, request, jsonify
-from models import db, Pengguna, BobotNilai
+from models import db, Pengguna, BobotNilai, Semester
+from routes.legger_routes import (
+    get_bobot_nilai as get_bobot_semester, invalidate_bobot_cache,
+    create_bobot_versi, freeze_bobot_default, refresh_stale_legger, GENERASI_BOBOT
+)
+from cache import naikkan_generasi
+from routes.semester_routes import get_active_semester
 
 pengguna_bp = Blueprint('pengguna', __name__)
 
@@ -52,6 +58,11 @@ def update_pengguna():
 @pengguna_bp.route('/bobot-nilai', methods=['GET'])
 def get_bobot_nilai():
     try:
+        # Bobot yang berlaku untuk semester tertentu (versi terbaru)
+        semester_id = request.args.get('semester', type=int)
+        if semester_id:
+            return jsonify(get_bobot_semester(semester_id))
+        
         bobot = BobotNilai.query.first()
         if not bobot:
             # Create default bobot nilai
@@ -89,14 +100,47 @@ def update_bobot_nilai():
         if total != 100:
             return jsonify({'error': 'Total bobot harus 100%'}), 400
         
-        bobot.formatif = data['formatif']
-        bobot.uts = data['uts']
-        bobot.uas = data['uas']
-        bobot.absensi = data['absensi']
+        # Bobot untuk semester tertentu hanya membuat versi baru semester itu,
+        # tanpa semester_id bobot default ikut diubah untuk semester aktif
+        semester = None
+        if data.get('semester_id'):
+            semester = Semester.query.get(data['semester_id'])
+            if not semester:
+                return jsonify({'error': 'Semester tidak ditemukan'}), 404
+        else:
+            semester = get_active_semester()
+            
+            # Legger semester lain tetap memakai bobot default yang lama
+            freeze_bobot_default({
+                'formatif': bobot.formatif if bobot.formatif is not None else 25,
+                'uts': bobot.uts if bobot.uts is not None else 25,
+                'uas': bobot.uas if bobot.uas is not None else 30,
+                'absensi': bobot.absensi if bobot.absensi is not None else 20
+            }, exclude_semester_id=semester.id if semester else None)
+            
+            bobot.formatif = data['formatif']
+            bobot.uts = data['uts']
+            bobot.uas = data['uas']
+            bobot.absensi = data['absensi']
+        
+        versi = None
+        refreshed_count = 0
+        if semester:
+            versi = create_bobot_versi(semester.id, data)
+            refreshed_count = refresh_stale_legger(semester)
         
+        # Proses lain membuang cache bobot-nya setelah commit ini terlihat
+        naikkan_generasi(GENERASI_BOBOT)
         db.session.commit()
-        return jsonify({'message': 'Bobot nilai berhasil diupdate'})
+        invalidate_bobot_cache()
+        
+        return jsonify({
+            'message': 'Bobot nilai berhasil diupdate',
+            'versi': versi.versi if versi else None,
+            'legger_diperbarui': refreshed_count
+        })
         
     except Exception as e:
         db.session.rollback()
+        invalidate_bobot_cache()
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,9 +1,39 @@
 from flask import Blueprint, request, jsonify
 from models import db, Semester
+from cache import get_cached_generasi, naikkan_generasi
 from datetime import datetime
+from collections import namedtuple
+import threading
 
 semester_bp = Blueprint('semester', __name__)
 
+# Salinan baris semester aktif (bukan objek ORM, aman dipakai lintas session)
+SemesterAktif = namedtuple('SemesterAktif', [column.name for column in Semester.__table__.columns])
+
+# Cache semester aktif per proses: {'nilai', 'generasi', 'dicek'}
+semester_aktif_cache = {}
+semester_aktif_cache_lock = threading.Lock()
+GENERASI_SEMESTER = 'semester'
+
+def invalidate_active_semester():
+    """Buang cache semester aktif proses ini"""
+    with semester_aktif_cache_lock:
+        semester_aktif_cache.clear()
+
+def load_active_semester():
+    """Salinan baris semester aktif dari database"""
+    semester = Semester.query.filter_by(status='Aktif').first()
+    if not semester:
+        return None
+    return SemesterAktif(**{field: getattr(semester, field) for field in SemesterAktif._fields})
+
+def get_active_semester():
+    """Semester aktif dari cache proses"""
+    return get_cached_generasi(
+        semester_aktif_cache, semester_aktif_cache_lock,
+        GENERASI_SEMESTER, load_active_semester
+    )
+
 @semester_bp.route('/semester', methods=['GET'])
 def get_semester():
     try:
@@ -41,7 +71,9 @@ def create_semester():
         )
         
         db.session.add(semester)
+        naikkan_generasi(GENERASI_SEMESTER)
         db.session.commit()
+        invalidate_active_semester()
         
         return jsonify({
             'message': 'Semester berhasil ditambahkan',
@@ -68,9 +100,17 @@ def update_semester(id):
         semester.tanggal_selesai = datetime.strptime(data['tanggal_selesai'], '%Y-%m-%d').date()
         semester.status = data.get('status', 'Nonaktif')
         semester.minimal_kehadiran = data.get('minimal_kehadiran', 75)
+        kkm_lama = semester.nilai_kkm
         semester.nilai_kkm = data.get('nilai_kkm', 75)
         
+        # Predikat legger tersimpan dihitung dengan KKM semester
+        if semester.nilai_kkm != kkm_lama:
+            from routes.legger_routes import refresh_legger
+            refresh_legger(semester)
+        
+        naikkan_generasi(GENERASI_SEMESTER)
         db.session.commit()
+        invalidate_active_semester()
         
         return jsonify({'message': 'Semester berhasil diupdate'})
         
@@ -88,7 +128,9 @@ def delete_semester(id):
             return jsonify({'error': 'Tidak dapat menghapus semester aktif'}), 400
         
         db.session.delete(semester)
+        naikkan_generasi(GENERASI_SEMESTER)
         db.session.commit()
+        invalidate_active_semester()
         
         return jsonify({'message': 'Semester berhasil dihapus'})
         
@@ -106,7 +148,9 @@ def activate_semester(id):
         semester = Semester.query.get_or_404(id)
         semester.status = 'Aktif'
         
+        naikkan_generasi(GENERASI_SEMESTER)
         db.session.commit()
+        invalidate_active_semester()
         
         return jsonify({'message': 'Semester berhasil diaktifkan'})
         
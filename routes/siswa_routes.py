@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
-from models import db, Siswa, Kelas
+from models import db, Siswa
 from datetime import datetime
+from routes.nilai_routes import invalidate_analitik_cache, GENERASI_NILAI
+from cache import naikkan_generasi
+from routes.dashboard_routes import invalidate_dashboard_cache
+from routes.kelas_routes import get_kelas_id
 
 siswa_bp = Blueprint('siswa', __name__)
 
@@ -53,10 +57,7 @@ def create_siswa():
                 return jsonify({'error': 'Format tanggal lahir tidak valid. Gunakan format YYYY-MM-DD'}), 400
         
         # Get kelas_id if kelas name is provided
-        kelas_id = None
-        if data.get('kelas'):
-            kelas_obj = Kelas.query.filter_by(nama=data['kelas']).first()
-            kelas_id = kelas_obj.id if kelas_obj else None
+        kelas_id = get_kelas_id(data.get('kelas'))
         
         siswa = Siswa(
             nisn=data['nisn'],
@@ -73,6 +74,7 @@ def create_siswa():
         
         db.session.add(siswa)
         db.session.commit()
+        invalidate_dashboard_cache()
         
         return jsonify({
             'message': 'Siswa berhasil ditambahkan',
@@ -126,10 +128,7 @@ def update_siswa(id):
                 return jsonify({'error': 'Format tanggal lahir tidak valid. Gunakan format YYYY-MM-DD'}), 400
         
         # Get kelas_id if kelas name is provided
-        kelas_id = None
-        if data.get('kelas'):
-            kelas_obj = Kelas.query.filter_by(nama=data['kelas']).first()
-            kelas_id = kelas_obj.id if kelas_obj else None
+        kelas_id = get_kelas_id(data.get('kelas'))
         
         siswa.nisn = data['nisn']
         siswa.nama = data['nama']
@@ -142,7 +141,11 @@ def update_siswa(id):
         siswa.telepon = data.get('telepon', '')
         siswa.email = data.get('email', '')
         
+        naikkan_generasi(GENERASI_NILAI)
         db.session.commit()
+        invalidate_dashboard_cache()
+        # Pindah kelas mengubah distribusi nilai per kelas
+        invalidate_analitik_cache()
         
         return jsonify({'message': 'Siswa berhasil diupdate'})
         
@@ -156,7 +159,10 @@ def delete_siswa(id):
         siswa = Siswa.query.get_or_404(id)
         
         db.session.delete(siswa)
+        naikkan_generasi(GENERASI_NILAI)
         db.session.commit()
+        invalidate_dashboard_cache()
+        invalidate_analitik_cache()
         
         return jsonify({'message': 'Siswa berhasil dihapus'})
         
@@ -98,7 +98,10 @@ class GuruApp {
         if (this.modules.siswa) this.modules.siswa.loadData();
         if (this.modules.materi) this.modules.materi.loadData();
         if (this.modules.semester) this.modules.semester.loadData();
-        if (this.modules.dashboard) this.modules.dashboard.loadData();
+        if (this.modules.dashboard) {
+            this.modules.dashboard.loadData();
+            this.modules.dashboard.connectLiveUpdates();
+        }
         if (this.modules.absensi) {
             this.modules.absensi.initDefaults();
         }
@@ -596,9 +599,17 @@ window.generateLegger = function() {
     }
 };
 
-window.exportLegger = function() {
+window.generateLeggerSemua = function() {
+    if (window.app && window.app.modules.legger) {
+        window.app.modules.legger.generateLeggerSemua();
+    } else {
+        console.error('Legger module not available');
+    }
+};
+
+window.exportLegger = function(format = 'csv') {
     if (window.app && window.app.modules.legger) {
-        window.app.modules.legger.exportLegger();
+        window.app.modules.legger.exportLegger(format);
     } else {
         console.error('Legger module not available');
     }
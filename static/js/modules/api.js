@@ -150,6 +150,12 @@ async getAbsensi(kelas, tanggal) {
     }
 }
 
+    async getKalenderAbsensi(kelas, dariTanggal, sampaiTanggal) {
+        return await this.request(
+            `/api/absensi/kalender?kelas=${encodeURIComponent(kelas)}&dari_tanggal=${dariTanggal}&sampai_tanggal=${sampaiTanggal}`
+        );
+    }
+
     async saveAbsensi(data) {
         return await this.request('/api/absensi', {
             method: 'POST',
@@ -166,6 +172,18 @@ async getAbsensi(kelas, tanggal) {
         return await this.request(`/api/nilai/sumatif?jenis=${jenis}&kelas=${kelas}&tanggal=${tanggal}`);
     }
 
+    async getGradebook(kelas, semester = '', tanggal = '') {
+        return await this.request(
+            `/api/nilai/gradebook?kelas=${encodeURIComponent(kelas)}&semester=${semester}&tanggal=${tanggal}`
+        );
+    }
+
+    async getAnalitikNilai(kelas = 'all', materi = 'all', semester = '') {
+        return await this.request(
+            `/api/nilai/analitik?kelas=${encodeURIComponent(kelas)}&materi=${encodeURIComponent(materi)}&semester=${semester}`
+        );
+    }
+
     async saveNilaiFormatif(data) {
         return await this.request('/api/nilai/formatif', {
             method: 'POST',
@@ -220,6 +238,10 @@ async getAbsensi(kelas, tanggal) {
         return await this.request('/api/dashboard');
     }
 
+    async getDashboardTren(hari = 30, kelas = 'all') {
+        return await this.request(`/api/dashboard/tren?hari=${hari}&kelas=${encodeURIComponent(kelas)}`);
+    }
+
     // Pengguna endpoints
     async getPengguna() {
         return await this.request('/api/pengguna');
@@ -247,6 +269,10 @@ async getAbsensi(kelas, tanggal) {
     async getLegger(kelas, semester) {
         return await this.request(`/api/legger?kelas=${kelas}&semester=${semester}`);
     }
+
+    async getLeggerJob(jobId) {
+        return await this.request(`/api/legger/jobs/${jobId}`);
+    }
     
     // Database endpoints
     async getDatabaseInfo() {
@@ -266,7 +292,7 @@ async getAbsensi(kelas, tanggal) {
         
         // Get filename from Content-Disposition header or use default
         const contentDisposition = response.headers.get('Content-Disposition');
-        let filename = 'database_backup.db';
+        let filename = 'database_backup.db.gz';
         if (contentDisposition) {
             const filenameMatch = contentDisposition.match(/filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/);
             if (filenameMatch && filenameMatch[1]) {
@@ -296,12 +322,31 @@ async getAbsensi(kelas, tanggal) {
         });
         
         if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
         }
         
         return await response.json();
     }
 
+    async getBackups() {
+        return await this.request('/api/database/backups');
+    }
+
+    async backupInkremental(penuh = false) {
+        return await this.request('/api/database/backup/inkremental', {
+            method: 'POST',
+            body: JSON.stringify({ penuh })
+        });
+    }
+
+    async restoreKeWaktu(waktu) {
+        return await this.request('/api/database/restore/waktu', {
+            method: 'POST',
+            body: JSON.stringify({ waktu })
+        });
+    }
+
     async optimizeDatabase() {
         return await this.request('/api/database/optimize', {
             method: 'POST'
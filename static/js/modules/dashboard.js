@@ -110,6 +110,22 @@ class Dashboard {
         this.updateStats();
     }
 
+    connectLiveUpdates() {
+        // Dashboard diperbarui saat server mengirim event perubahan, tanpa polling
+        if (!window.EventSource || this.eventSource) return;
+
+        this.eventSource = new EventSource('/api/dashboard/stream');
+        ['absensi', 'nilai', 'legger', 'reload'].forEach(jenis => {
+            this.eventSource.addEventListener(jenis, () => this.scheduleReload());
+        });
+    }
+
+    scheduleReload() {
+        // Gabungkan beberapa event berurutan menjadi satu kali muat ulang
+        clearTimeout(this.reloadTimer);
+        this.reloadTimer = setTimeout(() => this.loadData(), 1000);
+    }
+
     refresh() {
         this.loadData();
         this.ui.showNotification('Dashboard diperbarui!', 'success');
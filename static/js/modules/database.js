@@ -81,8 +81,8 @@ class DatabaseManager {
 
         // Check file extension
         const fileName = fileInput.files[0].name;
-        if (!fileName.toLowerCase().endsWith('.db')) {
-            this.ui.showNotification('File harus berupa .db (SQLite database)!', 'error');
+        if (!fileName.toLowerCase().endsWith('.db') && !fileName.toLowerCase().endsWith('.db.gz')) {
+            this.ui.showNotification('File harus berupa .db atau .db.gz (SQLite database)!', 'error');
             return;
         }
 
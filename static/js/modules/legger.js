@@ -76,62 +76,91 @@ class LeggerManager {
         }
     }
 
-    async exportLegger() {
+    async generateLeggerSemua() {
         try {
-            if (!this.currentKelas || !this.currentSemester) {
-                this.ui.showNotification('Pilih kelas dan semester terlebih dahulu', 'warning');
+            this.currentSemester = document.getElementById('filterSemesterLegger').value;
+
+            if (!this.currentSemester) {
+                this.ui.showNotification('Pilih semester terlebih dahulu', 'warning');
                 return;
             }
 
-            this.ui.showNotification('Mempersiapkan export legger...', 'info');
+            if (!confirm('Generate legger untuk semua kelas?')) {
+                return;
+            }
 
-            const result = await this.api.request(
-                `/api/legger/export?kelas=${this.currentKelas}&semester=${this.currentSemester}`
-            );
+            const result = await this.api.request('/api/legger/generate', {
+                method: 'POST',
+                body: JSON.stringify({
+                    kelas: 'all',
+                    semester_id: parseInt(this.currentSemester)
+                })
+            });
+
+            this.ui.showNotification(result.message, 'info');
+            this.pollLeggerJob(result.job_id);
 
-            // Simulate export functionality
-            // In production, this would download a CSV/Excel file
-            this.downloadLeggerAsCSV(result.data);
-            
-            this.ui.showNotification(
-                `Legger berhasil diexport (${result.total_records} records)`, 
-                'success'
-            );
-            
         } catch (error) {
-            console.error('Error exporting legger:', error);
-            this.ui.showNotification(`Gagal export legger: ${error.message}`, 'error');
+            console.error('Error generating legger:', error);
+            this.ui.showNotification(`Gagal generate legger: ${error.message}`, 'error');
         }
     }
 
-    downloadLeggerAsCSV(data) {
-        if (!data || data.length === 0) {
-            this.ui.showNotification('Tidak ada data untuk diexport', 'warning');
+    async pollLeggerJob(jobId) {
+        try {
+            const progress = await this.api.getLeggerJob(jobId);
+
+            if (progress.status === 'Berjalan') {
+                this.ui.showNotification(
+                    `Generate legger: ${progress.kelas_selesai}/${progress.total_kelas} kelas, ` +
+                    `${progress.siswa_selesai}/${progress.total_siswa} siswa (${progress.elapsed_seconds} detik)`,
+                    'info'
+                );
+                setTimeout(() => this.pollLeggerJob(jobId), 1000);
+                return;
+            }
+
+            if (progress.status === 'Selesai') {
+                this.ui.showNotification(
+                    `Legger berhasil digenerate untuk ${progress.siswa_selesai} siswa di ${progress.total_kelas} kelas`,
+                    'success'
+                );
+            } else {
+                this.ui.showNotification(`Generate legger selesai dengan error: ${progress.errors.join('; ')}`, 'error');
+            }
+
+            if (this.currentKelas) {
+                this.loadData();
+            }
+
+        } catch (error) {
+            console.error('Error polling legger job:', error);
+            this.ui.showNotification(`Gagal memantau generate legger: ${error.message}`, 'error');
+        }
+    }
+
+    exportLegger(format = 'csv') {
+        if (!this.currentKelas || !this.currentSemester) {
+            this.ui.showNotification('Pilih kelas dan semester terlebih dahulu', 'warning');
             return;
         }
 
-        // Create CSV content
-        const headers = Object.keys(data[0]).join(',');
-        const rows = data.map(item => 
-            Object.values(item).map(value => 
-                typeof value === 'string' && value.includes(',') ? `"${value}"` : value
-            ).join(',')
-        );
-        
-        const csvContent = [headers, ...rows].join('\n');
-        
-        // Create download link
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+        // File di-stream oleh server, browser langsung mengunduhnya
+        const params = new URLSearchParams({
+            kelas: this.currentKelas,
+            semester: this.currentSemester,
+            format: format
+        });
+
         const link = document.createElement('a');
-        const url = URL.createObjectURL(blob);
-        
-        link.setAttribute('href', url);
-        link.setAttribute('download', `legger_${this.currentKelas}_${new Date().toISOString().split('T')[0]}.csv`);
+        link.setAttribute('href', `/api/legger/export?${params.toString()}`);
         link.style.visibility = 'hidden';
-        
+
         document.body.appendChild(link);
         link.click();
         document.body.removeChild(link);
+
+        this.ui.showNotification('Export legger sedang diunduh', 'success');
     }
 
     renderTable() {
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplikasi di atas database sementara, tanpa scheduler backup"""
+    db_path = (tmp_path / 'database.db').as_posix()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'BACKUP_INCREMENTAL_INTERVAL': 0
+    })
+    with app.app_context():
+        yield app
+        from models import db
+        db.session.remove()
+        db.engine.dispose()
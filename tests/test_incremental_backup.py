@@ -0,0 +1,115 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import incremental_backup
+from incremental_backup import jalankan_backup, baca_catalog, cari_titik, bangun_database
+
+AWAL = datetime(2030, 1, 1, 8, 0)
+
+
+def buat_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE catatan (id INTEGER PRIMARY KEY, isi TEXT)')
+    conn.commit()
+    conn.close()
+
+
+def tulis(path, isi):
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO catatan (isi) VALUES (?)', [(isi,)] * 200)
+    conn.commit()
+    conn.close()
+
+
+def isi_database(path):
+    conn = sqlite3.connect(path)
+    hasil = conn.execute('SELECT isi, COUNT(*) FROM catatan GROUP BY isi ORDER BY isi').fetchall()
+    conn.close()
+    return hasil
+
+
+def backup_per_dua_jam(db_path, folder, retensi):
+    """Backup penuh lalu dua inkremental, masing-masing setelah data berubah"""
+    for i, isi in enumerate(['a' * 500, 'b' * 500, 'c' * 500]):
+        tulis(db_path, isi)
+        jalankan_backup(db_path, folder, retensi=retensi, sekarang=AWAL + timedelta(hours=2 * i))
+    return baca_catalog(folder)
+
+
+def test_backup_inkremental_hanya_halaman_berubah(tmp_path):
+    db_path = str(tmp_path / 'database.db')
+    folder = str(tmp_path / 'backup')
+    os.makedirs(folder)
+    buat_database(db_path)
+
+    catalog = backup_per_dua_jam(db_path, folder, incremental_backup.RETENSI_DEFAULT)
+    assert [e['jenis'] for e in catalog['entries']] == ['full', 'incremental', 'incremental']
+    assert len({e['rantai'] for e in catalog['entries']}) == 1
+    assert catalog['entries'][1]['halaman'] < catalog['entries'][1]['page_count']
+
+    # Tanpa perubahan tidak ada entri baru
+    assert jalankan_backup(db_path, folder, sekarang=AWAL + timedelta(hours=5)) is None
+
+
+def test_retensi_menggabungkan_entri_tengah_rantai(tmp_path):
+    db_path = str(tmp_path / 'database.db')
+    folder = str(tmp_path / 'backup')
+    os.makedirs(folder)
+    buat_database(db_path)
+
+    # Hanya dua titik per jam: backup penuh pertama digabung ke penerusnya
+    catalog = backup_per_dua_jam(db_path, folder, {'jam': 2})
+    entries = catalog['entries']
+    assert [e['waktu'] for e in entries] == [
+        (AWAL + timedelta(hours=2)).isoformat(), (AWAL + timedelta(hours=4)).isoformat()
+    ]
+    assert [e['jenis'] for e in entries] == ['full', 'incremental']
+    assert sorted(f for f in os.listdir(folder) if f.endswith('.pages.gz')) == [e['file'] for e in entries]
+
+    # Titik tengah yang tersisa tetap bisa dipulihkan utuh
+    target, rantai = cari_titik(catalog, AWAL + timedelta(hours=3))
+    assert target is entries[0]
+    out_path = str(tmp_path / 'pulih.db')
+    bangun_database(folder, rantai, out_path)
+    assert isi_database(out_path) == [('a' * 500, 200), ('b' * 500, 200)]
+
+    target, rantai = cari_titik(catalog, AWAL + timedelta(hours=4))
+    bangun_database(folder, rantai, out_path)
+    assert isi_database(out_path) == isi_database(db_path)
+
+
+def test_retensi_menghapus_ekor_di_luar_jendela(tmp_path):
+    db_path = str(tmp_path / 'database.db')
+    folder = str(tmp_path / 'backup')
+    os.makedirs(folder)
+    buat_database(db_path)
+
+    catalog = backup_per_dua_jam(db_path, folder, {'jam': 1})
+    assert [e['jenis'] for e in catalog['entries']] == ['full']
+    out_path = str(tmp_path / 'pulih.db')
+    bangun_database(folder, cari_titik(catalog, AWAL + timedelta(hours=4))[1], out_path)
+    assert isi_database(out_path) == isi_database(db_path)
+
+
+def test_cari_titik():
+    catalog = {'entries': [
+        {'id': 'f1', 'rantai': 'f1', 'waktu': '2030-01-01T08:00:00'},
+        {'id': 'i1', 'rantai': 'f1', 'waktu': '2030-01-01T09:00:00'},
+        {'id': 'f2', 'rantai': 'f2', 'waktu': '2030-01-01T10:00:00'},
+        {'id': 'i2', 'rantai': 'f2', 'waktu': '2030-01-01T11:00:00'},
+    ]}
+    assert cari_titik(catalog, datetime(2030, 1, 1, 7, 59)) == (None, [])
+
+    target, rantai = cari_titik(catalog, datetime(2030, 1, 1, 9, 30))
+    assert target['id'] == 'i1'
+    assert [e['id'] for e in rantai] == ['f1', 'i1']
+
+    target, rantai = cari_titik(catalog, datetime(2030, 1, 1, 11, 0))
+    assert [e['id'] for e in rantai] == ['f2', 'i2']
+
+    # Waktu dengan zona waktu dibandingkan sebagai waktu lokal
+    lokal = datetime(2030, 1, 1, 10, 30).astimezone()
+    target, _ = cari_titik(catalog, lokal.astimezone(timezone(timedelta(hours=-5))))
+    assert target['id'] == 'f2'
@@ -0,0 +1,93 @@
+import random
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Semester
+from routes.legger_routes import build_legger_item, simulate_predikat_batch, PREDIKAT_TINGKAT
+
+
+def buat_rows(jumlah, seed=7):
+    acak = random.Random(seed)
+    nilai = [0, 50, 60, 70, 75, 80, 85, 90, 100, 77.5, 82.25, 66.6666666667]
+    rows = []
+    for i in range(jumlah):
+        total_pertemuan = acak.choice([0, 12, 15, 16])
+        rows.append(SimpleNamespace(
+            id=i + 1, nama=f'Siswa {i + 1}', nisn=str(i + 1), kelas='X-1',
+            total_pertemuan=total_pertemuan,
+            hadir_count=acak.randint(0, total_pertemuan),
+            formatif_avg=acak.choice(nilai + [None]),
+            nilai_uts=acak.choice(nilai + [None]),
+            nilai_uas=acak.choice(nilai + [None])
+        ))
+    return rows
+
+
+def komponen_dari(rows):
+    """Kolom komponen seperti load_komponen_nilai"""
+    return {
+        'kehadiran': [
+            (row.hadir_count / row.total_pertemuan * 100) if row.total_pertemuan else 0
+            for row in rows
+        ],
+        'formatif': [row.formatif_avg or 0 for row in rows],
+        'uts': [row.nilai_uts if row.nilai_uts is not None else 0 for row in rows],
+        'uas': [row.nilai_uas if row.nilai_uas is not None else 0 for row in rows]
+    }
+
+
+BOBOT_LIST = [
+    {'formatif': 40, 'uts': 25, 'uas': 25, 'absensi': 10, 'kkm': 75},
+    {'formatif': 30, 'uts': 30, 'uas': 30, 'absensi': 10, 'kkm': 75},
+    {'formatif': 30, 'uts': 30, 'uas': 30, 'absensi': 10, 'kkm': 70},
+    {'formatif': 33.3, 'uts': 33.3, 'uas': 33.4, 'absensi': 0, 'kkm': 60},
+    {'formatif': 0, 'uts': 0, 'uas': 0, 'absensi': 100, 'kkm': 85},
+    {'formatif': 25, 'uts': 25, 'uas': 25, 'absensi': 25, 'kkm': 0},
+]
+
+
+def test_simulasi_sama_dengan_build_legger_item():
+    rows = buat_rows(2000)
+    hasil = simulate_predikat_batch(komponen_dari(rows), BOBOT_LIST)
+
+    for bobot, (tingkat, distribusi) in zip(BOBOT_LIST, hasil):
+        harapan = [build_legger_item(row, bobot, bobot['kkm'])['predikat'] for row in rows]
+        assert [PREDIKAT_TINGKAT[t] for t in tingkat] == harapan
+        assert distribusi == {p: harapan.count(p) for p in PREDIKAT_TINGKAT}
+
+
+@pytest.mark.parametrize('nilai_akhir, predikat', [
+    (74.999, 'E'), (75, 'D'), (80, 'C'), (85, 'B'), (90, 'A'), (100, 'A'), (0, 'E')
+])
+def test_simulasi_di_batas_kkm(nilai_akhir, predikat):
+    komponen = {'formatif': [nilai_akhir], 'uts': [0], 'uas': [0], 'kehadiran': [0]}
+    bobot = {'formatif': 100, 'uts': 0, 'uas': 0, 'absensi': 0, 'kkm': 75}
+    (tingkat, distribusi), = simulate_predikat_batch(komponen, [bobot])
+    assert PREDIKAT_TINGKAT[tingkat[0]] == predikat
+    assert distribusi[predikat] == 1
+
+
+@pytest.fixture
+def semester(app):
+    semester = Semester(tahun_ajaran='2024/2025', semester='Ganjil',
+                        tanggal_mulai=date(2024, 7, 15), tanggal_selesai=date(2024, 12, 20),
+                        status='Aktif', nilai_kkm=75)
+    db.session.add(semester)
+    db.session.commit()
+    return semester
+
+
+@pytest.mark.parametrize('body, pesan', [
+    ({'skenario': [{'formatif': 50, 'uts': 50, 'uas': 0}]}, 'harus berisi'),
+    ({'skenario': [{'formatif': 50, 'uts': 50, 'uas': 10, 'absensi': -10}]}, 'angka 0-100'),
+    ({'skenario': [{'formatif': '50', 'uts': 50, 'uas': 0, 'absensi': 0}]}, 'angka 0-100'),
+    ({'skenario': [{'formatif': 50, 'uts': 30, 'uas': 10, 'absensi': 0}]}, 'harus 100%'),
+    ({'skenario': [{'formatif': 50, 'uts': 50, 'uas': 0, 'absensi': 0, 'kkm': 120}]}, 'KKM'),
+    ({'skenario': [{'formatif': 50, 'uts': 50, 'uas': 0, 'absensi': 0}], 'limit': -1}, 'limit'),
+])
+def test_simulasi_bobot_tolak_skenario_tidak_valid(app, semester, body, pesan):
+    response = app.test_client().post('/api/legger/simulasi-bobot', json=dict(body, semester_id=semester.id))
+    assert response.status_code == 400
+    assert pesan in response.get_json()['error']
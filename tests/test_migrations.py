@@ -0,0 +1,57 @@
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+from migrations import upgrade_database, get_schema_version, LATEST_VERSION, MIGRASI
+from models import db, Semester, Siswa, Absensi
+
+
+def jadikan_skema_lama():
+    """Hapus index buatan, tabel turunan, dan catatan migrasi seperti database lama"""
+    for (nama,) in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    )).all():
+        db.session.execute(text(f'DROP INDEX {nama}'))
+    db.session.execute(text('DROP TABLE pertemuan'))
+    db.session.execute(text('DROP TABLE schema_version'))
+    db.session.commit()
+
+
+def test_database_baru_langsung_versi_terbaru(app):
+    assert get_schema_version() == LATEST_VERSION
+    assert upgrade_database() == []
+    assert upgrade_database() == []
+
+
+def test_upgrade_database_lama_idempoten(app):
+    semester = Semester(tahun_ajaran='2024/2025', semester='Ganjil',
+                        tanggal_mulai=date(2024, 7, 15), tanggal_selesai=date(2024, 12, 20),
+                        status='Aktif')
+    siswa = Siswa(nisn='0001', nama='Budi', kelas='X-1')
+    db.session.add_all([semester, siswa])
+    db.session.commit()
+    jadikan_skema_lama()
+
+    # Duplikat hanya mungkin tanpa index unik, seperti data lama
+    for status in ('Sakit', 'Hadir'):
+        db.session.add(Absensi(siswa_id=siswa.id, tanggal=date(2024, 7, 16),
+                               status=status, semester_id=semester.id))
+    db.session.commit()
+
+    assert upgrade_database() == [versi for versi, _, _ in MIGRASI]
+    assert get_schema_version() == LATEST_VERSION
+    assert [a.status for a in Absensi.query.all()] == ['Hadir']
+    indexes = {nama for (nama,) in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index'"
+    ))}
+    assert 'ix_absensi_siswa_tanggal_semester' in indexes
+
+    assert upgrade_database() == []
+    assert get_schema_version() == LATEST_VERSION
+    assert Absensi.query.count() == 1
+
+
+def test_file_lock_upgrade_dihapus(app):
+    upgrade_database()
+    assert not os.path.exists(os.path.abspath(db.engine.url.database) + '.upgrade.lock')
@@ -0,0 +1,61 @@
+import sqlite3
+
+from migrations import LATEST_VERSION
+from models import db
+from routes.database_routes import periksa_file_restore
+
+
+def buat_database(path, tabel, page_size=None):
+    conn = sqlite3.connect(path)
+    if page_size:
+        conn.execute(f'PRAGMA page_size={page_size}')
+    for nama in tabel:
+        conn.execute(f'CREATE TABLE {nama} (id INTEGER PRIMARY KEY)')
+    conn.commit()
+    conn.close()
+
+
+def test_tolak_file_bukan_sqlite(app, tmp_path):
+    path = tmp_path / 'backup.db'
+    path.write_bytes(b'bukan database sama sekali' * 100)
+    assert periksa_file_restore(str(path)).startswith('File is not a valid SQLite database')
+
+
+def test_tolak_database_tanpa_tabel_aplikasi(app, tmp_path):
+    path = str(tmp_path / 'backup.db')
+    buat_database(path, ['kelas', 'produk'])
+    assert periksa_file_restore(path) == 'File bukan backup database aplikasi ini'
+
+
+def test_tolak_skema_lebih_baru(app, tmp_path):
+    path = str(tmp_path / 'backup.db')
+    buat_database(path, ['kelas', 'siswa', 'semester'])
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE schema_version (versi INTEGER)')
+    conn.execute('INSERT INTO schema_version VALUES (?)', (LATEST_VERSION + 1,))
+    conn.commit()
+    conn.close()
+    assert 'lebih baru dari aplikasi' in periksa_file_restore(path)
+
+
+def test_tolak_database_rusak(app, tmp_path):
+    path = str(tmp_path / 'backup.db')
+    buat_database(path, ['kelas', 'siswa', 'semester'])
+    with open(path, 'r+b') as f:
+        # Halaman root tabel (halaman 2 dan seterusnya) ditimpa sampah
+        f.seek(4096)
+        f.write(b'\xff' * 4096)
+    assert periksa_file_restore(path) is not None
+
+
+def test_terima_backup_dan_samakan_page_size(app, tmp_path):
+    path = str(tmp_path / 'backup.db')
+    buat_database(path, ['kelas', 'siswa', 'semester'], page_size=1024)
+    assert periksa_file_restore(path) is None
+
+    with db.engine.connect() as live:
+        page_size = live.exec_driver_sql('PRAGMA page_size').scalar()
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA page_size').fetchone()[0] == page_size
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    conn.close()
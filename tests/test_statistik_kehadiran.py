@@ -0,0 +1,60 @@
+from datetime import date
+
+from routes.absensi_routes import hitung_statistik_kehadiran, STATUS_CODES, TANPA_CATATAN
+
+HADIR = STATUS_CODES['Hadir']
+SAKIT = STATUS_CODES['Sakit']
+ALPA = STATUS_CODES['Tidak Hadir']
+
+AWAL = date(2024, 7, 15).toordinal()
+
+
+def bitmap(*statuses):
+    return AWAL, bytes(statuses)
+
+
+def test_tanpa_catatan_dihitung_hadir():
+    pertemuan = [AWAL, AWAL + 1, AWAL + 2]
+    statistik = hitung_statistik_kehadiran(bitmap(HADIR, TANPA_CATATAN), pertemuan, 3)
+    assert statistik == {
+        'hadir': 3,
+        'total_pertemuan': 3,
+        'presentase_kehadiran': 100.0,
+        'streak_hadir': 3,
+        'absen_n_terakhir': 0
+    }
+
+    # Tanpa bitmap sama sekali: semua pertemuan hadir
+    assert hitung_statistik_kehadiran(None, pertemuan, 3)['hadir'] == 3
+
+
+def test_streak_dan_absen_n_terakhir():
+    pertemuan = [AWAL + hari for hari in range(6)]
+    statistik = hitung_statistik_kehadiran(
+        bitmap(HADIR, ALPA, HADIR, SAKIT, HADIR, HADIR), pertemuan, 3
+    )
+    assert statistik['hadir'] == 4
+    assert statistik['presentase_kehadiran'] == 66.67
+    assert statistik['streak_hadir'] == 2
+    assert statistik['absen_n_terakhir'] == 1
+
+    statistik = hitung_statistik_kehadiran(bitmap(HADIR, HADIR, ALPA), pertemuan[:3], 0)
+    assert statistik['streak_hadir'] == 0
+    assert statistik['absen_n_terakhir'] == 0
+
+
+def test_hanya_hari_pertemuan_yang_dihitung():
+    # Absen di hari tanpa pertemuan (AWAL + 1) tidak mengurangi kehadiran
+    pertemuan = [AWAL, AWAL + 2]
+    statistik = hitung_statistik_kehadiran(bitmap(HADIR, ALPA, HADIR), pertemuan, 5)
+    assert statistik['hadir'] == 2
+    assert statistik['total_pertemuan'] == 2
+    assert statistik['streak_hadir'] == 2
+    assert statistik['absen_n_terakhir'] == 0
+
+
+def test_tanpa_pertemuan():
+    statistik = hitung_statistik_kehadiran(bitmap(HADIR), [], 5)
+    assert statistik['total_pertemuan'] == 0
+    assert statistik['presentase_kehadiran'] == 0
+    assert statistik['streak_hadir'] == 0